@@ -0,0 +1,227 @@
+"""
+Timings of market clearing, equilibrium, phase diagram loci, transition solves and the data
+preparation behind the plot_* methods, on seeded scenarios from utils, for sizes from single calls
+to 100k point batches. Results are saved as JSON and compared against a stored baseline:
+
+    python benchmarks.py --output results.json --compare --baseline benchmark_baseline.json
+
+exits with status 1 if any benchmark is slower than its baseline by more than the tolerance, or if
+there is no baseline to compare against. Record a baseline on the reference machine with
+--save-baseline.
+
+"""
+import argparse
+import collections
+import json
+import platform
+import sys
+import timeit
+
+import numpy as np
+
+from energy_consumers import ConsumerPopulation
+from energy_markets import WholesaleEnergyMarket
+import sweeps
+import utils
+
+
+SEED = 42
+SIZES = (1, 100, 10000, 100000)
+QUICK_SIZES = (1, 100)
+INTEGRATORS = {
+    'vode_bdf': ('vode', {'nsteps': 1000, 'method': 'bdf'}),  # as in transitions.ipynb
+    'lsoda': ('lsoda', {'nsteps': 1000}),
+    'dopri5': ('dopri5', {}),
+    'dop853': ('dop853', {}),
+}
+
+Benchmark = collections.namedtuple('Benchmark', 'name variant sizes setup')
+Timing = collections.namedtuple('Timing', 'name variant size number best median')
+
+
+def market_price_setup(variant, size):
+    model = _model()
+    capital = _capital_grid(model, size)
+    market, prices = model._energy_market, (model._capital_price, model._fossil_fuel_price, model._interest_rate)
+    if variant == 'population':  # a million price-responsive consumers instead of inelastic demand
+        _, population_params = utils.generate_consumer_population_params(1000000, seed=SEED)
+        market = WholesaleEnergyMarket(ConsumerPopulation(**population_params), market.non_renewable_sector,
+                                       market.renewable_sector)
+    if size == 1:
+        method = 'newton' if variant == 'newton' else 'brentq'
+        return lambda: market.find_market_price(capital[0], *prices, method=method)
+    method = 'newton' if variant == 'newton' else 'illinois'
+    return lambda: market.find_market_prices(capital, *prices, method=method)
+
+
+def equilibrium_setup(variant, size):
+    # the equilibrium is cached by each model, so every call builds fresh models
+    _, scenarios = utils.generate_scenarios(size, seed=SEED)
+    scenarios = [{column: values[i] for column, values in scenarios.items()} for i in range(size)]
+    return lambda: [sweeps.build_model(scenario).equilibrium for scenario in scenarios]
+
+
+def q_dot_locus_setup(variant, size):
+    model = _model()
+    equilibrium_q = model.equilibrium[0]
+    if size == 1:
+        return lambda: model.q_dot_locus(1.01 * equilibrium_q)
+    # the q_dot = 0 locus of this scenario only exists below about 1.3 times the steady state q
+    qs = equilibrium_q * np.linspace(1.01, 1.2, size)
+    return lambda: model.q_dot_locus_grid(qs)
+
+
+def solve_setup(variant, size):
+    model = _model()
+    integrator, solver_kwargs = INTEGRATORS[variant]
+    K0 = 0.5 * model.equilibrium[1]
+    return lambda: model.solve(0, K0, 1e-3, integrator, **solver_kwargs)
+
+
+def plot_data_setup(variant, size):
+    model = _model()
+    equilibrium_q, equilibrium_capital = model.equilibrium
+    ts = np.linspace(0, 100, size)
+    Ks = equilibrium_capital * (1 - 0.5 * np.exp(-0.05 * ts))
+    qs = np.full(size, equilibrium_q)
+
+    def run():
+        model._diagnostics = None  # trajectory_diagnostics caches the most recent path
+        return model.trajectory_diagnostics(ts, qs, Ks)
+
+    return run
+
+
+BENCHMARKS = (
+    Benchmark('find_market_price', 'default', SIZES, market_price_setup),
+    Benchmark('find_market_price', 'newton', SIZES, market_price_setup),
+    Benchmark('find_market_price', 'population', SIZES, market_price_setup),
+    Benchmark('equilibrium', 'default', (1, 100), equilibrium_setup),
+    Benchmark('q_dot_locus', 'default', SIZES, q_dot_locus_setup),
+    Benchmark('solve', 'vode_bdf', (1,), solve_setup),
+    Benchmark('solve', 'lsoda', (1,), solve_setup),
+    Benchmark('solve', 'dopri5', (1,), solve_setup),
+    Benchmark('solve', 'dop853', (1,), solve_setup),
+    Benchmark('plot_data', 'default', (100, 10000, 100000), plot_data_setup),
+)
+
+
+def run_benchmarks(sizes=SIZES, names=None, repeat=5, min_time=0.2):
+    """
+    Time every benchmark (optionally only those whose name is in names) at each of its sizes that
+    is in sizes. Each of repeat measurements runs the call often enough to take at least min_time
+    seconds, and the best and median time per call are kept.
+
+    """
+    timings = []
+    for benchmark in BENCHMARKS:
+        if names is not None and benchmark.name not in names:
+            continue
+        for size in benchmark.sizes:
+            if size not in sizes:
+                continue
+            timer = timeit.Timer(benchmark.setup(benchmark.variant, size))
+            number = _calibrate(timer, min_time)
+            times = np.array(timer.repeat(repeat, number)) / number
+            timings.append(Timing(benchmark.name, benchmark.variant, size, number,
+                                  float(times.min()), float(np.median(times))))
+    return timings
+
+
+def compare(timings, baseline, tolerance=1.25):
+    """
+    Ratios of the best times to those of the matching baseline timings, as a dict keyed by (name,
+    variant, size), and the keys of regressions (slower than the baseline by more than tolerance).
+
+    """
+    baseline = {(timing.name, timing.variant, timing.size): timing for timing in baseline}
+    ratios = {}
+    for timing in timings:
+        key = (timing.name, timing.variant, timing.size)
+        if key in baseline:
+            ratios[key] = timing.best / baseline[key].best
+    regressions = sorted(key for key, ratio in ratios.items() if ratio > tolerance)
+    return ratios, regressions
+
+
+def save(timings, filename):
+    """Save timings, with the versions and machine they were measured on, to a JSON file."""
+    results = {'machine': platform.machine(), 'processor': platform.processor(), 'python': platform.python_version(),
+               'numpy': np.__version__, 'timings': [timing._asdict() for timing in timings]}
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+def load(filename):
+    """Load timings saved by save."""
+    with open(filename) as f:
+        return [Timing(**timing) for timing in json.load(f)['timings']]
+
+
+def report(timings, ratios=None):
+    """Timings (and ratios to a baseline) as a table of text."""
+    ratios = ratios or {}
+    lines = ['{:<20}{:<12}{:>8}{:>14}{:>14}{:>10}'.format('benchmark', 'variant', 'size', 'best [s]',
+                                                         'per point [s]', 'ratio')]
+    for timing in timings:
+        ratio = ratios.get((timing.name, timing.variant, timing.size))
+        lines.append('{:<20}{:<12}{:>8}{:>14.3e}{:>14.3e}{:>10}'.format(
+            timing.name, timing.variant, timing.size, timing.best, timing.best / timing.size,
+            '' if ratio is None else '{:.2f}'.format(ratio)))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--quick', action='store_true', help="only sizes {}".format(QUICK_SIZES))
+    parser.add_argument('--benchmark', action='append', dest='names', help="only this benchmark (repeatable)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="save the timings to this JSON file")
+    parser.add_argument('--baseline', default='benchmark_baseline.json')
+    parser.add_argument('--compare', action='store_true', help="fail if there is no baseline to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="save the timings as the baseline")
+    parser.add_argument('--tolerance', type=float, default=1.25, help="largest accepted ratio to the baseline")
+    args = parser.parse_args(argv)
+
+    timings = run_benchmarks(QUICK_SIZES if args.quick else SIZES, args.names, args.repeat)
+    if args.output is not None:
+        save(timings, args.output)
+    if args.save_baseline:
+        save(timings, args.baseline)
+        print(report(timings))
+        return 0
+
+    try:
+        baseline = load(args.baseline)
+    except IOError:
+        print(report(timings))
+        print("No baseline found at {}.".format(args.baseline))
+        return 1 if args.compare else 0
+    ratios, regressions = compare(timings, baseline, args.tolerance)
+    print(report(timings, ratios))
+    for name, variant, size in regressions:
+        print("Regression: {} ({}, size {}) is {:.2f} times slower than the baseline.".format(
+            name, variant, size, ratios[name, variant, size]))
+    return 1 if regressions else 0
+
+
+def _calibrate(timer, min_time):
+    """Number of calls per measurement needed to take at least min_time seconds."""
+    number = 1
+    while True:
+        if timer.timeit(number) >= min_time:
+            return number
+        number *= 10
+
+
+def _capital_grid(model, size):
+    return model.equilibrium[1] * np.geomspace(0.1, 10, size) if size > 1 else model.equilibrium[1:]
+
+
+def _model():
+    _, scenario = utils.generate_scenario(SEED)
+    return sweeps.build_model(scenario)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+import collections
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+
+
+CACHE_VERSION = 2  # bump whenever cached results would change, which invalidates every existing entry
+
+_MARKER = '.result-cache'  # file marking the version directories created by a ResultCache
+
+
+class ResultCache:
+
+    def __init__(self, directory=None, max_entries=256, max_bytes=2**30, version=CACHE_VERSION):
+        """
+        Content-addressed cache for solver results with an in-memory LRU tier of at most max_entries
+        values and, if directory is given, a pickled on-disk tier of at most max_bytes shared between
+        processes. Keys hash the cache version, so entries written by other versions are never read
+        and their directories (those marked as created by a ResultCache) are removed. Entries are
+        loaded with pickle, which can run arbitrary code, so directory must only be writable by
+        trusted users.
+
+        """
+        self._memory = collections.OrderedDict()
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._version = version
+
+        if directory is None:
+            self._directory = None
+        else:
+            self._directory = os.path.join(directory, 'v{}'.format(version))
+            os.makedirs(self._directory, exist_ok=True)
+            open(os.path.join(self._directory, _MARKER), 'a').close()
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if (name[:1] == 'v' and name[1:].isdigit() and path != self._directory and
+                        os.path.isfile(os.path.join(path, _MARKER))):
+                    shutil.rmtree(path, ignore_errors=True)
+
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return key in self._memory or (self._directory is not None and os.path.exists(self._path(key)))
+
+    def key(self, *parts):
+        """Canonical hash of parts (numbers, strings, arrays and nested sequences or dicts of them)."""
+        canonical = json.dumps([self._version, _canonical(parts)], sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def get(self, key, default=None):
+        """Value stored under key, looked up in memory and then on disk, or default."""
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return self._memory[key]
+        if self._directory is not None:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    value = pickle.load(f)
+                os.utime(self._path(key))  # file times order disk entries by recent use
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass
+            else:
+                self._remember(key, value)
+                self.hits += 1
+                return value
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        """Store value under key in memory and on disk."""
+        self._remember(key, value)
+        if self._directory is not None:
+            # write to a temporary file first so that other processes never read partial entries
+            fd, filename = tempfile.mkstemp(dir=self._directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(filename, self._path(key))
+            self._evict()
+
+    def get_or_compute(self, key, compute):
+        """Value stored under key, calling compute() and storing its result on a miss."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """Remove every entry from both tiers."""
+        self._memory.clear()
+        if self._directory is not None:
+            for name in os.listdir(self._directory):
+                if name != _MARKER:
+                    os.remove(os.path.join(self._directory, name))
+
+    def _evict(self):
+        """Remove the least recently used files until the disk tier fits in max_bytes."""
+        entries = []
+        for name in os.listdir(self._directory):
+            if not name.endswith('.pkl'):  # entries still being written
+                continue
+            try:
+                stat = os.stat(os.path.join(self._directory, name))
+            except OSError:  # removed by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self._max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self._directory, name))
+            except OSError:
+                pass
+            total -= size
+
+    def _path(self, key):
+        return os.path.join(self._directory, key + '.pkl')
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_entries:
+            self._memory.popitem(last=False)
+
+
+def parameters(obj):
+    """Parameter record of a consumer or sector as a dict, with its type."""
+    params = obj.params._asdict()
+    params['type'] = type(obj).__name__
+    return params
+
+
+def _canonical(value):
+    """Convert value to a JSON serializable form that is equal for equal values."""
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    elif isinstance(value, np.ndarray) and value.ndim > 0:
+        array = np.ascontiguousarray(value)
+        return {'dtype': array.dtype.str, 'shape': array.shape, 'sha256': hashlib.sha256(array.tobytes()).hexdigest()}
+    elif value is None or isinstance(value, (bool, str)):
+        return value
+    elif isinstance(value, np.bool_):
+        return bool(value)
+    elif isinstance(value, (int, np.integer)):
+        return int(value)
+    elif isinstance(value, (float, np.floating, np.ndarray)):
+        return repr(float(value))  # exact, and distinguishes 1.0 from 1
+    raise TypeError("Cannot build a cache key from {!r}.".format(value))
@@ -1,8 +1,79 @@
+import collections
+
+import numpy as np
+
+
+ConsumerParams = collections.namedtuple('ConsumerParams', ['quantity_demand'])
+ConsumerPopulationParams = collections.namedtuple('ConsumerPopulationParams', ['quantity_demand', 'elasticity'])
+
+_BLOCK_SIZE = 2**20  # largest number of (price, elasticity) terms evaluated at once
+
+
 class EnergyConsumer:
 
     def __init__(self, quantity_demand):
         self._quantity_demand = quantity_demand
 
+    @property
+    def params(self):
+        """Parameters of the consumer as a ConsumerParams record."""
+        return ConsumerParams(self._quantity_demand)
+
     def demand(self, energy_price):
         """For now just assume inelastic demand for energy."""
         return self._quantity_demand
+
+    def demand_price_derivative(self, energy_price):
+        """Inelastic demand does not respond to the energy price."""
+        return 0.0
+
+
+class ConsumerPopulation:
+
+    def __init__(self, quantity_demand, elasticity):
+        """
+        Consumers (e.g., regions or customer classes) with constant elasticity demand
+        quantity_demand[i] * energy_price**(-elasticity[i]), stored as arrays rather than one object
+        per consumer. Consumers with equal elasticity are pooled, so that aggregate demand is a single
+        reduction over the distinct elasticities however many consumers there are.
+
+        """
+        quantity_demand, elasticity = np.broadcast_arrays(np.asarray(quantity_demand, dtype=float).ravel(),
+                                                          np.asarray(elasticity, dtype=float).ravel())
+        if quantity_demand.size == 0:
+            raise ValueError("A consumer population needs at least one consumer.")
+        elif np.any(quantity_demand < 0) or np.any(elasticity < 0):
+            raise ValueError("Quantities demanded and elasticities must be non-negative.")
+
+        self.number_consumers = quantity_demand.size
+        self._elasticity, inverse = np.unique(elasticity, return_inverse=True)
+        self._quantity_demand = np.bincount(inverse.ravel(), weights=quantity_demand, minlength=self._elasticity.size)
+        self._elastic_quantity_demand = self._elasticity * self._quantity_demand
+
+    @property
+    def params(self):
+        """Parameters of the pooled consumers as a ConsumerPopulationParams record."""
+        return ConsumerPopulationParams(self._quantity_demand, self._elasticity)
+
+    def demand(self, energy_price):
+        """Aggregate demand of all consumers for a scalar or an array of energy prices."""
+        return self._reduce(self._quantity_demand, energy_price)
+
+    def demand_price_derivative(self, energy_price):
+        """Derivative of aggregate demand with respect to the energy price."""
+        return -self._reduce(self._elastic_quantity_demand, energy_price) / energy_price
+
+    def _reduce(self, weights, energy_price):
+        """Sum of weights * energy_price**(-elasticity) over the distinct elasticities."""
+        log_price = np.log(energy_price)
+        if np.ndim(log_price) == 0:
+            return np.dot(weights, np.exp(-log_price * self._elasticity))
+
+        # evaluate blocks of prices so that the (price, elasticity) terms fit in memory
+        log_prices = log_price.ravel()
+        result = np.empty(log_prices.size)
+        block = max(1, _BLOCK_SIZE // self._elasticity.size)
+        for start in range(0, log_prices.size, block):
+            terms = np.exp(np.multiply.outer(log_prices[start:start + block], -self._elasticity))
+            result[start:start + block] = terms.dot(weights)
+        return result.reshape(log_price.shape)
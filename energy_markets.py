@@ -1,5 +1,81 @@
+import math
+import sys
+
+import numpy as np
 from scipy import optimize
 
+import instrumentation
+import solvers
+
+
+class CompiledExcessDemand:
+
+    __slots__ = ('_demand', '_demand_price_derivative', '_log_renewable_coefficient', '_renewable_exponent',
+                 '_log_non_renewable_coefficient', '_capital_exponent', '_price_exponent', '_scalar')
+
+    def __init__(self, market, capital_price, fossil_fuel_price, interest_rate):
+        """
+        Excess demand as a function of (energy_price, capital) for fixed exogenous prices and Cobb-Douglas
+        non-renewable production, with supply reduced to powers of the energy price and capital. The
+        powers are evaluated in log space, so that with large exponents supply overflows to inf (or
+        underflows to 0) instead of becoming NaN from inf * 0.
+
+        """
+        self._demand = market.consumer.demand
+        self._demand_price_derivative = market.consumer.demand_price_derivative
+        log_renewable_coefficient, self._renewable_exponent = market.renewable_sector.log_output_coefficients(
+            capital_price, interest_rate)
+        (log_non_renewable_coefficient, self._capital_exponent,
+         self._price_exponent) = market.non_renewable_sector.log_output_coefficients(fossil_fuel_price)
+        log_coefficients = (log_renewable_coefficient, log_non_renewable_coefficient)
+        # Python floats keep scalar evaluation free of numpy scalar arithmetic
+        self._scalar = all(np.ndim(value) == 0 for value in log_coefficients)
+        self._log_renewable_coefficient, self._log_non_renewable_coefficient = (
+            [float(value) for value in log_coefficients] if self._scalar else log_coefficients)
+
+    def __call__(self, energy_price, capital):
+        renewable, non_renewable = self._supply_terms(energy_price, capital)
+        return self._demand(energy_price) - (renewable + non_renewable)
+
+    def derivative(self, energy_price, capital):
+        """Derivative of excess demand with respect to the energy price."""
+        renewable, non_renewable = self._supply_terms(energy_price, capital)
+        supply_elasticity_terms = self._renewable_exponent * renewable + self._price_exponent * non_renewable
+        return self._demand_price_derivative(energy_price) - supply_elasticity_terms / energy_price
+
+    def log_ratio(self, energy_price, capital):
+        """
+        Log of the ratio of demand to supply, which has the sign and the roots of excess demand but is
+        nearly linear in the log of the energy price (supply is a sum of two of its powers), so that
+        interpolating root finders converge in a few iterations, and is finite wherever demand is positive.
+
+        """
+        log_price = np.log(energy_price)
+        log_supply = np.logaddexp(self._log_renewable_coefficient + self._renewable_exponent * log_price,
+                                  self._log_non_renewable_coefficient + self._capital_exponent * np.log(capital) +
+                                  self._price_exponent * log_price)
+        return np.log(self._demand(energy_price)) - log_supply
+
+    def _supply_terms(self, energy_price, capital):
+        """Renewable and non-renewable supply, with math functions for scalars (e.g., inside ODE right-hand sides)."""
+        if self._scalar and isinstance(energy_price, float) and isinstance(capital, float):
+            log_price = math.log(energy_price)
+            return (_exp(self._log_renewable_coefficient + self._renewable_exponent * log_price),
+                    _exp(self._log_non_renewable_coefficient + self._capital_exponent * math.log(capital) +
+                         self._price_exponent * log_price))
+        log_price = np.log(energy_price)
+        return (np.exp(self._log_renewable_coefficient + self._renewable_exponent * log_price),
+                np.exp(self._log_non_renewable_coefficient + self._capital_exponent * np.log(capital) +
+                       self._price_exponent * log_price))
+
+
+_MAX_LOG = math.log(sys.float_info.max)
+
+
+def _exp(x):
+    """math.exp that overflows to inf (as np.exp does) instead of raising."""
+    return math.inf if x > _MAX_LOG else math.exp(x)
+
 
 class WholesaleEnergyMarket:
 
@@ -7,20 +83,148 @@ class WholesaleEnergyMarket:
         self.consumer = consumer
         self.non_renewable_sector = non_renewable_sector
         self.renewable_sector = renewable_sector
+        self._compiled = (None, None)  # exogenous prices and the excess demand compiled for them
 
-    def find_market_price(self, capital, capital_price, fossil_fuel_price, interest_rate):
-        """Use root finding algorithm to determine the market price."""
-        args = (capital, capital_price, fossil_fuel_price, interest_rate)
-        price, results = optimize.brentq(self._excess_demand, 1e-12, 1e12, args,
-                                         full_output=True, xtol=1e-15)
-        if results.converged:
+    def find_market_price(self, capital, capital_price, fossil_fuel_price, interest_rate, method='brentq',
+                          initial_guess=None, full_output=False):
+        """
+        Use root finding algorithm to determine the market price (brentq works in log-price). With
+        method='newton' a safeguarded Newton iteration in log-price (starting from initial_guess, if given)
+        is used and bracketing is only a fallback.
+
+        """
+        excess_demand, derivative, prices = self._excess_demand_functions(capital_price, fossil_fuel_price,
+                                                                          interest_rate)
+        args = (capital,) + prices
+        if method == 'brentq':
+            lower, upper = solvers.expand_log_bracket(excess_demand, 1e-12, 1e12, args)
+            # in log price, since excess demand can span many more orders of magnitude than brentq interpolates well
+            log_excess_demand = lambda log_price, *args: excess_demand(math.exp(log_price), *args)
+            log_price, results = optimize.brentq(log_excess_demand, math.log(lower), math.log(upper), args,
+                                                 full_output=True, xtol=1e-15)
+            price = math.exp(log_price)
+        elif method == 'newton':
+            guess = 1.0 if initial_guess is None else initial_guess
+            results = solvers.log_newton(excess_demand, derivative, guess, 1e-12, 1e12, args)
+            price = float(results.root)
+        else:
+            raise ValueError("Unknown market clearing method {!r}.".format(method))
+
+        instrumentation.count('market_clearing_calls')
+        instrumentation.count('market_clearing_iterations', int(results.iterations))
+        if not results.converged:
+            raise ValueError
+        elif full_output:
+            return price, results
+        else:
             return price
+
+    def find_market_prices(self, capital, capital_price, fossil_fuel_price, interest_rate, method='illinois',
+                           initial_guess=None, full_output=False):
+        """
+        Clear the market for arrays of capital (and broadcastable prices) in one vectorized pass. Raises
+        ValueError if the market does not clear at some capital, unless full_output is True, in which
+        case such prices are NaN and flagged by the converged field of the results.
+
+        """
+        excess_demand, derivative, prices = self._excess_demand_functions(capital_price, fossil_fuel_price,
+                                                                          interest_rate)
+        shape = np.broadcast(capital, capital_price, fossil_fuel_price, interest_rate).shape
+        args = tuple(np.broadcast_to(arg, shape) for arg in (capital,) + prices)
+        lower, upper = np.full(args[0].shape, 1e-12), np.full(args[0].shape, 1e12)
+        if method == 'illinois' and isinstance(excess_demand, CompiledExcessDemand):
+            # the log ratio is finite on the whole float range, so that it can be bracketed without expansions
+            lower, upper = np.full(shape, sys.float_info.min), np.full(shape, sys.float_info.max)
+            results = solvers.log_illinois(excess_demand.log_ratio, lower, upper, args)
+        elif method == 'illinois':
+            results = solvers.log_illinois(excess_demand, lower, upper, args)
+        elif method == 'newton':
+            guess = 1.0 if initial_guess is None else initial_guess
+            results = solvers.log_newton(excess_demand, derivative, guess, lower, upper, args)
         else:
+            raise ValueError("Unknown market clearing method {!r}.".format(method))
+
+        if instrumentation.enabled():
+            instrumentation.count('batch_market_clearing_calls')
+            instrumentation.count('batch_market_clearing_points', results.root.size)
+            instrumentation.count('batch_market_clearing_iterations', int(np.sum(results.iterations)))
+        if full_output:
+            return np.where(results.converged, results.root, np.nan), results
+        elif not results.converged.all():
             raise ValueError
+        else:
+            return results.root
+
+    def find_market_capital(self, energy_price, capital_price, fossil_fuel_price, interest_rate, lower=1e-12,
+                            upper=1e12):
+        """
+        Capital at which the market clears at arrays of energy_price (and broadcastable prices), i.e., the
+        inverse of find_market_prices, in one vectorized pass. Capital is NaN where it is not in [lower, upper]
+        (e.g., where renewable supply alone exceeds demand).
+
+        """
+        excess_demand, _, prices = self._excess_demand_functions(capital_price, fossil_fuel_price, interest_rate)
+        if isinstance(excess_demand, CompiledExcessDemand):
+            excess_demand = excess_demand.log_ratio
+        shape = np.broadcast(energy_price, capital_price, fossil_fuel_price, interest_rate, lower, upper).shape
+        args = tuple(np.broadcast_to(arg, shape) for arg in (energy_price,) + prices)
+        f = lambda capital, energy_price, *prices: excess_demand(energy_price, capital, *prices)
+        results = solvers.log_illinois(f, np.broadcast_to(lower, shape), np.broadcast_to(upper, shape), args,
+                                       max_expansions=0)
+        return np.where(results.converged, results.root, np.nan)
+
+    def market_price_capital_derivative(self, capital, energy_price, capital_price, fossil_fuel_price, interest_rate):
+        """
+        Derivative of the market clearing energy_price with respect to capital, from the implicit function
+        theorem applied to excess demand.
+
+        """
+        args = (capital, capital_price, fossil_fuel_price, interest_rate)
+        dZ_dK = -self.non_renewable_sector.output_capital_derivative(capital, energy_price, fossil_fuel_price)
+        return -dZ_dK / self._excess_demand_derivative(energy_price, *args)
+
+    def market_price_parameter_derivatives(self, capital, energy_price, capital_price, fossil_fuel_price,
+                                           interest_rate):
+        """
+        Derivatives of the market clearing energy_price with respect to capital_price, fossil_fuel_price,
+        interest_rate and the renewable subsidy mu for fixed capital, as a dict, from the implicit
+        function theorem applied to excess demand (demand does not depend on these parameters).
+
+        """
+        args = (capital, capital_price, fossil_fuel_price, interest_rate)
+        dS_dtheta = self.renewable_sector.output_parameter_derivatives(capital_price, energy_price, interest_rate)
+        dS_dtheta['fossil_fuel_price'] = self.non_renewable_sector.output_fossil_fuel_price_derivative(
+            capital, energy_price, fossil_fuel_price)
+        dZ_dp = self._excess_demand_derivative(energy_price, *args)
+        return {parameter: derivative / dZ_dp for parameter, derivative in dS_dtheta.items()}
+
+    def _excess_demand_functions(self, capital_price, fossil_fuel_price, interest_rate):
+        """
+        Excess demand, its price derivative and their remaining arguments after (energy_price, capital).
+        For Cobb-Douglas production these come from a CompiledExcessDemand, which is kept for the most
+        recent prices if they are scalars (arrays of prices, e.g. of a batch of scenarios, are compiled
+        on every call).
+
+        """
+        prices = (capital_price, fossil_fuel_price, interest_rate)
+        if not self.non_renewable_sector._is_cobb_douglas:
+            return self._excess_demand, self._excess_demand_derivative, prices
+        elif any(np.ndim(price) > 0 for price in prices):
+            compiled = CompiledExcessDemand(self, *prices)
+            return compiled, compiled.derivative, ()
+        key = tuple(float(price) for price in prices)
+        if self._compiled[0] != key:
+            self._compiled = (key, CompiledExcessDemand(self, *prices))
+        compiled = self._compiled[1]
+        return compiled, compiled.derivative, ()
 
     def _aggregate_demand(self, energy_price):
+        """Demand of the consumer, an EnergyConsumer or a ConsumerPopulation aggregated in one reduction."""
         return self.consumer.demand(energy_price)
 
+    def _aggregate_demand_price_derivative(self, energy_price):
+        return self.consumer.demand_price_derivative(energy_price)
+
     def _aggregate_supply(self, capital, capital_price, energy_price, fossil_fuel_price, interest_rate):
         """Aggregate energy supply is total energy produced by the non-renewable and renewable sectors."""
         supply = (self.non_renewable_sector.output(capital, energy_price, fossil_fuel_price) +
@@ -36,3 +240,15 @@ class WholesaleEnergyMarket:
         excess = (self._aggregate_demand(energy_price) -
                   self._aggregate_supply(capital, capital_price, energy_price, fossil_fuel_price, interest_rate))
         return excess
+
+    def _aggregate_supply_price_derivative(self, capital, capital_price, energy_price, fossil_fuel_price, interest_rate):
+        """Derivative of aggregate energy supply with respect to the energy price."""
+        derivative = (self.non_renewable_sector.output_price_derivative(capital, energy_price, fossil_fuel_price) +
+                      self.renewable_sector.output_price_derivative(capital_price, energy_price, interest_rate))
+        return derivative
+
+    def _excess_demand_derivative(self, energy_price, capital, capital_price, fossil_fuel_price, interest_rate):
+        """Derivative of excess demand with respect to the energy price."""
+        derivative = (self._aggregate_demand_price_derivative(energy_price) -
+                      self._aggregate_supply_price_derivative(capital, capital_price, energy_price, fossil_fuel_price, interest_rate))
+        return derivative
@@ -1,4 +1,23 @@
-from scipy import optimize
+import collections
+
+import numpy as np
+
+import instrumentation
+import solvers
+
+
+RenewableSectorState = collections.namedtuple('RenewableSectorState',
+                                              ['capital', 'output', 'revenue', 'costs', 'profits'])
+
+RenewableSectorParams = collections.namedtuple('RenewableSectorParams', ['tfp', 'alpha', 'delta', 'mu'])
+
+NonRenewableSectorParams = collections.namedtuple('NonRenewableSectorParams',
+                                                  ['tfp', 'alpha', 'beta', 'gamma', 'delta', 'phi', 'sigma'])
+
+NonRenewableSectorState = collections.namedtuple('NonRenewableSectorState',
+                                                 ['investment', 'fossil_fuel', 'output', 'revenue', 'capital_costs',
+                                                  'fossil_fuel_costs', 'costs', 'profits', 'marginal_product_capital',
+                                                  'marginal_product_fossil_fuel'])
 
 
 class RenewableEnergySector:
@@ -9,32 +28,78 @@ class RenewableEnergySector:
         self._delta = delta
         self._mu = mu
 
+        # constants of the hot formulas
+        self._capital_exponent = 1 / (1 - alpha)
+        self._subsidy_rate = 1 + mu
+
+    @property
+    def params(self):
+        """Parameters of the sector as a RenewableSectorParams record."""
+        return RenewableSectorParams(self._tfp, self._alpha, self._delta, self._mu)
+
     def output(self, capital_price, energy_price, interest_rate):
         """Renewable energy sector output."""
         capital = self._capital_demand(capital_price, energy_price, interest_rate)
         energy = self._tfp * capital**self._alpha
         return energy
 
+    def output_price_derivative(self, capital_price, energy_price, interest_rate):
+        """Derivative of renewable energy sector output with respect to the energy price."""
+        energy = self.output(capital_price, energy_price, interest_rate)
+        return (self._alpha / (1 - self._alpha)) * (energy / energy_price)
+
+    def evaluate(self, capital_price, energy_price, energy_price_growth, interest_rate):
+        """
+        Capital demand, output, revenue, costs and profits in one vectorized pass, returned as a
+        RenewableSectorState of arrays. Output follows from the first order condition for capital,
+        so the only power computed is the one in capital demand.
+
+        """
+        subsidized_price = self.subsidy(energy_price)
+        user_cost = (interest_rate + self._delta) * capital_price
+        capital = (self._alpha * self._tfp * subsidized_price / user_cost)**self._capital_exponent
+        energy = user_cost * capital / (self._alpha * subsidized_price)
+        revenue = subsidized_price * energy
+        costs = (self._capital_exponent * energy_price_growth + self._delta) * capital
+        return RenewableSectorState(capital, energy, revenue, costs, revenue - costs)
+
     def profits(self, capital_price, energy_price, energy_price_growth, interest_rate):
         """Renewable energy sector profits."""
-        pi = (self._revenue(capital_price, energy_price, interest_rate) -
-              self.costs(capital_price, energy_price, energy_price_growth, interest_rate))
-        return pi
+        return self.evaluate(capital_price, energy_price, energy_price_growth, interest_rate).profits
 
     def subsidy(self, energy_price):
         """Subsidized price of renewable energy."""
-        return (1 + self._mu) * energy_price
+        return self._subsidy_rate * energy_price
 
     def _capital_demand(self, capital_price, energy_price, interest_rate):
         """Renewable energy sector demand for capital."""
         relative_price = capital_price / self.subsidy(energy_price)
-        demand = ((self._alpha * self._tfp / (interest_rate + self._delta)) * (1 / relative_price))**(1 / (1 - self._alpha))
+        demand = ((self._alpha * self._tfp / (interest_rate + self._delta)) * (1 / relative_price))**self._capital_exponent
         return demand
 
     def costs(self, capital_price, energy_price, energy_price_growth, interest_rate):
         """Renewable energy production costs."""
         capital = self._capital_demand(capital_price, energy_price, interest_rate)
-        return ((1 / (1 - self._alpha)) * (energy_price_growth) + self._delta) * capital
+        return (self._capital_exponent * energy_price_growth + self._delta) * capital
+
+    def output_parameter_derivatives(self, capital_price, energy_price, interest_rate):
+        """Partial derivatives of output with respect to capital_price, interest_rate and mu, as a dict."""
+        energy = self.output(capital_price, energy_price, interest_rate)
+        exponent = self._alpha * self._capital_exponent
+        derivatives = {'capital_price': -exponent * energy / capital_price,
+                       'interest_rate': -exponent * energy / (interest_rate + self._delta),
+                       'mu': exponent * energy / self._subsidy_rate}
+        return derivatives
+
+    def log_output_coefficients(self, capital_price, interest_rate):
+        """
+        Output as a power of the energy price, (log_coefficient, exponent) such that output equals
+        exp(log_coefficient) * energy_price**exponent, with all constants folded for the given prices.
+
+        """
+        exponent = self._alpha * self._capital_exponent
+        relative_price = self._alpha * self._tfp * self._subsidy_rate / ((interest_rate + self._delta) * capital_price)
+        return np.log(self._tfp) + exponent * np.log(relative_price), exponent
 
     def _revenue(self, capital_price, energy_price, interest_rate):
         """Renewable energy revenue."""
@@ -53,6 +118,17 @@ class NonRenewableEnergySector:
         self._rho = (sigma - 1) / sigma
         self._sigma = sigma
 
+        # the functional form is chosen once, along with the constants of the hot formulas
+        self._is_cobb_douglas = bool(np.all(self._rho == 0) and np.all((alpha + beta) == gamma))  # arrays for batches
+        self._fossil_fuel_exponent = 1 / (1 - beta)
+        self._fossil_fuel_capital_exponent = alpha / (1 - beta)
+
+    @property
+    def params(self):
+        """Parameters of the sector as a NonRenewableSectorParams record."""
+        return NonRenewableSectorParams(self._tfp, self._alpha, self._beta, self._gamma, self._delta, self._phi,
+                                        self._sigma)
+
     def equation_motion_capital(self, q, capital):
         """Differential equation describing the time evolution of capital."""
         K_dot = self._investment_demand(q, capital) - self._delta * capital
@@ -66,6 +142,41 @@ class NonRenewableEnergySector:
                  self._value_marginal_product_capital(capital, energy_price, fossil_fuel_price) / capital_price)
         return q_dot
 
+    def equations_motion_jacobian(self, q, capital, capital_price, energy_price, energy_price_derivative,
+                                  fossil_fuel_price, interest_rate):
+        """
+        Jacobian of the equations of motion for (q, capital). The energy_price_derivative is the total
+        derivative of the market clearing energy price with respect to capital.
+
+        """
+        I = self._investment_demand(q, capital)
+        investment_rate = I / capital
+        dvmpk_dK, dvmpk_dp = self._value_marginal_product_capital_derivatives(capital, energy_price, fossil_fuel_price)
+        jacobian = [[interest_rate + self._delta - investment_rate,
+                     -(dvmpk_dK + dvmpk_dp * energy_price_derivative) / capital_price],
+                    [I / (2 * (q - 1)), investment_rate - self._delta]]
+        return jacobian
+
+    def equations_motion_parameter_derivatives(self, q, capital, capital_price, energy_price, fossil_fuel_price,
+                                               interest_rate):
+        """
+        Partial derivatives of the equations of motion for (q, capital) with respect to capital_price,
+        fossil_fuel_price, interest_rate, phi and energy_price (each holding the others fixed), as a dict
+        of (q_dot, K_dot) derivatives.
+
+        """
+        investment_rate = self._investment_demand(q, capital) / capital
+        vmpk = self._value_marginal_product_capital(capital, energy_price, fossil_fuel_price)
+        _, dvmpk_dp = self._value_marginal_product_capital_derivatives(capital, energy_price, fossil_fuel_price)
+        # fossil fuel use depends on energy_price / fossil_fuel_price, so vmpk is homogeneous of degree one in both
+        dvmpk_dpF = (vmpk - energy_price * dvmpk_dp) / fossil_fuel_price
+        derivatives = {'capital_price': (vmpk / capital_price**2, 0.0),
+                       'fossil_fuel_price': (-dvmpk_dpF / capital_price, 0.0),
+                       'interest_rate': (q, 0.0),
+                       'phi': (0.5 * investment_rate**3, -0.5 * investment_rate * capital / self._phi),
+                       'energy_price': (-dvmpk_dp / capital_price, 0.0)}
+        return derivatives
+
     @property
     def equilibrium_q(self):
         """Equilibrium value for Tobin's q."""
@@ -74,19 +185,83 @@ class NonRenewableEnergySector:
     def output(self, capital, energy_price, fossil_fuel_price):
         """Non-renewable sector energy output."""
         F = self._fossil_fuel_demand(capital, energy_price, fossil_fuel_price)
+        return self._production(capital, F)
+
+    def output_price_derivative(self, capital, energy_price, fossil_fuel_price):
+        """Derivative of non-renewable sector energy output with respect to the energy price."""
         if self._is_cobb_douglas:
-            energy = self._tfp * capital**self._alpha * F**self._beta
-        elif (self._rho == 0):
-            energy = self._tfp * (capital**self._alpha * F**self._beta)**self._gamma
+            energy = self.output(capital, energy_price, fossil_fuel_price)
+            derivative = (self._beta / (1 - self._beta)) * (energy / energy_price)
         else:
-            energy = self._tfp * (self._alpha * capital**self._rho + self._beta * F**self._rho)**(self._gamma / self._rho)
-        return energy
+            # fossil fuel use adjusts to keep energy_price * MPF = fossil_fuel_price
+            F = self._fossil_fuel_demand(capital, energy_price, fossil_fuel_price)
+            _, _, _, dlogmpf_dlogF = self._marginal_product_elasticities(capital, F)
+            derivative = -fossil_fuel_price * F / (energy_price**2 * dlogmpf_dlogF)
+        return derivative
+
+    def output_capital_derivative(self, capital, energy_price, fossil_fuel_price):
+        """Derivative of non-renewable sector energy output with respect to capital (fossil fuel use adjusts)."""
+        if self._is_cobb_douglas:
+            energy = self.output(capital, energy_price, fossil_fuel_price)
+            derivative = (self._alpha / (1 - self._beta)) * (energy / capital)
+        else:
+            F = self._fossil_fuel_demand(capital, energy_price, fossil_fuel_price)
+            mpk, mpf = self._marginal_products(capital, F, self._production(capital, F))
+            _, _, dlogmpf_dlogK, dlogmpf_dlogF = self._marginal_product_elasticities(capital, F)
+            derivative = mpk - mpf * (F / capital) * (dlogmpf_dlogK / dlogmpf_dlogF)
+        return derivative
+
+    def output_fossil_fuel_price_derivative(self, capital, energy_price, fossil_fuel_price):
+        """Derivative of non-renewable sector energy output with respect to the fossil fuel price."""
+        # fossil fuel use, and hence output, depends on energy_price / fossil_fuel_price
+        derivative = self.output_price_derivative(capital, energy_price, fossil_fuel_price)
+        return -(energy_price / fossil_fuel_price) * derivative
+
+    def evaluate(self, q, capital, capital_price, energy_price, fossil_fuel_price):
+        """
+        Investment, fossil fuel demand, output, revenue, costs, profits and marginal products in one
+        vectorized pass, returned as a NonRenewableSectorState of arrays. Output follows from the first
+        order condition for fossil fuels, so (with Cobb-Douglas production) the only powers computed are
+        those in fossil fuel demand.
+
+        """
+        if self._is_cobb_douglas:
+            F = ((self._tfp * self._beta * energy_price / fossil_fuel_price)**self._fossil_fuel_exponent *
+                 capital**self._fossil_fuel_capital_exponent)
+            fossil_fuel_costs = fossil_fuel_price * F
+            energy = fossil_fuel_costs / (self._beta * energy_price)
+            mpk, mpf = self._alpha * (energy / capital), self._beta * (energy / F)
+        else:
+            F = self._fossil_fuel_demand(capital, energy_price, fossil_fuel_price)
+            fossil_fuel_costs = fossil_fuel_price * F
+            energy = self._production(capital, F)
+            mpk, mpf = self._marginal_products(capital, F, energy)
+        revenue = energy_price * energy
+
+        investment_rate = ((2 / 3) * (q - 1) * (1 / self._phi))**0.5
+        I = investment_rate * capital
+        capital_costs = capital_price * (1 + (self._phi / 2) * investment_rate**2) * I
+        costs = capital_costs + fossil_fuel_costs
+        return NonRenewableSectorState(I, F, energy, revenue, capital_costs, fossil_fuel_costs, costs,
+                                       revenue - costs, mpk, mpf)
+
+    def log_output_coefficients(self, fossil_fuel_price):
+        """
+        Cobb-Douglas output as a product of powers, (log_coefficient, capital_exponent, price_exponent)
+        such that output equals exp(log_coefficient) * capital**capital_exponent * energy_price**price_exponent,
+        with all constants folded for the given fossil fuel price.
+
+        """
+        if not self._is_cobb_douglas:
+            raise NotImplementedError
+        price_exponent = self._beta * self._fossil_fuel_exponent
+        log_coefficient = (self._fossil_fuel_exponent * np.log(self._tfp) +
+                           price_exponent * np.log(self._beta / fossil_fuel_price))
+        return log_coefficient, self._fossil_fuel_capital_exponent, price_exponent
 
     def profits(self, q, capital, capital_price, energy_price, fossil_fuel_price):
         """Non-renewable sector profits."""
-        pi = (self._revenue(capital, energy_price, fossil_fuel_price) -
-              self.costs(q, capital, capital_price, energy_price, fossil_fuel_price))
-        return pi
+        return self.evaluate(q, capital, capital_price, energy_price, fossil_fuel_price).profits
 
     def costs(self, q, capital, capital_price, energy_price, fossil_fuel_price):
         """Non-renewable sector production costs."""
@@ -110,18 +285,64 @@ class NonRenewableEnergySector:
         """Non-renewable energy sector demand for fossil fuels."""
         relative_price = fossil_fuel_price / energy_price
         if self._is_cobb_douglas:
-            demand = (self._tfp * self._beta / relative_price)**(1 / (1 - self._beta)) * capital**(self._alpha / (1 - self._beta))
+            demand = (self._tfp * self._beta / relative_price)**self._fossil_fuel_exponent * capital**self._fossil_fuel_capital_exponent
+        elif (self._rho == 0):
+            elasticity = self._beta * self._gamma
+            demand = (self._tfp * elasticity * capital**(self._alpha * self._gamma) / relative_price)**(1 / (1 - elasticity))
         else:
-            args = (capital, capital_price, fossil_fuel_price)
-            price, results = optimize.brentq(self._excess_demand, 1e-12, 1e12, args,
-                                             full_output=True)
-            raise NotImplementedError  # need to use fsolve on FOC!
+            demand = self._ces_fossil_fuel_demand(capital, energy_price, fossil_fuel_price)
         return demand
 
-    @property
-    def _is_cobb_douglas(self):
-        """Check whether parameters imply Cobb-Douglas functional form."""
-        return (self._rho == 0) and ((self._alpha + self._beta) == self._gamma)
+    def _ces_fossil_fuel_demand(self, capital, energy_price, fossil_fuel_price):
+        """
+        Solve the first order condition energy_price * MPF = fossil_fuel_price for CES production by
+        vectorized safeguarded Newton in log F. Iterations start from the demand under Cobb-Douglas
+        production with the same returns to scale, so that no state is kept between calls (a sector may
+        be shared by models solved concurrently). Where the condition has no root among positive floats
+        demand is at a corner: 0 if even the smallest F is worth less than its price (e.g., with constant
+        returns MPF is bounded by tfp * beta**(1 / rho) as F goes to 0 for sigma < 1) and unbounded (inf)
+        if even the largest F is worth more (MPF has the same bound as F grows for sigma > 1).
+
+        """
+        args = tuple(np.broadcast_arrays(capital, energy_price, fossil_fuel_price))
+        tiny, huge = np.finfo(float).tiny, np.finfo(float).max
+        with np.errstate(divide='ignore'):
+            none = self._fossil_fuel_condition(tiny, *args) <= 0
+            unbounded = self._fossil_fuel_condition(huge, *args) >= 0
+        demand = np.where(none, 0.0, np.where(unbounded, np.inf, np.nan))
+        interior = ~(none | unbounded)
+        if np.any(interior):
+            # scalars stay scalars, which keeps the Newton iteration free of array overhead
+            capital, energy_price, fossil_fuel_price = (arg[interior] if arg.ndim else arg[()] for arg in args)
+            shares = np.array([self._alpha, self._beta]) * self._gamma / (self._alpha + self._beta)
+            guess = (self._tfp * shares[1] * capital**shares[0] * energy_price /
+                     fossil_fuel_price)**(1 / (1 - shares[1]))
+            results = solvers.log_newton(self._fossil_fuel_condition, self._fossil_fuel_condition_derivative,
+                                         guess, tiny, huge, (capital, energy_price, fossil_fuel_price), max_step=50.0)
+            if instrumentation.enabled():
+                instrumentation.count('fossil_fuel_demand_solves')
+                instrumentation.count('fossil_fuel_demand_iterations', int(np.sum(results.iterations)))
+            if not np.all(results.converged):
+                raise ValueError("Failed to solve for fossil fuel demand.")
+            demand[interior] = results.root
+        return demand[()]
+
+    def _fossil_fuel_condition(self, F, capital, energy_price, fossil_fuel_price):
+        """
+        First order condition for fossil fuels with CES production, log(energy_price * MPF / fossil_fuel_price),
+        with the CES aggregate summed in log space so that it is finite for every positive F.
+
+        """
+        log_aggregate = np.logaddexp(np.log(self._alpha) + self._rho * np.log(capital),
+                                     np.log(self._beta) + self._rho * np.log(F))
+        condition = (np.log(self._gamma * self._beta * self._tfp * energy_price / fossil_fuel_price) +
+                     (self._gamma / self._rho - 1) * log_aggregate + (self._rho - 1) * np.log(F))
+        return condition
+
+    def _fossil_fuel_condition_derivative(self, F, capital, energy_price, fossil_fuel_price):
+        """Derivative of the first order condition for fossil fuels with respect to F."""
+        _, _, _, dlogmpf_dlogF = self._marginal_product_elasticities(capital, F)
+        return dlogmpf_dlogF / F
 
     def _investment_demand(self, q, capital):
         """Non-renewable energy sector demand for investment."""
@@ -136,36 +357,60 @@ class NonRenewableEnergySector:
     def _marginal_product_capital(self, capital, energy_price, fossil_fuel_price):
         """Non-renewable sector marginal product of capital."""
         F = self._fossil_fuel_demand(capital, energy_price, fossil_fuel_price)
-        energy = self.output(capital, energy_price, fossil_fuel_price)
-        if self._is_cobb_douglas:
-            mpk = self._alpha * (energy / capital)
-        elif (self._rho == 0):
-            mpk = self._alpha * self._gamma * (energy / capital)
-        else:
-            capital_share = (self._alpha * self._gamma * capital**self._rho /
-                             (self._alpha * capital**self._rho + self._beta * F**rho))
-            mpk = capital_share * (energy / capital)
-        return mpk
+        return self._marginal_products(capital, F, self._production(capital, F))[0]
 
     def _marginal_product_fossil_fuel(self, capital, energy_price, fossil_fuel_price):
         """Non-renewable sector marginal product of fossil fuels."""
         F = self._fossil_fuel_demand(capital, energy_price, fossil_fuel_price)
-        energy = self.output(capital, energy_price, fossil_fuel_price)
+        return self._marginal_products(capital, F, self._production(capital, F))[1]
+
+    def _marginal_products(self, capital, F, energy):
+        """Marginal products of capital and fossil fuels F given the energy they produce."""
         if self._is_cobb_douglas:
-            mpf = self._beta * (energy / F)
+            mpk, mpf = self._alpha * (energy / capital), self._beta * (energy / F)
         elif (self._rho == 0):
-            mpf = self._beta * self._gamma * (energy / F)
+            mpk, mpf = self._alpha * self._gamma * (energy / capital), self._beta * self._gamma * (energy / F)
         else:
-            fossil_fuel_share = ((self._beta * self._gamma * F**self._rho) /
-                                 (self._alpha * capital**self._rho + self._beta * F**self._rho))
-            mpf = fossil_fuel_share * (energy / fossil_fuel)
-        return mpf
+            capital_term, fossil_fuel_term = self._alpha * capital**self._rho, self._beta * F**self._rho
+            aggregate = capital_term + fossil_fuel_term
+            mpk = (self._gamma * capital_term / aggregate) * (energy / capital)
+            mpf = (self._gamma * fossil_fuel_term / aggregate) * (energy / F)
+        return mpk, mpf
+
+    def _marginal_product_elasticities(self, capital, F):
+        """
+        Elasticities of the marginal products with respect to capital and fossil fuels, returned as
+        (dlog MPK/dlog K, dlog MPK/dlog F, dlog MPF/dlog K, dlog MPF/dlog F).
+
+        """
+        if self._rho == 0:
+            if self._is_cobb_douglas:
+                elasticity_K, elasticity_F = self._alpha, self._beta
+            else:
+                elasticity_K, elasticity_F = self._alpha * self._gamma, self._beta * self._gamma
+            return elasticity_K - 1, elasticity_F, elasticity_K, elasticity_F - 1
+        fossil_fuel_term = self._beta * F**self._rho
+        share = fossil_fuel_term / (self._alpha * capital**self._rho + fossil_fuel_term)
+        curvature = self._gamma - self._rho
+        return (curvature * (1 - share) + self._rho - 1, curvature * share,
+                curvature * (1 - share), curvature * share + self._rho - 1)
 
     def _percentage_adjustment_costs(self, capital, investment):
         """Convex capital adjustment cost function."""
         costs = (self._phi / 2) * (investment / capital)**2
         return costs
 
+    def _production(self, capital, F):
+        """Energy produced from capital and fossil fuels F."""
+        if self._is_cobb_douglas:
+            energy = self._tfp * capital**self._alpha * F**self._beta
+        elif (self._rho == 0):
+            energy = self._tfp * (capital**self._alpha * F**self._beta)**self._gamma
+        else:
+            with np.errstate(divide='ignore'):  # at the corner F = 0 with sigma < 1, 0**rho is inf and output 0
+                energy = self._tfp * (self._alpha * capital**self._rho + self._beta * F**self._rho)**(self._gamma / self._rho)
+        return energy
+
     def _revenue(self, capital, energy_price, fossil_fuel_price):
         """Non-renewable sector revenue."""
         return energy_price * self.output(capital, energy_price, fossil_fuel_price)
@@ -175,6 +420,20 @@ class NonRenewableEnergySector:
         vmp = energy_price * self._marginal_product_capital(capital, energy_price, fossil_fuel_price)
         return vmp
 
+    def _value_marginal_product_capital_derivatives(self, capital, energy_price, fossil_fuel_price):
+        """Partial derivatives of the value marginal product of capital with respect to capital and energy price."""
+        vmp = self._value_marginal_product_capital(capital, energy_price, fossil_fuel_price)
+        if self._is_cobb_douglas:
+            dvmp_dK = ((self._alpha + self._beta - 1) / (1 - self._beta)) * (vmp / capital)
+            dvmp_dp = (1 / (1 - self._beta)) * (vmp / energy_price)
+        else:
+            # fossil fuel use adjusts to keep energy_price * MPF = fossil_fuel_price
+            F = self._fossil_fuel_demand(capital, energy_price, fossil_fuel_price)
+            dlogmpk_dlogK, dlogmpk_dlogF, dlogmpf_dlogK, dlogmpf_dlogF = self._marginal_product_elasticities(capital, F)
+            dvmp_dK = (dlogmpk_dlogK - dlogmpk_dlogF * dlogmpf_dlogK / dlogmpf_dlogF) * (vmp / capital)
+            dvmp_dp = (1 - dlogmpk_dlogF / dlogmpf_dlogF) * (vmp / energy_price)
+        return dvmp_dK, dvmp_dp
+
     def _value_marginal_product_fossil_fuel(self, capital, energy_price, fossil_fuel_price):
         """Non-renewable sector value marginal product of capital."""
         vmp = energy_price * self._marginal_product_fossil_fuel(capital, energy_price, fossil_fuel_price)
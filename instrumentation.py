@@ -0,0 +1,100 @@
+import collections
+import contextlib
+import contextvars
+import time
+
+
+# SolverStats currently collecting, if any, per thread (and asyncio task) so that concurrent solves stay separate
+_ACTIVE = contextvars.ContextVar('active_solver_stats', default=None)
+_NULL_STAGE = contextlib.nullcontext()
+
+
+class SolverStats:
+
+    def __init__(self, counts=None, timings=None):
+        """
+        Counters (e.g., right-hand side calls, market clearing iterations) and wall clock seconds spent
+        in each solver stage. Timings are inclusive, i.e., a stage includes the stages nested inside it.
+
+        """
+        self.counts = collections.Counter(counts or {})
+        self.timings = collections.Counter(timings or {})
+
+    def __add__(self, other):
+        stats = SolverStats(self.counts, self.timings)
+        stats.merge(other)
+        return stats
+
+    def __repr__(self):
+        return 'SolverStats(counts={!r}, timings={!r})'.format(dict(self.counts), dict(self.timings))
+
+    def merge(self, other):
+        """Add the counters and timings of other (e.g., from another sweep worker) to these."""
+        self.counts.update(other.counts)
+        self.timings.update(other.timings)
+
+    def report(self):
+        """Counters and timings as a table of text, slowest stages first."""
+        lines = ['{:<40}{:>14.6f} s'.format(stage, seconds) for stage, seconds in self.timings.most_common()]
+        lines.extend('{:<40}{:>14d}'.format(name, count) for name, count in sorted(self.counts.items()))
+        return '\n'.join(lines)
+
+
+class _Stage:
+
+    __slots__ = ('_name', '_stats', '_start')
+
+    def __init__(self, name, stats):
+        self._name = name
+        self._stats = stats
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self._stats.timings[self._name] += time.perf_counter() - self._start
+
+
+def aggregate(stats):
+    """Sum an iterable of SolverStats (e.g., the 'stats' column of a sweep), skipping None."""
+    total = SolverStats()
+    for item in stats:
+        if item is not None:
+            total.merge(item)
+    return total
+
+
+@contextlib.contextmanager
+def collect():
+    """
+    Collect solver statistics within the block into the yielded SolverStats. Statistics collected by
+    nested blocks are also added to the enclosing ones. Collection is local to the current thread (or
+    asyncio task), so solves running concurrently elsewhere are not counted.
+
+    """
+    previous, stats = _ACTIVE.get(), SolverStats()
+    token = _ACTIVE.set(stats)
+    try:
+        yield stats
+    finally:
+        _ACTIVE.reset(token)
+        if previous is not None:
+            previous.merge(stats)
+
+
+def count(name, n=1):
+    """Increment the counter name by n if statistics are being collected."""
+    stats = _ACTIVE.get()
+    if stats is not None:
+        stats.counts[name] += n
+
+
+def enabled():
+    """Check whether statistics are being collected (to skip computing expensive counts otherwise)."""
+    return _ACTIVE.get() is not None
+
+
+def stage(name):
+    """Context manager timing the solver stage name if statistics are being collected."""
+    stats = _ACTIVE.get()
+    return _NULL_STAGE if stats is None else _Stage(name, stats)
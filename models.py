@@ -1,156 +1,542 @@
-import matplotlib.pyplot as plt
+import collections
+
 import numpy as np
+from numpy.polynomial import chebyshev
 from scipy import integrate, optimize
 
+from caches import parameters
+import instrumentation
+from policies import SaddlePathPolicy
+import solvers
+from surrogates import EnergyPriceSurrogate
+from trajectories import CollocationTrajectory, DenseTrajectory, TrajectoryBuffer, TrajectoryDiagnostics
 
-class TransitionDynamicsModel:
 
-    def __init__(self, energy_market, capital_price, fossil_fuel_price, interest_rate):
-        self._energy_market = energy_market
+SENSITIVITY_PARAMETERS = ('capital_price', 'fossil_fuel_price', 'interest_rate', 'mu', 'phi')
 
-        self._capital_price = capital_price
-        self._fossil_fuel_price = fossil_fuel_price
-        self._interest_rate = interest_rate
+Sensitivities = collections.namedtuple('Sensitivities', ['parameters', 'q', 'capital', 'energy_price'])
 
-    @property
-    def equilibrium(self):
-        """Equilibrium value for capital."""
-        equilibrium_q = self._energy_market.non_renewable_sector.equilibrium_q
-        equilibrium_capital = self.q_dot_locus(equilibrium_q)
-        return np.array([equilibrium_q, equilibrium_capital])
+_MAX_HORIZON_DOUBLINGS = 8  # collocation horizons tried are T, 2T, ..., 256T
 
-    def plot_sector_costs(self, ts, qs, Ks, deg=35):
+_LOCUS_BRACKET_POINTS = 25  # capital values tried when narrowing a q_dot = 0 locus bracket (powers of 10 on [1e-12, 1e12])
+_LOCUS_BRACKET_BISECTIONS = 30  # refinements of the narrowed end points (to about 1e-9 relative)
 
-        # interpolate the energy price function...
-        ps = np.array([self._compute_energy_price(K) for K in Ks])
-        p_hat = np.polynomial.Chebyshev.fit(ts, ps, deg)
-        grs = p_hat.deriv()(ts) / p_hat(ts)
-
-        # compute the sector profits
-        costs_NR = []
-        costs_R = []
-        for q, K, p, gr in zip(qs, Ks, ps, grs):
-            costs_NR.append(self._compute_non_renewable_sector_costs(q, K, p))
-            costs_R.append(self._compute_renewable_sector_costs(p, gr))
+_TRANSPOSED_JACOBIANS = {}  # integrate.ode integrator -> whether it reads a user supplied Jacobian transposed
 
-        fig, axes = plt.subplots(1, 2)
 
-        axes[0].plot(ts, np.array(costs_NR), label=r"$C_{NR}(t)$")
-        axes[0].legend(frameon=False)
+def _jacobian_is_transposed(integrator):
+    """
+    Check once whether an integrate.ode integrator (vode or lsoda) reads a user supplied Jacobian
+    transposed, as vode does in some SciPy releases. A wrong layout does not stop implicit steps from
+    converging, it only slows their Newton iterations, so the layout that integrates a stiff, strongly
+    asymmetric linear system with fewer right-hand side calls is taken.
 
-        axes[1].plot(ts, np.array(costs_R), label=r"$C_{R}(t)$")
-        axes[1].legend(frameon=False)
+    """
+    if integrator not in _TRANSPOSED_JACOBIANS:
+        A = np.array([[-1.0, 0.0], [1e3, -1e2]])
+        calls = collections.Counter()
 
-        fig.suptitle("Costs", fontsize=25, y=1.05, family='serif')
-        fig.tight_layout()
+        def rhs(t, y, layout):
+            calls[layout] += 1
+            return A.dot(y)
 
-        return fig
+        for layout, jacobian in (('standard', A), ('transposed', A.T)):
+            _ode = integrate.ode(rhs, lambda t, y, layout: jacobian)
+            _ode.set_integrator(integrator, nsteps=100000, **({'method': 'bdf'} if integrator == 'vode' else {}))
+            _ode.set_f_params(layout)
+            _ode.set_jac_params(layout)
+            _ode.set_initial_value([1.0, 1.0], 0)
+            _ode.integrate(1.0)
+        _TRANSPOSED_JACOBIANS[integrator] = calls['transposed'] < calls['standard']
+    return _TRANSPOSED_JACOBIANS[integrator]
 
-    def plot_sector_profits(self, ts, qs, Ks, deg=35):
 
-        # interpolate the energy price function...
-        ps = np.array([self._compute_energy_price(K) for K in Ks])
-        p_hat = np.polynomial.Chebyshev.fit(ts, ps, deg)
-        grs = p_hat.deriv()(ts) / p_hat(ts)
-
-        # compute the sector profits
-        profits_NR = []
-        profits_R = []
-        for q, K, p, gr in zip(qs, Ks, ps, grs):
-            profits_NR.append(self._compute_non_renewable_sector_profits(q, K, p))
-            profits_R.append(self._compute_renewable_sector_profits(p, gr))
-
-        fig, axes = plt.subplots(1, 2)
-
-        axes[0].plot(ts, np.array(profits_NR), label=r"$\Pi_{NR}(t)$")
-        axes[0].legend(frameon=False)
-
-        axes[1].plot(ts, np.array(profits_R), label=r"$\Pi_{R}(t)$")
-        axes[1].legend(frameon=False)
-
-        fig.suptitle("Profits", fontsize=25, y=1.05, family='serif')
-        fig.tight_layout()
-
-        return fig
-
-    def plot_energy_price(self, ts, Ks):
-
-        # compute energy prices
-        energy_prices = ps = np.array([self._compute_energy_price(K) for K in Ks])
-
-        fig, ax = plt.subplots(1, 1)
-
-        ax.plot(ts, energy_prices, label=r"$p_E(t)$")
-        ax.legend(frameon=False)
-
-        ax.set_title("Energy Price", fontsize=25, family='serif')
+class TransitionDynamicsModel:
 
-        return fig
+    def __init__(self, energy_market, capital_price, fossil_fuel_price, interest_rate, market_clearing_method='brentq',
+                 price_surrogate_rtol=None, cache=None):
+        self._energy_market = energy_market
 
-    def plot_sector_energy_output(self, ts, qs, Ks):
+        self._capital_price = capital_price
+        self._fossil_fuel_price = fossil_fuel_price
+        self._interest_rate = interest_rate
 
-        # compute energy prices
-        ps = np.array([self._compute_energy_price(K) for K in Ks])
+        self._market_clearing_method = market_clearing_method
+        self._energy_price_guess = None
 
-        # compute the sector output
-        output_NR = []
-        output_R = []
-        for K, p in zip(Ks, ps):
-            output_NR.append(self._compute_non_renewable_sector_output(K, p))
-            output_R.append(self._compute_renewable_sector_output(p))
+        # parameters are fixed, so the equilibrium is found once (optionally near a neighboring model's)
+        self._equilibrium = None
+        self._equilibrium_capital_guess = None
 
-        fig, axes = plt.subplots(1, 2)
+        # energy price depends only on capital, so it can be interpolated once per model
+        self._price_surrogate_rtol = price_surrogate_rtol
+        if price_surrogate_rtol is None:
+            self._energy_price_surrogate = None
+        else:
+            self._energy_price_surrogate = EnergyPriceSurrogate(self._find_energy_prices, price_surrogate_rtol)
 
-        axes[0].plot(ts, np.array(output_NR) / self._energy_market.consumer.demand(ps), label=r"$E_{NR}(t)$")
-        axes[0].set_ylim(0, 1)
-        axes[0].legend(frameon=False)
+        self._policy_function = None
+        self._diagnostics = None
 
-        axes[1].plot(ts, np.array(output_R) / self._energy_market.consumer.demand(ps), label=r"$E_{R}(t)$")
-        axes[1].set_ylim(0, 1)
-        axes[1].legend(frameon=False)
+        # equilibria, trajectories and price surrogates of identical models are shared through the cache
+        self._cache = cache
+        if cache is not None and self._energy_price_surrogate is not None:
+            state = cache.get(self._cache_key('energy_price_surrogate'))
+            if state is not None:
+                self._energy_price_surrogate.set_state(state)
+            self._stored_surrogate_fits = self._energy_price_surrogate.number_fits
 
-        fig.suptitle("Energy output", fontsize=25, y=1.05, family='serif')
-        fig.tight_layout()
+    @property
+    def equilibrium(self):
+        """Equilibrium value for capital."""
+        if self._equilibrium is None:
+            self._equilibrium = self._cached('equilibrium', self._find_equilibrium)
+        return self._equilibrium.copy()
+
+    def plot_sector_costs(self, diagnostics, qs=None, Ks=None, deg=35):
+        """
+        Plot the costs of both sectors along a path (see plotting.plot_sector_costs), given by its
+        TrajectoryDiagnostics or, as in earlier versions, by arrays ts, qs and Ks.
+
+        """
+        import plotting
+        return plotting.plot_sector_costs(self._path_diagnostics(diagnostics, qs, Ks, deg))
+
+    def plot_sector_profits(self, diagnostics, qs=None, Ks=None, deg=35):
+        """
+        Plot the profits of both sectors along a path (see plotting.plot_sector_profits), given by its
+        TrajectoryDiagnostics or, as in earlier versions, by arrays ts, qs and Ks.
+
+        """
+        import plotting
+        return plotting.plot_sector_profits(self._path_diagnostics(diagnostics, qs, Ks, deg))
+
+    def plot_energy_price(self, diagnostics, Ks=None):
+        """
+        Plot the energy price along a path (see plotting.plot_energy_price), given by its
+        TrajectoryDiagnostics or, as in earlier versions, by arrays ts and Ks.
+
+        """
+        import plotting
+        return plotting.plot_energy_price(self._path_diagnostics(diagnostics, None, Ks))
+
+    def plot_sector_energy_output(self, diagnostics, qs=None, Ks=None):
+        """
+        Plot the shares of energy demand met by each sector (see plotting.plot_sector_energy_output),
+        given by the TrajectoryDiagnostics of a path or, as in earlier versions, by arrays ts, qs and Ks.
+
+        """
+        import plotting
+        return plotting.plot_sector_energy_output(self._path_diagnostics(diagnostics, qs, Ks))
+
+    def trajectory_diagnostics(self, ts, qs, Ks, deg=35):
+        """
+        Prices, sector outputs, costs and profits along a transition path (e.g., from solve) as a
+        TrajectoryDiagnostics, computed in one vectorized pass. The energy price growth rate comes from
+        a Chebyshev interpolant of degree deg. The result for the most recent path is cached.
+
+        """
+        ts, qs, Ks = np.array(ts), np.array(qs), np.array(Ks)
+        if self._diagnostics is not None:
+            (cached_ts, cached_qs, cached_Ks, cached_deg), diagnostics = self._diagnostics
+            if (cached_deg == deg and np.array_equal(cached_ts, ts) and np.array_equal(cached_qs, qs) and
+                    np.array_equal(cached_Ks, Ks)):
+                return diagnostics
 
-        return fig
+        # interpolate the energy price function...
+        ps = self._compute_energy_prices(Ks)
+        p_hat = np.polynomial.Chebyshev.fit(ts, ps, deg)
+        grs = p_hat.deriv()(ts) / p_hat(ts)
 
-    def q_dot_locus(self, q):
-        min_capital, max_capital = 1e-12, 1e12
-        locus = lambda capital: self._q_dot(q, capital, self._compute_energy_price(capital))
-        equilibrium_capital = optimize.brentq(locus, min_capital, max_capital)
+        renewable = self._energy_market.renewable_sector.evaluate(self._capital_price, ps, grs, self._interest_rate)
+        non_renewable = self._energy_market.non_renewable_sector.evaluate(qs, Ks, self._capital_price, ps,
+                                                                          self._fossil_fuel_price)
+        demand = np.broadcast_to(self._energy_market.consumer.demand(ps), ps.shape)
+        diagnostics = TrajectoryDiagnostics(ts, qs, Ks, ps, grs, demand, renewable, non_renewable)
+        self._diagnostics = ((ts, qs, Ks, deg), diagnostics)
+        return diagnostics
+
+    def q_dot_locus(self, q, initial_guess=None):
+        """
+        Capital at which q_dot = 0 for the given q. With an initial_guess the bracket is grown geometrically
+        around it instead of spanning [1e-12, 1e12] (or the part of it on which the market clears).
+
+        """
+        locus = lambda capital: self._q_dot(q, float(capital), self._compute_energy_price(float(capital)))
+        if initial_guess is None:
+            min_capital, max_capital = self._locus_capital_bracket(q, 1e-12, 1e12)
+        else:
+            min_capital, max_capital = solvers.expand_log_bracket(locus, initial_guess / 1.01, initial_guess * 1.01,
+                                                                  factor=10)
+        equilibrium_capital = optimize.brentq(locus, float(min_capital), float(max_capital))
         return equilibrium_capital
 
-    def solve(self, t0, K0, dt, integrator, **solver_kwargs):
-        return self._solve_reverse_shooting(t0, K0, dt, integrator, **solver_kwargs)
-
-    def _compute_non_renewable_sector_costs(self, q, capital, energy_price):
-        prices = (self._capital_price, energy_price, self._fossil_fuel_price)
-        return self._energy_market.non_renewable_sector.costs(q, capital, *prices)
-
-    def _compute_renewable_sector_costs(self, energy_price, energy_price_growth):
-        prices = (self._capital_price, energy_price, energy_price_growth, self._interest_rate)
-        return self._energy_market.renewable_sector.costs(*prices)
+    def q_dot_locus_grid(self, qs):
+        """
+        Vectorized version of q_dot_locus for an array of q, solving for all capital values in the same
+        array pass. Capital is NaN for values of q without a q_dot = 0 locus on [1e-12, 1e12] (or the part
+        of it on which the market clears).
+
+        """
+        qs = np.asarray(qs, dtype=float)
+        locus = lambda capital, q: self._q_dot(q, capital, self._compute_energy_prices(capital))
+        lower, upper = self._locus_capital_bracket(qs, np.full(qs.shape, 1e-12), np.full(qs.shape, 1e12))
+        results = solvers.log_illinois(locus, lower, upper, (qs,), max_expansions=0)
+        return np.where(results.converged, results.root, np.nan)
+
+    def _locus_capital_bracket(self, q, lower, upper):
+        """
+        Capital brackets [lower, upper] for the q_dot = 0 locus of (broadcastable) q. Where the locus is not
+        defined at their end points, the brackets are narrowed to consecutive values on a grid of
+        _LOCUS_BRACKET_POINTS geometrically spaced capital values between which it changes sign, or else to
+        the capital values at which it starts and stops being defined, found by bisection from the grid
+        (or, if it is defined nowhere on the grid, from the capital at which the energy price is 1). The
+        locus is not defined where the market does not clear, e.g. where the clearing prices leave the
+        float range with renewable alpha near 0, or where large capital alone produces more energy than is
+        demanded at any price with substitutable CES inputs (sigma > 1).
+
+        """
+        capital = np.array(np.broadcast_arrays(np.asarray(lower, dtype=float), np.asarray(upper, dtype=float)))
+        if np.isfinite(self._locus_values(q, capital)).all():
+            return capital[0], capital[1]
+        capital = np.geomspace(capital[0], capital[1], _LOCUS_BRACKET_POINTS)
+        values = self._locus_values(q, capital)
+        defined = np.isfinite(values)
+        changes = defined[:-1] & defined[1:] & (np.sign(values[:-1]) != np.sign(values[1:]))
+        some, change = defined.any(axis=0), changes.any(axis=0)
+        take = lambda index: np.take_along_axis(capital, index[np.newaxis], axis=0)[0]
+        first, last = np.argmax(defined, axis=0), capital.shape[0] - 1 - np.argmax(defined[::-1], axis=0)
+        lower = take(np.where(change, np.argmax(changes, axis=0), first))
+        upper = take(np.where(change, np.argmax(changes, axis=0) + 1, last))
+        outer_lower = np.where(change, lower, take(np.maximum(first - 1, 0)))
+        outer_upper = np.where(change, upper, take(np.minimum(last + 1, capital.shape[0] - 1)))
+        if not some.all():
+            # with renewable alpha near 0 the locus can be defined only between two grid values
+            prices = (self._capital_price, self._fossil_fuel_price, self._interest_rate)
+            anchor = self._energy_market.find_market_capital(1.0, *prices, lower=capital[0], upper=capital[-1])
+            # brackets on which the locus is defined nowhere are kept (it then fails at their end points)
+            anchor = np.where(some, np.nan, anchor)
+            lower, upper = np.where(np.isnan(anchor), lower, anchor), np.where(np.isnan(anchor), upper, anchor)
+            outer_lower = np.where(some, outer_lower, capital[0])
+            outer_upper = np.where(some, outer_upper, capital[-1])
+        if np.all((outer_lower == lower) & (outer_upper == upper)):
+            return lower, upper
+        for _ in range(_LOCUS_BRACKET_BISECTIONS):
+            middle = np.array([np.sqrt(outer_lower) * np.sqrt(lower), np.sqrt(upper) * np.sqrt(outer_upper)])
+            defined = np.isfinite(self._locus_values(q, middle))
+            lower, outer_lower = np.where(defined[0], middle[0], lower), np.where(defined[0], outer_lower, middle[0])
+            upper, outer_upper = np.where(defined[1], middle[1], upper), np.where(defined[1], outer_upper, middle[1])
+        return lower, upper
+
+    def _locus_values(self, q, capital):
+        """q_dot for q at an array of capital, NaN where the market does not clear."""
+        prices = (self._capital_price, self._fossil_fuel_price, self._interest_rate)
+        with np.errstate(all='ignore'):
+            energy_prices = self._energy_market.find_market_prices(capital, *prices, full_output=True)[0]
+            undefined = np.isnan(energy_prices)
+            # q_dot is evaluated at a placeholder price where the market does not clear, as CES fossil fuel
+            # demand cannot be solved for at a NaN price
+            return np.where(undefined, np.nan, self._q_dot(q, capital, np.where(undefined, 1.0, energy_prices)))
+
+    def K_dot_locus_grid(self, capital):
+        """Value of q at which K_dot = 0 for an array of capital (investment only just replaces depreciation)."""
+        return np.full(np.shape(capital), self._energy_market.non_renewable_sector.equilibrium_q)
+
+    def vector_field(self, q, capital):
+        """
+        Time derivatives (q_dot, K_dot) on broadcastable arrays of q and capital (e.g., a meshgrid for a
+        phase diagram). The market is cleared once for each distinct capital value.
+
+        """
+        q, capital = np.broadcast_arrays(np.asarray(q, dtype=float), np.asarray(capital, dtype=float))
+        unique_capital, inverse = np.unique(capital, return_inverse=True)
+        energy_prices = self._compute_energy_prices(unique_capital)[inverse].reshape(capital.shape)
+        return self._q_dot(q, capital, energy_prices), self._capital_dot(q, capital)
+
+    def warm_start(self, other):
+        """
+        Seed the equilibrium and market clearing of this model from a model with nearby parameters, e.g.,
+        the previous point on a parameter path.
+
+        """
+        self._equilibrium_capital_guess = other.equilibrium[1]
+        self._energy_price_guess = other._energy_price_guess
+
+    def solve(self, t0, K0, dt, integrator, filename=None, return_stats=False, **solver_kwargs):
+        """
+        Solve for the transition path from K0 to the steady state by reverse shooting, starting a relative
+        distance eps (a solver keyword, 1e-6 by default) from the steady state along the stable eigenvector
+        rather than perturbing capital alone by 1e-15, which is below the rounding of the steady state. If
+        filename is given the trajectory is written to a .npy file as it is computed and returned
+        memory-mapped. With return_stats=True the SolverStats collected during the solve are returned as a
+        third value.
+
+        """
+        if not return_stats:
+            with instrumentation.stage('solve'):
+                return self._solve_reverse_shooting(t0, K0, dt, integrator, filename, **solver_kwargs)
+        with instrumentation.collect() as stats, instrumentation.stage('solve'):
+            ts, solution = self._solve_reverse_shooting(t0, K0, dt, integrator, filename, **solver_kwargs)
+        return ts, solution, stats
+
+    def policy_function(self, min_capital, max_capital, method='RK45', max_duration=1e4, eps=1e-6, **solver_kwargs):
+        """
+        Saddle path policy function q*(K) for capital in [min_capital, max_capital]. The saddle path is
+        computed once by adaptive reverse shooting below the steady state (and above it if max_capital
+        exceeds steady state capital) and cached, and is only recomputed when a wider range of capital is
+        requested. Above the steady state the domain ends early if the saddle path reaches q = 1 (zero
+        investment).
+
+        """
+        policy = self._policy_function
+        if policy is not None and policy.covers(min_capital, max_capital):
+            return policy
+        elif policy is not None:
+            min_capital = min(min_capital, policy.requested_domain[0])
+            max_capital = max(max_capital, policy.requested_domain[1])
+
+        with instrumentation.stage('policy_function'):
+            equilibrium = self.equilibrium
+            solver_kwargs.setdefault('rtol', 1e-10)
+            solver_kwargs.setdefault('atol', 1e-12 * equilibrium)
+            capital, q, slopes = [equilibrium[1]], [equilibrium[0]], [self._stable_eigenpair(equilibrium)[1]]
+            # pad the targets so that the domain is not clipped by event location or solver stages
+            targets = [0.99 * min(min_capital, equilibrium[1])]
+            if max_capital > equilibrium[1]:
+                targets.append(1.01 * max_capital)
+            for target in targets:
+                result = self._integrate_saddle_path(target, method, max_duration, eps, **solver_kwargs)
+
+                # sample the dense output between solver steps and take exact slopes from the equations of motion
+                ts = np.concatenate([np.linspace(a, b, 4, endpoint=False) for a, b in zip(result.t[:-1], result.t[1:])] +
+                                    [result.t[-1:]])
+                qs, Ks = result.sol(ts)
+                energy_prices = self._compute_energy_prices(Ks)
+                capital.extend(Ks)
+                q.extend(qs)
+                slopes.extend(self._q_dot(qs, Ks, energy_prices) / self._capital_dot(qs, Ks))
+
+            self._policy_function = SaddlePathPolicy(np.array(capital), np.array(q), np.array(slopes),
+                                                     (min_capital, max_capital))
+        return self._policy_function
+
+    def solve_adaptive(self, t0, K0, method='RK45', max_duration=1e4, eps=1e-6, **solver_kwargs):
+        """
+        Solve for the transition path by adaptive reverse shooting with scipy's solve_ivp, starting a
+        relative distance eps from the steady state along the linearized saddle path. Integration stops
+        at a terminal event when capital reaches K0 and the returned DenseTrajectory can be evaluated
+        on any time grid afterwards without re-integrating.
+
+        """
+        def solve():
+            with instrumentation.stage('solve_adaptive'):
+                result = self._integrate_saddle_path(K0, method, max_duration, eps, **solver_kwargs)
+            if result.t_events[1].size > 0:
+                raise ValueError("Saddle path reaches q = 1 (zero investment) before capital reaches K0.")
+            return DenseTrajectory(result.sol, t0, result.t[-1], result.nfev)
+
+        return self._cached('solve_adaptive', solve, t0=t0, K0=K0, method=method, max_duration=max_duration,
+                            eps=eps, solver_kwargs=solver_kwargs)
+
+    def solve_collocation(self, K0, T=None, degree=16, max_degree=512, tol=1e-8, maxiter=50, initial_guess=None):
+        """
+        Solve for the transition path from K0 as a two-point boundary value problem on [0, T] by Chebyshev
+        collocation: K(0) = K0 and (q(T), K(T)) lies on the linearized saddle path. The unknowns are the
+        coefficients of log(q - 1) and log(K / K_eq), which keeps investment defined and makes the
+        residuals relative rates of change. At each degree the coefficients are found by damped Newton
+        iteration with the analytic Jacobian, clearing the market at all collocation nodes in one batched
+        call, and the degree is doubled until the residuals fall below tol. The horizon T (by default
+        twice the time the linearized saddle path takes to close the gap to the steady state by a
+        factor tol) is doubled while the terminal gap is too large for the linearized terminal condition.
+        A ValueError is raised if the residuals still exceed tol at max_degree, or the terminal gap at 256 T.
+        A CollocationTrajectory of a model with nearby parameters can be passed as initial_guess, in which
+        case its coefficients, degree and (by default) horizon seed the Newton iteration.
+
+        """
+        with instrumentation.stage('solve_collocation'):
+            if initial_guess is None:
+                solve = lambda: self._solve_collocation_horizon(K0, T, degree, max_degree, tol, maxiter, None)
+                return self._cached('solve_collocation', solve, K0=K0, T=T, degree=degree, max_degree=max_degree,
+                                    tol=tol, maxiter=maxiter)
+            return self._solve_collocation_horizon(K0, T, degree, max_degree, tol, maxiter, initial_guess)
+
+    def solve_policy(self, ts, K0, method='RK45', **solver_kwargs):
+        """
+        Solve for transition paths from one or more initial capital stocks K0 by integrating capital
+        forward under the cached saddle path policy function. Returns (q, K) on the time grid ts with
+        shape (len(ts), 2), or (len(ts), len(K0), 2) if K0 is an array.
+
+        """
+        K0 = np.asarray(K0, dtype=float)
+        equilibrium = self.equilibrium
+        policy = self.policy_function(min(K0.min(), equilibrium[1]), max(K0.max(), equilibrium[1]))
+        policy(K0)  # raises if some K0 lies outside the domain of the saddle path
+
+        # trial stages of the solver may step slightly outside the domain
+        rhs = lambda t, K: self._capital_dot(policy(K, extrapolate=True), K)
+        result = integrate.solve_ivp(rhs, (ts[0], ts[-1]), np.atleast_1d(K0), method, t_eval=ts, **solver_kwargs)
+        if result.status != 0:
+            raise ValueError(result.message)
+
+        Ks = result.y.T
+        solution = np.stack((policy(Ks, extrapolate=True), Ks), axis=-1)
+        return solution[:, 0] if K0.ndim == 0 else solution
+
+    def solve_chunks(self, t0, K0, dt, integrator, chunk_size=4096, **solver_kwargs):
+        """
+        Generator version of solve yielding (ts, solution) chunks of at most chunk_size rows as they
+        are computed. Chunks come in integration order, i.e., backwards in time from the steady state,
+        so the rows of the concatenated chunks must be reversed to recover the solution of solve.
+
+        """
+        ts = np.empty(chunk_size)
+        solution = np.empty((chunk_size, 2))
+        i = 0
+        for t, y in self._reverse_shooting_steps(t0, K0, dt, integrator, **solver_kwargs):
+            ts[i], solution[i] = t, y
+            i += 1
+            if i == chunk_size:
+                yield ts.copy(), solution.copy()
+                i = 0
+        if i > 0:
+            yield ts[:i].copy(), solution[:i].copy()
+
+    def equilibrium_sensitivities(self, elasticities=False):
+        """
+        Derivatives (or, with elasticities=True, elasticities) of the steady state q, capital and energy
+        price with respect to SENSITIVITY_PARAMETERS, as Sensitivities whose fields are arrays over the
+        parameters. They follow from the implicit function theorem applied to q_dot = K_dot = 0, with
+        the energy price given by market clearing, so no perturbed models are solved.
+
+        """
+        q, capital = self.equilibrium
+        energy_price = self._compute_energy_price(capital)
+        jacobian = np.array(self._equations_motion_jacobian(q, capital, energy_price))
+        rhs_derivatives, price_derivatives = self._rhs_parameter_derivatives(q, capital, energy_price)
+        dq, dK = -np.linalg.solve(jacobian, rhs_derivatives)
+        dp = price_derivatives + self._compute_energy_price_derivative(capital, energy_price) * dK
+        sensitivities = Sensitivities(SENSITIVITY_PARAMETERS, dq, dK, dp)
+        return self._elasticities(sensitivities, q, capital, energy_price) if elasticities else sensitivities
+
+    def path_sensitivities(self, ts, K0, elasticities=False, method='RK45', max_duration=1e4, eps=1e-6,
+                           **solver_kwargs):
+        """
+        Derivatives (or elasticities) of q, capital and the energy price along the transition path from
+        K0 (at time 0) with respect to SENSITIVITY_PARAMETERS, as Sensitivities of arrays of shape
+        (len(ts), number of parameters). The forward sensitivity equations of the saddle path are
+        integrated along with adaptive reverse shooting, starting from the steady state sensitivities
+        (up to terms of order eps), and the time at which capital reaches K0 is then held fixed.
+
+        """
+        ts = np.asarray(ts, dtype=float)
+        result = self._integrate_saddle_path(K0, method, max_duration, eps, sensitivities=True, **solver_kwargs)
+        if result.t_events[1].size > 0:
+            raise ValueError("Saddle path reaches q = 1 (zero investment) before capital reaches K0.")
+        duration = result.t[-1]
+        if np.any(ts < 0) or np.any(ts > duration):
+            raise ValueError("Requested times lie outside [0, {}].".format(duration))
+
+        # perturbing a parameter shifts the time at which the reverse path reaches K0
+        number_parameters = len(SENSITIVITY_PARAMETERS)
+        end = result.y[:, -1]
+        duration_derivatives = end[2 + number_parameters:] / self._capital_dot(end[0], end[1])
+
+        X = result.sol(duration - ts)
+        q, capital = X[0], X[1]
+        energy_price = self._compute_energy_prices(capital)
+        rhs = np.array([self._q_dot(q, capital, energy_price), self._capital_dot(q, capital)])
+        dq, dK = X[2:].reshape(2, number_parameters, -1) - rhs[:, np.newaxis] * duration_derivatives[:, np.newaxis]
+        price_derivatives = self._price_parameter_derivatives(capital, energy_price)
+        dp = price_derivatives + self._compute_energy_price_derivative(capital, energy_price) * dK
+        sensitivities = Sensitivities(SENSITIVITY_PARAMETERS, dq.T, dK.T, dp.T)
+        if elasticities:
+            return self._elasticities(sensitivities, q[:, np.newaxis], capital[:, np.newaxis],
+                                      energy_price[:, np.newaxis])
+        return sensitivities
+
+    def _cache_key(self, kind, **options):
+        """Key of a result of the given kind for this model's parameters and the solver options."""
+        market = self._energy_market
+        model = {'prices': (self._capital_price, self._fossil_fuel_price, self._interest_rate),
+                 'market_clearing_method': self._market_clearing_method,
+                 'price_surrogate_rtol': self._price_surrogate_rtol}
+        return self._cache.key(kind, parameters(market.consumer), parameters(market.non_renewable_sector),
+                               parameters(market.renewable_sector), model, options)
+
+    def _cached(self, kind, compute, **options):
+        """
+        Result of compute(), looked up in (or stored to) the cache if the model has one and the options
+        can be part of a cache key.
+
+        """
+        if self._cache is None:
+            return compute()
+        try:
+            key = self._cache_key(kind, **options)
+        except TypeError:  # options that cannot be hashed (e.g., a jac callable) are solved without caching
+            result = compute()
+        else:
+            result = self._cache.get_or_compute(key, compute)
+
+        # store the price surrogate whenever a computation extended it
+        surrogate = self._energy_price_surrogate
+        if surrogate is not None and surrogate.number_fits > self._stored_surrogate_fits:
+            self._cache.put(self._cache_key('energy_price_surrogate'), surrogate.state)
+            self._stored_surrogate_fits = surrogate.number_fits
+        return result
+
+    def _elasticities(self, sensitivities, q, capital, energy_price):
+        """Convert derivatives with respect to SENSITIVITY_PARAMETERS to elasticities."""
+        values = np.array([self._capital_price, self._fossil_fuel_price, self._interest_rate,
+                           self._energy_market.renewable_sector.params.mu,
+                           self._energy_market.non_renewable_sector.params.phi])
+        return Sensitivities(SENSITIVITY_PARAMETERS, sensitivities.q * values / q, sensitivities.capital * values / capital,
+                             sensitivities.energy_price * values / energy_price)
+
+    def _path_diagnostics(self, diagnostics, qs, Ks, deg=35):
+        """Diagnostics passed to a plot_* method, or computed from the arrays ts, qs and Ks it used to take."""
+        if isinstance(diagnostics, TrajectoryDiagnostics):
+            return diagnostics
+        if qs is None:  # only the energy price is plotted, which does not depend on q
+            qs = np.ones(np.shape(Ks))
+        return self.trajectory_diagnostics(diagnostics, qs, Ks, deg)
+
+    def _find_equilibrium(self):
+        instrumentation.count('equilibrium_solves')
+        with instrumentation.stage('equilibrium'):
+            equilibrium_q = self._energy_market.non_renewable_sector.equilibrium_q
+            equilibrium_capital = self.q_dot_locus(equilibrium_q, self._equilibrium_capital_guess)
+        return np.array([equilibrium_q, equilibrium_capital])
 
     def _compute_energy_price(self, capital):
-        """Can this be vectorized?"""
+        """Clear the market, warm starting from the previously cleared price (consecutive ODE steps are close)."""
+        if self._energy_price_surrogate is not None:
+            return self._energy_price_surrogate(capital)
         prices = (self._capital_price, self._fossil_fuel_price, self._interest_rate)
-        return self._energy_market.find_market_price(capital, *prices)
-
-    def _compute_non_renewable_sector_output(self, capital, energy_price):
-        prices = (energy_price, self._fossil_fuel_price)
-        return self._energy_market.non_renewable_sector.output(capital, *prices)
-
-    def _compute_renewable_sector_output(self, energy_price):
-        prices = (self._capital_price, energy_price, self._interest_rate)
-        return self._energy_market.renewable_sector.output(*prices)
-
-    def _compute_non_renewable_sector_profits(self, q, capital, energy_price):
-        prices = (self._capital_price, energy_price, self._fossil_fuel_price)
-        return self._energy_market.non_renewable_sector.profits(q, capital, *prices)
+        self._energy_price_guess = self._energy_market.find_market_price(capital, *prices,
+                                                                         method=self._market_clearing_method,
+                                                                         initial_guess=self._energy_price_guess)
+        return self._energy_price_guess
+
+    def _compute_energy_prices(self, capital, initial_guess=None):
+        """Vectorized version of _compute_energy_price for arrays of capital, optionally warm started."""
+        if self._energy_price_surrogate is not None:
+            return self._energy_price_surrogate(capital)
+        elif initial_guess is not None:
+            prices = (self._capital_price, self._fossil_fuel_price, self._interest_rate)
+            return self._energy_market.find_market_prices(capital, *prices, method='newton', initial_guess=initial_guess)
+        return self._find_energy_prices(capital)
+
+    def _compute_energy_price_derivative(self, capital, energy_price):
+        """Derivative of the market clearing energy price with respect to capital."""
+        if self._energy_price_surrogate is not None:
+            return energy_price * self._energy_price_surrogate.elasticity(capital) / capital
+        prices = (self._capital_price, self._fossil_fuel_price, self._interest_rate)
+        return self._energy_market.market_price_capital_derivative(capital, energy_price, *prices)
 
-    def _compute_renewable_sector_profits(self, energy_price, energy_price_growth):
-        prices = (self._capital_price, energy_price, energy_price_growth, self._interest_rate)
-        return self._energy_market.renewable_sector.profits(*prices)
+    def _find_energy_prices(self, capital):
+        prices = (self._capital_price, self._fossil_fuel_price, self._interest_rate)
+        return self._energy_market.find_market_prices(capital, *prices)
 
     def _capital_dot(self, q, capital):
         return self._energy_market.non_renewable_sector.equation_motion_capital(q, capital)
@@ -160,36 +546,298 @@ class TransitionDynamicsModel:
         return self._energy_market.non_renewable_sector.equation_motion_q(q, capital, *prices)
 
     def _rhs(self, t, q, capital):
+        instrumentation.count('rhs_calls')
+        if not (q >= 1 and capital > 0):  # e.g., a trial stage of a step the solver will reject
+            return [np.nan, np.nan]
         energy_price = self._compute_energy_price(capital)
         return [self._q_dot(q, capital, energy_price), self._capital_dot(q, capital)]
 
-    def _solve_reverse_shooting(self, t0, K0, dt, integrator, **solver_kwargs):
+    def _jacobian(self, t, q, capital):
+        """Analytic Jacobian of the (q, K) system, with dp/dK from the implicit function theorem."""
+        instrumentation.count('jacobian_calls')
+        if not (q >= 1 and capital > 0):
+            return np.full((2, 2), np.nan)
+        return self._equations_motion_jacobian(q, capital, self._compute_energy_price(capital))
 
-        # compute initial step size
-        eps = 1e-15
-        step = np.array([0, -eps]) if K0 <= self.equilibrium[1] else np.array([0, eps])
-        initial_condition = (1 + step) * self.equilibrium
+    def _equations_motion_jacobian(self, q, capital, energy_price):
+        energy_price_derivative = self._compute_energy_price_derivative(capital, energy_price)
+        prices = (self._capital_price, energy_price, energy_price_derivative, self._fossil_fuel_price, self._interest_rate)
+        return self._energy_market.non_renewable_sector.equations_motion_jacobian(q, capital, *prices)
 
-        # set up the integrator
-        f = lambda t, X: -1 * np.array(self._rhs(t, X[0], X[1]))
-        _ode = integrate.ode(f)
+    def _price_parameter_derivatives(self, capital, energy_price):
+        """Derivatives of the market clearing energy price with respect to SENSITIVITY_PARAMETERS for fixed capital."""
+        prices = (self._capital_price, self._fossil_fuel_price, self._interest_rate)
+        derivatives = self._energy_market.market_price_parameter_derivatives(capital, energy_price, *prices)
+        zero = np.zeros(np.shape(capital))
+        return np.array([derivatives.get(parameter, zero) for parameter in SENSITIVITY_PARAMETERS])
+
+    def _rhs_parameter_derivatives(self, q, capital, energy_price):
+        """
+        Derivatives of (q_dot, K_dot) with respect to SENSITIVITY_PARAMETERS for fixed (q, capital),
+        including the response of the market clearing energy price, and the price derivatives.
+
+        """
+        price_derivatives = self._price_parameter_derivatives(capital, energy_price)
+        partials = self._energy_market.non_renewable_sector.equations_motion_parameter_derivatives(
+            q, capital, self._capital_price, energy_price, self._fossil_fuel_price, self._interest_rate)
+        derivatives = np.zeros((2,) + price_derivatives.shape)
+        for i, parameter in enumerate(SENSITIVITY_PARAMETERS):
+            dq_dot, dK_dot = partials.get(parameter, (0.0, 0.0))
+            derivatives[0, i] = dq_dot + partials['energy_price'][0] * price_derivatives[i]
+            derivatives[1, i] = dK_dot
+        return derivatives, price_derivatives
+
+    def _reverse_rhs(self, t, X):
+        return -1 * np.array(self._rhs(t, X[0], X[1]))
+
+    def _reverse_jacobian(self, t, X):
+        return -1 * np.array(self._jacobian(t, X[0], X[1]))
+
+    def _reverse_sensitivity_rhs(self, t, X):
+        """Reverse time equations of motion augmented with the sensitivities of (q, K) to the parameters."""
+        instrumentation.count('rhs_calls')
+        q, capital = X[0], X[1]
+        if not (q >= 1 and capital > 0):
+            return np.full(X.shape, np.nan)
+        energy_price = self._compute_energy_price(capital)
+        jacobian = np.array(self._equations_motion_jacobian(q, capital, energy_price))
+        rhs_derivatives, _ = self._rhs_parameter_derivatives(q, capital, energy_price)
+        sensitivities = jacobian.dot(X[2:].reshape(2, -1)) + rhs_derivatives
+        rhs = [self._q_dot(q, capital, energy_price), self._capital_dot(q, capital)]
+        return -1 * np.concatenate([rhs, sensitivities.ravel()])
+
+    def _solve_collocation_horizon(self, K0, T, degree, max_degree, tol, maxiter, initial_guess):
+        """Collocation with the horizon doubled until the linearized terminal condition is accurate."""
+        equilibrium = self.equilibrium
+        eigenvalue, slope = self._stable_eigenpair(equilibrium)
+        if initial_guess is None:
+            coefs = None
+        else:
+            degree = initial_guess.degree
+            coefs = np.concatenate((initial_guess.log_q_minus_one_polynomial.coef,
+                                    (initial_guess.log_capital_polynomial - np.log(initial_guess.equilibrium[1])).coef))
+        if T is None and initial_guess is not None:
+            T = initial_guess.t_span[1]
+        elif T is None:
+            T = 2 * np.log(tol) / eigenvalue
+
+        for _ in range(_MAX_HORIZON_DOUBLINGS + 1):
+            trajectory = self._solve_collocation(K0, T, degree, max_degree, tol, maxiter, eigenvalue, slope, coefs)
+            terminal_gap = trajectory.log_capital_polynomial(T) - np.log(equilibrium[1])
+            if terminal_gap**2 <= tol:
+                return trajectory
+            T, coefs = 2 * T, None
+        raise ValueError("Collocation path is still {} (in log capital) from the steady state at T={}.".format(
+            terminal_gap, T / 2))
+
+    def _solve_collocation(self, K0, T, degree, max_degree, tol, maxiter, eigenvalue, slope, coefs=None):
+        """Collocation with degree refinement on a fixed horizon T."""
+        equilibrium = self.equilibrium
+
+        # initial guess from the linearized saddle path, keeping q above 1
+        if coefs is None:
+            ts = self._collocation_times(chebyshev.chebpts1(degree + 1), T)
+            capital = 1 + (K0 / equilibrium[1] - 1) * np.exp(eigenvalue * ts)
+            q_minus_one = np.maximum(equilibrium[0] - 1 + equilibrium[1] * slope * (capital - 1),
+                                     0.5 * (equilibrium[0] - 1))
+            coefs = np.concatenate((chebyshev.chebfit(chebyshev.chebpts1(degree + 1), np.log(q_minus_one), degree),
+                                    chebyshev.chebfit(chebyshev.chebpts1(degree + 1), np.log(capital), degree)))
+
+        degrees = [degree]
+        while 2 * degrees[-1] <= max_degree:
+            degrees.append(2 * degrees[-1])
+
+        total_iterations = 0
+        for degree in degrees:
+            # warm start a higher degree by padding the coefficients with zeros
+            a, b = np.split(coefs, 2)
+            coefs = np.concatenate((np.pad(a, (0, degree + 1 - a.size)), np.pad(b, (0, degree + 1 - b.size))))
+            coefs, iterations, converged = self._collocation_newton(coefs, K0, slope, T, maxiter)
+            total_iterations += iterations
+            instrumentation.count('collocation_newton_iterations', iterations)
+            # a degree too low to represent the path can stall Newton, so that also triggers refinement
+            if converged:
+                trajectory = self._collocation_trajectory(coefs, T, total_iterations)
+                if trajectory.max_residual <= tol:
+                    return trajectory
+        if converged:
+            raise ValueError("Collocation residuals {} exceed tol={} at the maximum degree {}.".format(
+                trajectory.max_residual, tol, degree))
+        raise ValueError("Collocation Newton iteration did not converge at the maximum degree {}.".format(degree))
+
+    def _collocation_rhs(self, u, k, energy_price_guess=None):
+        """
+        Equations of motion for u = log(q - 1) and k = log(K / K_eq) and their Jacobian, at arrays of
+        points with the market cleared in one batched call.
+
+        """
+        equilibrium = self.equilibrium
+        q, capital = 1 + np.exp(u), equilibrium[1] * np.exp(k)
+        energy_prices = self._compute_energy_prices(capital, energy_price_guess)
+        q_dot, capital_dot = self._q_dot(q, capital, energy_prices), self._capital_dot(q, capital)
+        (dqq, dqK), (dKq, dKK) = self._equations_motion_jacobian(q, capital, energy_prices)
+
+        u_dot, k_dot = q_dot / (q - 1), capital_dot / capital
+        jacobian = [[dqq - u_dot, dqK * capital / (q - 1)],
+                    [dKq * (q - 1) / capital, dKK - k_dot]]
+        return u_dot, k_dot, jacobian, energy_prices
+
+    def _collocation_system(self, coefs, K0, slope, T, energy_price_guess=None):
+        """
+        Residuals of the collocation equations and their Jacobian with respect to the Chebyshev coefficients
+        of u = log(q - 1) and k = log(K / K_eq), with the equations of motion imposed at the roots of the
+        Chebyshev polynomial of the same degree.
+
+        """
+        equilibrium = self.equilibrium
+        degree = coefs.size // 2 - 1
+        x = chebyshev.chebpts1(degree)
+        V = chebyshev.chebvander(x, degree)
+        dV = (2 / T) * chebyshev.chebvander(x, degree - 1).dot(chebyshev.chebder(np.eye(degree + 1)))
+
+        a, b = np.split(coefs, 2)
+        (u_dot, k_dot, ((duu, duk), (dku, dkk)), energy_prices) = self._collocation_rhs(V.dot(a), V.dot(b),
+                                                                                        energy_price_guess)
+
+        # K(0) = K0 and q(T) - q_eq = slope * (K(T) - K_eq)
+        u_T, k_T = chebyshev.chebval(1, a), chebyshev.chebval(1, b)
+        q_T_minus_one, K_T = np.exp(u_T), equilibrium[1] * np.exp(k_T)
+        boundary_residuals = [chebyshev.chebval(-1, b) - np.log(K0 / equilibrium[1]),
+                              q_T_minus_one - (equilibrium[0] - 1) - slope * (K_T - equilibrium[1])]
+        boundary = np.zeros((2, coefs.size))
+        boundary[0, degree + 1:] = (-1)**np.arange(degree + 1)
+        boundary[1, :degree + 1], boundary[1, degree + 1:] = q_T_minus_one, -slope * K_T
+
+        residuals = np.concatenate((dV.dot(a) - u_dot, dV.dot(b) - k_dot, boundary_residuals))
+        jacobian = np.vstack((np.hstack((dV - duu[:, np.newaxis] * V, -duk[:, np.newaxis] * V)),
+                              np.hstack((-dku[:, np.newaxis] * V, dV - dkk[:, np.newaxis] * V)),
+                              boundary))
+        return residuals, jacobian, energy_prices
+
+    def _collocation_newton(self, coefs, K0, slope, T, maxiter, rtol=1e-10):
+        """
+        Damped Newton iteration on the collocation equations, backtracking until the residuals decrease.
+        Returns the coefficients, the number of iterations and whether the iteration converged.
+
+        """
+        residuals, jacobian, energy_prices = self._collocation_system(coefs, K0, slope, T)
+        for iterations in range(1, maxiter + 1):
+            step = np.linalg.solve(jacobian, -residuals)
+            if np.max(np.abs(step)) <= rtol * max(1.0, np.max(np.abs(coefs))):
+                return coefs + step, iterations, True
+
+            norm, alpha = np.linalg.norm(residuals), 1.0
+            while alpha >= 1e-8:
+                trial = coefs + alpha * step
+                try:
+                    with np.errstate(over='ignore', invalid='ignore'):
+                        system = self._collocation_system(trial, K0, slope, T, energy_prices)
+                except ValueError:  # market failed to clear at some node
+                    system = None
+                if system is not None and np.linalg.norm(system[0]) <= (1 - 1e-4 * alpha) * norm:
+                    break
+                alpha /= 2
+            else:
+                return coefs, iterations, False
+            coefs = trial
+            residuals, jacobian, energy_prices = system
+        return coefs, maxiter, False
+
+    def _collocation_trajectory(self, coefs, T, iterations):
+        """Wrap collocation coefficients in a trajectory, with residuals checked on a fine grid."""
+        a, b = np.split(coefs, 2)
+        log_equilibrium_capital = np.log(self.equilibrium[1])
+        u = np.polynomial.Chebyshev(a, domain=[0, T])
+        k = np.polynomial.Chebyshev(b, domain=[0, T])
+
+        ts = np.linspace(0, T, 10 * a.size + 1)
+        u_dot, k_dot = self._collocation_rhs(u(ts), k(ts))[:2]
+        residuals = np.concatenate((u.deriv()(ts) - u_dot, k.deriv()(ts) - k_dot))
+        return CollocationTrajectory(u, k + log_equilibrium_capital, np.max(np.abs(residuals)), iterations,
+                                     self.equilibrium)
+
+    @staticmethod
+    def _collocation_times(x, T):
+        """Map Chebyshev points on [-1, 1] onto times in [0, T]."""
+        return 0.5 * T * (x + 1)
+
+    def _integrate_saddle_path(self, K0, method, max_duration, eps, sensitivities=False, **solver_kwargs):
+        """
+        Reverse shoot from the steady state until capital reaches K0 (or q reaches 1), keeping dense output.
+        With sensitivities=True the state also holds the derivatives of (q, K) with respect to
+        SENSITIVITY_PARAMETERS, starting from those of the steady state.
+
+        """
+        equilibrium = self.equilibrium
+        initial_condition = self._saddle_path_initial_condition(K0, equilibrium, eps)
+        rhs = self._reverse_rhs
+        if sensitivities:
+            steady_state = self.equilibrium_sensitivities()
+            initial_condition = np.concatenate([initial_condition, steady_state.q, steady_state.capital])
+            rhs = self._reverse_sensitivity_rhs
+
+        reached_K0 = lambda t, X: X[1] - K0
+        reached_K0.terminal = True
+        reached_K0.direction = -1 if K0 <= equilibrium[1] else 1
+
+        # investment demand is undefined for q < 1, where the right-hand side is NaN and steps are rejected,
+        # so the event is placed just above q = 1 for accepted steps to reach it
+        left_domain = lambda t, X: X[0] - 1 - eps * (equilibrium[0] - 1)
+        left_domain.terminal = True
+
+        if method in ('Radau', 'BDF', 'LSODA') and not sensitivities:
+            solver_kwargs.setdefault('jac', self._reverse_jacobian)
+
+        result = integrate.solve_ivp(rhs, (0, max_duration), initial_condition, method,
+                                     events=(reached_K0, left_domain), dense_output=True, **solver_kwargs)
+        if result.status != 1:
+            raise ValueError("Capital did not reach K0: {}".format(result.message))
+        return result
+
+    def _saddle_path_initial_condition(self, K0, equilibrium, eps):
+        """Step a relative distance eps from the steady state along the stable eigenvector, towards K0."""
+        step = eps * equilibrium[1] * np.array([self._stable_eigenpair(equilibrium)[1], 1])
+        return equilibrium - step if K0 <= equilibrium[1] else equilibrium + step
+
+    def _stable_eigenpair(self, equilibrium):
+        """Stable eigenvalue of the linearized system and the slope dq/dK of the saddle path at the steady state."""
+        eigenvalues, eigenvectors = np.linalg.eig(self._jacobian(0, *equilibrium))
+        i = np.argmin(eigenvalues.real)
+        stable = eigenvectors[:, i].real
+        return eigenvalues[i].real, stable[0] / stable[1]
+
+    def _reverse_shooting_steps(self, t0, K0, dt, integrator, eps=1e-6, **solver_kwargs):
+        """Integrate backwards from the steady state towards K0, yielding (t, y) at every step of size dt."""
+        equilibrium = self.equilibrium
+        initial_condition = self._saddle_path_initial_condition(K0, equilibrium, eps)
+
+        # set up the integrator (explicit integrators ignore the Jacobian)
+        if integrator in ('vode', 'lsoda') and _jacobian_is_transposed(integrator):
+            jacobian = lambda t, X: self._reverse_jacobian(t, X).T
+        else:
+            jacobian = self._reverse_jacobian
+        _ode = integrate.ode(self._reverse_rhs, jacobian)
         _ode.set_integrator(integrator, **solver_kwargs)
         _ode.set_initial_value(initial_condition, t0)
 
-        ts = np.array([t0])
-        solution = initial_condition
+        yield t0, initial_condition
 
-        if K0 <= self.equilibrium[1]:
+        if K0 <= equilibrium[1]:
 
             while _ode.successful() and _ode.y[1] >= K0:
-                ts = np.append(ts, _ode.t+dt)
-                _ode.integrate(_ode.t+dt)
-                solution = np.vstack((solution, _ode.y))
+                t = _ode.t + dt
+                _ode.integrate(t)
+                yield t, _ode.y
         else:
 
             while _ode.successful() and _ode.y[1] <= K0:
-                ts = np.append(ts, _ode.t+dt)
-                _ode.integrate(_ode.t+dt)
-                solution = np.vstack((solution, _ode.y))
-
-        return ts, solution[::-1, :]
+                t = _ode.t + dt
+                _ode.integrate(t)
+                yield t, _ode.y
+
+    def _solve_reverse_shooting(self, t0, K0, dt, integrator, filename=None, **solver_kwargs):
+        with TrajectoryBuffer(3, filename=filename) as buffer:
+            for t, y in self._reverse_shooting_steps(t0, K0, dt, integrator, **solver_kwargs):
+                buffer.append((t, y[0], y[1]))
+            trajectory = buffer.finalize()
+        return trajectory[:, 0], trajectory[::-1, 1:]
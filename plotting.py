@@ -0,0 +1,69 @@
+"""
+Figures of transition paths from the TrajectoryDiagnostics of a TransitionDynamicsModel. This module
+is only imported by the plot_* methods on first use, so that the compute-only core (and every sweep
+worker) never pays for importing matplotlib.
+
+"""
+import matplotlib.pyplot as plt
+
+
+def plot_sector_costs(diagnostics):
+
+    fig, axes = plt.subplots(1, 2)
+
+    axes[0].plot(diagnostics.ts, diagnostics.non_renewable.costs, label=r"$C_{NR}(t)$")
+    axes[0].legend(frameon=False)
+
+    axes[1].plot(diagnostics.ts, diagnostics.renewable.costs, label=r"$C_{R}(t)$")
+    axes[1].legend(frameon=False)
+
+    fig.suptitle("Costs", fontsize=25, y=1.05, family='serif')
+    fig.tight_layout()
+
+    return fig
+
+
+def plot_sector_profits(diagnostics):
+
+    fig, axes = plt.subplots(1, 2)
+
+    axes[0].plot(diagnostics.ts, diagnostics.non_renewable.profits, label=r"$\Pi_{NR}(t)$")
+    axes[0].legend(frameon=False)
+
+    axes[1].plot(diagnostics.ts, diagnostics.renewable.profits, label=r"$\Pi_{R}(t)$")
+    axes[1].legend(frameon=False)
+
+    fig.suptitle("Profits", fontsize=25, y=1.05, family='serif')
+    fig.tight_layout()
+
+    return fig
+
+
+def plot_energy_price(diagnostics):
+
+    fig, ax = plt.subplots(1, 1)
+
+    ax.plot(diagnostics.ts, diagnostics.energy_price, label=r"$p_E(t)$")
+    ax.legend(frameon=False)
+
+    ax.set_title("Energy Price", fontsize=25, family='serif')
+
+    return fig
+
+
+def plot_sector_energy_output(diagnostics):
+
+    fig, axes = plt.subplots(1, 2)
+
+    axes[0].plot(diagnostics.ts, diagnostics.non_renewable.output / diagnostics.energy_demand, label=r"$E_{NR}(t)$")
+    axes[0].set_ylim(0, 1)
+    axes[0].legend(frameon=False)
+
+    axes[1].plot(diagnostics.ts, diagnostics.renewable.output / diagnostics.energy_demand, label=r"$E_{R}(t)$")
+    axes[1].set_ylim(0, 1)
+    axes[1].legend(frameon=False)
+
+    fig.suptitle("Energy output", fontsize=25, y=1.05, family='serif')
+    fig.tight_layout()
+
+    return fig
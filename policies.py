@@ -0,0 +1,29 @@
+import numpy as np
+from scipy import interpolate
+
+
+class SaddlePathPolicy:
+
+    def __init__(self, capital, q, slopes, requested_domain):
+        """
+        Cubic Hermite interpolant of the saddle path policy function q*(K) through points (capital, q)
+        with exact slopes dq/dK taken from the equations of motion.
+
+        """
+        capital, i = np.unique(capital, return_index=True)
+        self._spline = interpolate.CubicHermiteSpline(capital, np.asarray(q)[i], np.asarray(slopes)[i])
+        self.domain = (capital[0], capital[-1])
+        self.requested_domain = requested_domain
+
+    def __call__(self, capital, extrapolate=False):
+        """Value of Tobin's q on the saddle path for the given capital value(s)."""
+        capital = np.asarray(capital)
+        lower, upper = self.domain
+        if not extrapolate and (np.any(capital < lower) or np.any(capital > upper)):
+            raise ValueError("Capital outside of the policy function domain [{}, {}].".format(lower, upper))
+        return self._spline(capital)
+
+    def covers(self, min_capital, max_capital):
+        """Check whether the policy function was computed for capital values in [min_capital, max_capital]."""
+        lower, upper = self.requested_domain
+        return lower <= min_capital and max_capital <= upper
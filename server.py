@@ -0,0 +1,212 @@
+"""
+Local JSON service answering scenario queries (equilibria and transitions) from a pool of worker
+processes. Identical queries in flight share one solve and answers are kept in a bounded cache:
+
+    python server.py --port 8765 --processes 4
+
+    POST /equilibrium  {"scenario": {...}}
+    POST /trajectory   {"scenario": {...}, "ts": [...], "initial_capital_ratio": 0.5}
+    GET  /stats
+
+where a scenario has the keys of utils.SCENARIO_COLUMNS.
+
+"""
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import json
+
+import numpy as np
+
+from caches import ResultCache
+import sweeps
+from utils import SCENARIO_COLUMNS
+
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 422: 'Unprocessable Entity'}
+
+
+class ScenarioServer:
+
+    def __init__(self, host='127.0.0.1', port=8765, processes=None, cache=None, executor=None):
+        """
+        Serve scenario queries over HTTP on host:port, solving them on a pool of processes (or the given
+        executor). Answers are stored in cache, a ResultCache (by default in memory only), so repeated
+        queries are answered without solving, and a trajectory answer also serves its equilibrium. A pool
+        of threads may be given as the executor: every solve builds its own model, solves with solve_ivp
+        rather than the non re-entrant integrate.ode integrators, and collects statistics per thread.
+
+        """
+        self.host = host
+        self.port = port
+        self.cache = ResultCache() if cache is None else cache
+        self.stats = collections.Counter()  # queries, cache hits, coalesced queries and solves
+
+        self._processes = processes
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._in_flight = {}  # cache key -> future of the solve in progress
+        self._server = None
+
+    async def query(self, kind, request):
+        """
+        Answer a query of the given kind ('equilibrium' or 'trajectory') for a request dict such as the
+        JSON body of a POST, from the cache, by joining an identical solve in flight, or by solving it.
+
+        """
+        request = _parse_request(kind, request)
+        key = self.cache.key(kind, request)
+        self.stats['queries'] += 1
+        missing = object()
+        answer = self.cache.get(key, missing)
+        if answer is not missing:
+            self.stats['hits'] += 1
+            return answer
+
+        future = self._in_flight.get(key)
+        if future is None:
+            if self._executor is None:
+                self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self._processes)
+            future = asyncio.get_running_loop().run_in_executor(self._executor, _solve, kind, request)
+            future.add_done_callback(functools.partial(self._finish, kind, request, key))
+            self._in_flight[key] = future
+            self.stats['solves'] += 1
+        else:
+            self.stats['coalesced'] += 1
+        # a client that goes away must not cancel a solve shared with others
+        return await asyncio.shield(future)
+
+    async def start(self):
+        """Start listening (with port=0 an ephemeral port is chosen and stored in port)."""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """Stop listening and shut down the worker pool."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def _finish(self, kind, request, key, future):
+        """Cache the answer of a finished solve (and, for a trajectory, its equilibrium)."""
+        del self._in_flight[key]
+        if future.cancelled() or future.exception() is not None:
+            return
+        answer = future.result()
+        self.cache.put(key, answer)
+        if kind == 'trajectory':
+            equilibrium = {name: answer[name] for name in _EQUILIBRIUM_FIELDS}
+            self.cache.put(self.cache.key('equilibrium', {'scenario': request['scenario']}), equilibrium)
+
+    async def _handle(self, reader, writer):
+        """Answer one HTTP request on a connection and close it."""
+        try:
+            method, path, _ = (await reader.readline()).decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+            status, answer = await self._respond(method, path, body)
+        except (ValueError, UnicodeDecodeError, asyncio.IncompleteReadError) as error:
+            status, answer = 400, {'error': str(error)}
+
+        payload = json.dumps(answer).encode()
+        head = 'HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\nConnection: close\r\n\r\n'
+        writer.write(head.format(status, _REASONS[status], len(payload)).encode('latin-1') + payload)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _respond(self, method, path, body):
+        """Status and JSON answer for a request."""
+        if method == 'GET' and path == '/stats':
+            return 200, dict(self.stats, in_flight=len(self._in_flight), cache_hits=self.cache.hits,
+                             cache_misses=self.cache.misses)
+        elif method == 'POST' and path in ('/equilibrium', '/trajectory'):
+            request = json.loads(body.decode('utf-8') or '{}')
+            try:
+                return 200, await self.query(path[1:], request)
+            except _RequestError:
+                raise
+            except Exception as error:  # a scenario the solvers cannot handle must not take the server down
+                return 422, {'error': '{}: {}'.format(type(error).__name__, error)}
+        return 404, {'error': 'Unknown endpoint {} {}.'.format(method, path)}
+
+
+class _RequestError(ValueError):
+    """Malformed query."""
+
+
+_EQUILIBRIUM_FIELDS = ('equilibrium_q', 'equilibrium_capital', 'equilibrium_energy_price')
+
+
+def _parse_request(kind, request):
+    """Canonical form of a query, with every scenario parameter as a float."""
+    if kind not in ('equilibrium', 'trajectory'):
+        raise _RequestError("Unknown query {!r}.".format(kind))
+    scenario = request.get('scenario') if isinstance(request, dict) else None
+    if not isinstance(scenario, dict):
+        raise _RequestError("A query needs a scenario object.")
+    missing = [column for column in SCENARIO_COLUMNS if column not in scenario]
+    if missing:
+        raise _RequestError("Scenario is missing {}.".format(missing))
+    try:
+        parsed = {'scenario': {column: float(scenario[column]) for column in SCENARIO_COLUMNS}}
+        if kind == 'trajectory':
+            parsed['ts'] = [float(t) for t in request['ts']]
+            parsed['initial_capital_ratio'] = float(request.get('initial_capital_ratio', 0.5))
+    except (KeyError, TypeError, ValueError) as error:
+        raise _RequestError("Invalid query: {!r}.".format(error))
+    return parsed
+
+
+def _solve(kind, request):
+    """
+    Solve a parsed query in a worker, returning a JSON serializable answer. All state lives in the model
+    built here, so queries can be solved concurrently in threads of one process.
+
+    """
+    model = sweeps.build_model(request['scenario'])
+    q, capital = model.equilibrium
+    answer = dict(zip(_EQUILIBRIUM_FIELDS, (float(q), float(capital), float(model._compute_energy_price(capital)))))
+    if kind == 'trajectory':
+        ts = np.array(request['ts'])
+        solution = model.solve_policy(ts, request['initial_capital_ratio'] * capital)
+        answer.update(ts=ts.tolist(), q=solution[:, 0].tolist(), capital=solution[:, 1].tolist())
+    return answer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--processes', type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument('--cache-directory', help="also keep answers on disk in this directory")
+    parser.add_argument('--max-entries', type=int, default=4096, help="answers kept in memory")
+    args = parser.parse_args(argv)
+
+    server = ScenarioServer(args.host, args.port, args.processes,
+                            ResultCache(args.cache_directory, max_entries=args.max_entries))
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+import collections
+import math
+
+import numpy as np
+
+
+BatchRootResults = collections.namedtuple('BatchRootResults', ['root', 'iterations', 'function_calls', 'converged'])
+
+_LARGEST, _SMALLEST = np.finfo(float).max, np.finfo(float).tiny
+
+
+def expand_log_bracket(f, lower, upper, args=(), factor=1e6, maxiter=50, full_output=False):
+    """
+    Widen the brackets [lower, upper] of a monotone function f geometrically until
+    f changes sign on each of them, without leaving the range of positive normal
+    floats. Brackets are then narrowed by bisection in log(x) until f is finite
+    at both end points (e.g., where supply is unbounded), as interpolating root
+    finders such as brentq require. Works elementwise on arrays of brackets
+    (lower and upper must be positive). Raises ValueError if some bracket still
+    has no sign change after maxiter steps (or no finite end points after
+    maxiter bisections), unless full_output is True, in which case a boolean
+    array flagging the brackets that do is returned as well.
+
+    """
+    lower, upper = np.array(lower, dtype=float), np.array(upper, dtype=float)
+    f_lower, f_upper = f(lower, *args), f(upper, *args)
+    unbracketed = np.sign(f_lower) == np.sign(f_upper)
+    expanding = unbracketed
+    for _ in range(maxiter):
+        # for a monotone function the root lies beyond the end point closest to zero, and brackets whose
+        # end point has reached the end of the float range there have no root
+        move_upper = expanding & (np.abs(f_upper) <= np.abs(f_lower))
+        move_lower = expanding & ~move_upper
+        expanding = (move_upper & (upper < _LARGEST)) | (move_lower & (lower > _SMALLEST))
+        if not np.any(expanding):
+            break
+        move_upper, move_lower = move_upper & expanding, move_lower & expanding
+        with np.errstate(over='ignore', under='ignore'):  # clamped after scaling, as _LARGEST / factor can be tiny
+            upper = np.where(move_upper, np.minimum(upper * factor, _LARGEST), upper)
+            lower = np.where(move_lower, np.maximum(lower / factor, _SMALLEST), lower)
+        f_upper = np.where(move_upper, f(upper, *args), f_upper)
+        f_lower = np.where(move_lower, f(lower, *args), f_lower)
+        unbracketed = np.sign(f_lower) == np.sign(f_upper)
+        expanding = expanding & unbracketed
+
+    for _ in range(maxiter):
+        infinite = ~unbracketed & ~(np.isfinite(f_lower) & np.isfinite(f_upper))
+        if not np.any(infinite):
+            break
+        middle = np.sqrt(lower) * np.sqrt(upper)
+        f_middle = np.where(infinite, f(middle, *args), np.nan)
+        move_upper = infinite & (np.sign(f_middle) == np.sign(f_upper))
+        move_lower = infinite & ~move_upper
+        upper, f_upper = np.where(move_upper, middle, upper), np.where(move_upper, f_middle, f_upper)
+        lower, f_lower = np.where(move_lower, middle, lower), np.where(move_lower, f_middle, f_lower)
+    else:
+        unbracketed |= ~(np.isfinite(f_lower) & np.isfinite(f_upper))
+
+    if full_output:
+        return lower, upper, ~unbracketed
+    elif np.any(unbracketed):
+        raise ValueError("Failed to bracket a root.")
+    return lower, upper
+
+
+def log_illinois(f, lower, upper, args=(), rtol=4 * np.finfo(float).eps, maxiter=200, max_expansions=50):
+    """
+    Vectorized Illinois (modified regula falsi) root finder for positive roots.
+
+    Iterates in log(x) so that brackets spanning many orders of magnitude behave
+    well, and every element of the brackets is solved in the same array pass.
+    Returns a BatchRootResults whose fields are arrays of the broadcast shape;
+    elements whose bracket has no sign change after max_expansions steps of
+    expand_log_bracket, or whose bracket shrinks onto a jump to a non-finite
+    value of f (e.g., where supply overflows) rather than onto a root, have a
+    NaN root and are not converged.
+
+    """
+    lower, upper, bracketed = expand_log_bracket(f, lower, upper, args, maxiter=max_expansions, full_output=True)
+    a, b = np.log(lower), np.log(upper)
+    fa, fb = f(lower, *args), f(upper, *args)
+    shape = a.shape
+
+    root = np.where(fa == 0, a, b)
+    converged = bracketed & ((fa == 0) | (fb == 0))
+    failed = np.zeros(shape, dtype=bool)
+    side = np.zeros(shape, dtype=int)
+    iterations = np.zeros(shape, dtype=int)
+    function_calls = 2
+
+    for _ in range(maxiter):
+        narrow = bracketed & ~converged & ~failed & (np.abs(b - a) <= rtol * np.maximum(1.0, np.abs(root)))
+        failed |= narrow & ~(np.isfinite(fa) & np.isfinite(fb))
+        converged |= narrow & ~failed
+        active = bracketed & ~converged & ~failed
+        if not np.any(active):
+            break
+
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            c = (a * fb - b * fa) / (fb - fa)
+        midpoint = 0.5 * (a + b)
+        # step at least half the tolerance inside the bracket, since an interpolated point that rounds onto
+        # an end point which is already (nearly) the root would otherwise leave only bisection of the bracket
+        step = 0.5 * rtol * np.maximum(1.0, np.abs(midpoint))
+        c = np.clip(c, np.minimum(a, b) + step, np.maximum(a, b) - step)
+        # bisect when one end point keeps being retained (f can span many orders of magnitude)
+        c = np.where(~np.isfinite(c) | (np.abs(b - a) <= 2 * step) | (np.abs(side) > 2), midpoint, c)
+
+        with np.errstate(over='ignore'):
+            fc = f(np.exp(c), *args)
+        function_calls += 1
+        iterations += active
+
+        same_as_b = active & (np.sign(fc) == np.sign(fb))
+        same_as_a = active & (np.sign(fc) == np.sign(fa)) & ~same_as_b
+        exact = active & (fc == 0)
+
+        # Illinois modification: halve the retained end point's value when it is kept twice
+        fa = np.where(same_as_b & (side < 0), 0.5 * fa, fa)
+        fb = np.where(same_as_a & (side > 0), 0.5 * fb, fb)
+        b, fb = np.where(same_as_b, c, b), np.where(same_as_b, fc, fb)
+        a, fa = np.where(same_as_a, c, a), np.where(same_as_a, fc, fa)
+        side = np.where(same_as_b, np.minimum(side, 0) - 1, np.where(same_as_a, np.maximum(side, 0) + 1, side))
+
+        root = np.where(active, c, root)
+        converged |= exact
+
+    return BatchRootResults(np.where(bracketed & ~failed, np.exp(root), np.nan), iterations, function_calls, converged)
+
+
+NewtonResults = collections.namedtuple('NewtonResults', BatchRootResults._fields + ('bracketed',))
+
+
+def log_newton(f, fprime, x0, lower, upper, args=(), rtol=4 * np.finfo(float).eps, maxiter=50, max_step=5.0):
+    """
+    Vectorized safeguarded Newton iteration in log(x) for positive roots.
+
+    Steps in log(x) are capped at max_step and any element that fails to converge
+    (or produces a non-finite iterate) is re-solved by log_illinois on the bracket
+    [lower, upper]. The bracketed field of the results flags those elements.
+    Initial guesses that are not positive finite floats (e.g., that underflowed)
+    start from the geometric mean of the bracket instead.
+
+    """
+    if all(np.ndim(value) == 0 for value in (x0, lower, upper) + tuple(args)):
+        return _scalar_log_newton(f, fprime, x0, lower, upper, args, rtol, maxiter, max_step)
+
+    arrays = np.broadcast_arrays(x0, *args)
+    x0, args = arrays[0].astype(float), tuple(arrays[1:])
+    x = np.log(np.where((x0 > 0) & (x0 < np.inf), x0, np.sqrt(lower) * np.sqrt(upper)))
+    shape = x.shape
+    converged = np.zeros(shape, dtype=bool)
+    failed = np.zeros(shape, dtype=bool)
+    iterations = np.zeros(shape, dtype=int)
+    function_calls = 0
+
+    for _ in range(maxiter):
+        active = ~converged & ~failed
+        if not np.any(active):
+            break
+        with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+            p = np.exp(x)
+            g, dg = f(p, *args), p * fprime(p, *args)
+            step = np.clip(-g / dg, -max_step, max_step)
+        function_calls += 1
+        iterations += active
+
+        failed |= active & ~np.isfinite(step)
+        step = np.where(active & ~failed, step, 0.0)
+        x = x + step
+        converged |= active & ~failed & ((g == 0) | (np.abs(step) <= rtol * np.maximum(1.0, np.abs(x))))
+
+    bracketed = ~converged
+    root = np.array(np.exp(x))
+    if np.any(bracketed):
+        subset = tuple(arg[bracketed] for arg in args)
+        lower, upper = np.broadcast_to(lower, shape)[bracketed], np.broadcast_to(upper, shape)[bracketed]
+        fallback = log_illinois(f, lower, upper, subset, rtol)
+        root[bracketed] = fallback.root
+        iterations[bracketed] += fallback.iterations
+        converged[bracketed] = fallback.converged
+        function_calls += fallback.function_calls
+
+    return NewtonResults(root, iterations, function_calls, converged, bracketed)
+
+
+def _scalar_log_newton(f, fprime, x0, lower, upper, args, rtol, maxiter, max_step):
+    """Scalar version of log_newton that avoids array overhead inside ODE right-hand sides."""
+    x = math.log(x0 if 0 < x0 < math.inf else math.sqrt(lower) * math.sqrt(upper))
+    for iterations in range(1, maxiter + 1):
+        p = math.exp(x)
+        g, dg = f(p, *args), p * fprime(p, *args)
+        if g == 0:
+            return NewtonResults(p, iterations, iterations, True, False)
+        step = -g / dg
+        if not math.isfinite(step):
+            break
+        step = min(max(step, -max_step), max_step)
+        x += step
+        if abs(step) <= rtol * max(1.0, abs(x)):
+            return NewtonResults(math.exp(x), iterations, iterations, True, False)
+    else:
+        iterations = maxiter
+
+    fallback = log_illinois(f, lower, upper, args, rtol)
+    return NewtonResults(float(fallback.root), iterations + int(fallback.iterations),
+                         iterations + fallback.function_calls, bool(fallback.converged), True)
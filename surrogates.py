@@ -0,0 +1,156 @@
+import bisect
+import math
+
+import numpy as np
+from numpy.polynomial import chebyshev
+
+
+class EnergyPriceSurrogate:
+
+    def __init__(self, price_function, rtol=1e-10, degree=16, padding=2.0, max_pieces=4096):
+        """
+        Adaptive piecewise Chebyshev interpolant of log p(K) in log K. The price_function must map
+        an array of capital values to market clearing energy prices (i.e., find_market_prices).
+
+        """
+        self._price_function = price_function
+        self._rtol = rtol
+        self._degree = degree
+        self._padding = padding
+        self._max_pieces = max_pieces
+
+        self._breaks = None
+        self._coefs = None
+        self.max_rel_error = 0.0
+        self.number_fits = 0
+
+    def __call__(self, capital):
+        """Energy price(s) for the given capital value(s), extending the fit if capital leaves the domain."""
+        if np.ndim(capital) == 0:
+            self._ensure_domain(capital, capital)
+            log_capital = math.log(capital)
+            i = min(max(bisect.bisect_right(self._breaks_list, log_capital) - 1, 0), len(self._coefs_list) - 1)
+            x = self._map(log_capital, self._breaks_list[i], self._breaks_list[i + 1])
+            return math.exp(_clenshaw(self._coefs_list[i], x))
+        else:
+            capital = np.asarray(capital)
+            self._ensure_domain(capital.min(), capital.max())
+            return np.exp(self._evaluate(np.log(capital), self._coefs))
+
+    @property
+    def domain(self):
+        """Range of capital values over which the surrogate is currently valid."""
+        return None if self._breaks is None else (math.exp(self._breaks[0]), math.exp(self._breaks[-1]))
+
+    @property
+    def number_pieces(self):
+        """Number of Chebyshev pieces in the current fit."""
+        return 0 if self._coefs is None else self._coefs.shape[0]
+
+    @property
+    def state(self):
+        """Break points, coefficients and maximum relative error of the current fit, for set_state."""
+        return self._breaks, self._coefs, self.max_rel_error
+
+    def set_state(self, state):
+        """Restore a fit returned by state (e.g., from a cache) without evaluating the price function."""
+        breaks, coefs, self.max_rel_error = state
+        if breaks is not None:
+            self._set_pieces(breaks, coefs)
+
+    def elasticity(self, capital):
+        """Elasticity of the energy price with respect to capital, d log p / d log K."""
+        capital = np.asarray(capital, dtype=float)
+        self._ensure_domain(capital.min(), capital.max())
+        scale = 2 / np.diff(self._breaks)[:, np.newaxis]
+        return self._evaluate(np.log(capital), scale * chebyshev.chebder(self._coefs, axis=1))
+
+    def fit(self, min_capital, max_capital):
+        """Fit the surrogate on [min_capital, max_capital], discarding any previous fit."""
+        self._set_pieces(*self._fit_intervals([(math.log(min_capital), math.log(max_capital))]))
+        self.number_fits += 1
+
+    def _ensure_domain(self, min_capital, max_capital):
+        """Fit new pieces on a padded domain whenever capital falls outside the current one."""
+        if self._breaks is None:
+            self.fit(min_capital / self._padding, max_capital * self._padding)
+            return
+
+        breaks, coefs = self._breaks, self._coefs
+        if math.log(min_capital) < breaks[0]:
+            new_breaks, new_coefs = self._fit_intervals([(math.log(min_capital / self._padding), breaks[0])])
+            breaks, coefs = np.concatenate((new_breaks[:-1], breaks)), np.vstack((new_coefs, coefs))
+        if math.log(max_capital) > breaks[-1]:
+            new_breaks, new_coefs = self._fit_intervals([(breaks[-1], math.log(max_capital * self._padding))])
+            breaks, coefs = np.concatenate((breaks, new_breaks[1:])), np.vstack((coefs, new_coefs))
+        if breaks is not self._breaks:
+            self._set_pieces(breaks, coefs)
+            self.number_fits += 1
+
+    def _evaluate(self, log_capital, coefs):
+        """Vectorized evaluation of the piecewise Chebyshev series with the given coefficients."""
+        i = np.clip(np.searchsorted(self._breaks, log_capital, side='right') - 1, 0, coefs.shape[0] - 1)
+        x = self._map(log_capital, self._breaks[i], self._breaks[i + 1])
+        b0, b1 = np.zeros_like(x), np.zeros_like(x)
+        for k in range(coefs.shape[1] - 1, 0, -1):
+            b0, b1 = coefs[i, k] + 2 * x * b0 - b1, b0
+        return coefs[i, 0] + x * b0 - b1
+
+    def _fit_intervals(self, intervals):
+        """
+        Interpolate on each interval and bisect those that fail validation against the price function.
+        All intervals at the same level of refinement are interpolated and validated with one batched call.
+
+        """
+        nodes = chebyshev.chebpts2(self._degree + 1)
+        check = chebyshev.chebpts1(2 * self._degree + 1)  # mostly new points
+        vandermonde = np.linalg.inv(chebyshev.chebvander(nodes, self._degree))
+        check_vandermonde = chebyshev.chebvander(check, self._degree)
+
+        accepted = []
+        pending = np.array(intervals, dtype=float)
+        while pending.size:
+            lower, upper = pending[:, :1], pending[:, 1:]
+            log_capital = np.hstack((self._unmap(nodes, lower, upper), self._unmap(check, lower, upper)))
+            log_price = np.log(self._price_function(np.exp(log_capital)))
+
+            coefs = log_price[:, :self._degree + 1].dot(vandermonde.T)
+            approx = coefs.dot(check_vandermonde.T)
+            rel_error = np.max(np.abs(np.expm1(approx - log_price[:, self._degree + 1:])), axis=1)
+
+            ok = rel_error <= self._rtol
+            accepted.extend(zip(pending[ok].tolist(), coefs[ok]))
+            self.max_rel_error = max(self.max_rel_error, rel_error[ok].max(initial=0.0))
+
+            midpoints = 0.5 * (pending[~ok, 0] + pending[~ok, 1])
+            pending = np.vstack((np.column_stack((pending[~ok, 0], midpoints)),
+                                 np.column_stack((midpoints, pending[~ok, 1]))))
+            if len(accepted) + len(pending) > self._max_pieces:
+                raise ValueError("Surrogate needs more than {} pieces to reach rtol={}.".format(self._max_pieces, self._rtol))
+
+        accepted.sort(key=lambda piece: piece[0][0])
+        breaks = np.array([interval[0] for interval, _ in accepted] + [accepted[-1][0][1]])
+        return breaks, np.array([coefs for _, coefs in accepted])
+
+    def _set_pieces(self, breaks, coefs):
+        self._breaks, self._coefs = breaks, coefs
+        self._breaks_list, self._coefs_list = breaks.tolist(), coefs.tolist()
+
+    @staticmethod
+    def _map(log_capital, lower, upper):
+        """Map log capital from [lower, upper] onto [-1, 1]."""
+        return (2 * log_capital - (lower + upper)) / (upper - lower)
+
+    @staticmethod
+    def _unmap(x, lower, upper):
+        """Map x in [-1, 1] onto log capital in [lower, upper]."""
+        return 0.5 * ((upper - lower) * x + (lower + upper))
+
+
+def _clenshaw(coefs, x):
+    """Scalar Clenshaw recurrence for a Chebyshev series (cheaper than chebval on floats)."""
+    b0, b1 = 0.0, 0.0
+    two_x = 2 * x
+    for c in coefs[:0:-1]:
+        b0, b1 = c + two_x * b0 - b1, b0
+    return coefs[0] + x * b0 - b1
@@ -0,0 +1,174 @@
+import concurrent.futures
+import contextlib
+import math
+import os
+
+import numpy as np
+
+import instrumentation
+from energy_consumers import EnergyConsumer
+from energy_markets import WholesaleEnergyMarket
+from energy_sectors import NonRenewableEnergySector, RenewableEnergySector
+from models import TransitionDynamicsModel
+from utils import SCENARIO_COLUMNS
+
+
+def build_model(scenario, **model_kwargs):
+    """Build a TransitionDynamicsModel from one scenario (a mapping with the keys of SCENARIO_COLUMNS)."""
+    renewable_params = {key: scenario['renewable_' + key] for key in ('alpha', 'delta', 'mu', 'tfp')}
+    non_renewable_params = {key: scenario['non_renewable_' + key]
+                            for key in ('tfp', 'alpha', 'beta', 'gamma', 'delta', 'phi', 'sigma')}
+    energy_market = WholesaleEnergyMarket(EnergyConsumer(scenario['quantity_demand']),
+                                          NonRenewableEnergySector(**non_renewable_params),
+                                          RenewableEnergySector(**renewable_params))
+    prices = (scenario['capital_price'], scenario['fossil_fuel_price'], scenario['interest_rate'])
+    return TransitionDynamicsModel(energy_market, *prices, **model_kwargs)
+
+
+def sweep(scenarios, ts=None, initial_capital_ratio=0.5, processes=None, chunk_size=None, collect_stats=False,
+          **model_kwargs):
+    """
+    Compute equilibria (and, if the time grid ts is given, transitions from initial_capital_ratio times
+    equilibrium capital) for a table of scenarios, i.e., a dict of equal length columns such as returned
+    by utils.generate_scenarios. Scenarios are scheduled in chunks of chunk_size on a pool of processes
+    (processes=1 solves them serially in this process). Returns a dict of columns holding the scenarios,
+    their seeds (-1 if the table has none) and the results. Results that a scenario failed to reach are
+    NaN and the error message is recorded in its row of the 'error' column. With collect_stats=True the
+    SolverStats of each scenario are kept in a 'stats' column (see instrumentation.aggregate).
+
+    """
+    missing = [column for column in SCENARIO_COLUMNS if column not in scenarios]
+    if missing:
+        raise ValueError("Scenarios are missing columns {}.".format(missing))
+    columns = {column: np.asarray(scenarios[column]) for column in SCENARIO_COLUMNS}
+    number_scenarios = len(columns[SCENARIO_COLUMNS[0]])
+    columns['seed'] = np.asarray(scenarios.get('seed', np.full(number_scenarios, -1)))
+
+    processes = os.cpu_count() if processes is None else processes
+    if chunk_size is None:
+        chunk_size = max(1, math.ceil(number_scenarios / (4 * processes)))  # a few chunks per process balances load
+    ts = None if ts is None else np.asarray(ts, dtype=float)
+    chunks = [({column: values[i:i + chunk_size] for column, values in columns.items()},
+               ts, initial_capital_ratio, collect_stats, model_kwargs) for i in range(0, number_scenarios, chunk_size)]
+
+    if processes == 1:
+        results = [_solve_chunk(chunk) for chunk in chunks]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(_solve_chunk, chunks))
+
+    columns.update(_concatenate_results(results, ts))
+    return columns
+
+
+def _concatenate_results(results, ts):
+    """Stack the result columns of the chunks in scenario order."""
+    if results:
+        return {column: np.concatenate([result[column] for result in results]) for column in results[0]}
+    return _empty_results(0, ts)
+
+
+def _empty_results(number_scenarios, ts, collect_stats=False):
+    results = {'equilibrium_q': np.full(number_scenarios, np.nan),
+               'equilibrium_capital': np.full(number_scenarios, np.nan),
+               'equilibrium_energy_price': np.full(number_scenarios, np.nan),
+               'error': np.full(number_scenarios, '', dtype=object)}
+    if ts is not None:
+        results['q'] = np.full((number_scenarios, ts.size), np.nan)
+        results['capital'] = np.full((number_scenarios, ts.size), np.nan)
+    if collect_stats:
+        results['stats'] = np.empty(number_scenarios, dtype=object)
+    return results
+
+
+def _solve_chunk(chunk):
+    """Solve the scenarios of one chunk, recording the error message of any scenario that fails."""
+    columns, ts, initial_capital_ratio, collect_stats, model_kwargs = chunk
+    number_scenarios = len(columns['seed'])
+    results = _empty_results(number_scenarios, ts, collect_stats)
+    for i in range(number_scenarios):
+        scenario = {column: values[i] for column, values in columns.items()}
+        with instrumentation.collect() if collect_stats else contextlib.nullcontext() as stats:
+            try:
+                model = build_model(scenario, **model_kwargs)
+                equilibrium = model.equilibrium
+                results['equilibrium_q'][i], results['equilibrium_capital'][i] = equilibrium
+                results['equilibrium_energy_price'][i] = model._compute_energy_price(equilibrium[1])
+                if ts is not None:
+                    solution = model.solve_policy(ts, initial_capital_ratio * equilibrium[1])
+                    results['q'][i], results['capital'][i] = solution.T
+            except Exception as error:  # a failed scenario must not abort the sweep
+                results['error'][i] = '{}: {}'.format(type(error).__name__, error)
+        if collect_stats:
+            results['stats'][i] = stats
+    return results
+
+
+def continuation(scenario, parameter, values, ts=None, initial_capital_ratio=0.5, max_iterations=6,
+                 max_subdivisions=8, **model_kwargs):
+    """
+    Walk the ordered parameter path values of one scenario column (e.g., 'renewable_mu'), solving for the
+    equilibrium and the transition (by collocation) from initial_capital_ratio times equilibrium capital
+    at each point. Every solve is warm started from the previous one. When collocation takes more than
+    max_iterations Newton iterations (or fails) the step is halved, up to max_subdivisions times between
+    consecutive values, and after an easy step it is doubled again. Returns a dict of columns with the
+    parameter values, equilibria, trajectories, Newton iterations and number of solves per value, and
+    (q, K) on the time grid ts if given.
+
+    """
+    scenario = dict(scenario)
+    values = np.asarray(values, dtype=float)
+    results = _empty_results(values.size, None if ts is None else np.asarray(ts, dtype=float))
+    del results['error']
+    results.update({parameter: values, 'trajectory': np.empty(values.size, dtype=object),
+                    'iterations': np.zeros(values.size, dtype=int), 'solves': np.zeros(values.size, dtype=int)})
+
+    model, trajectory, position, step = None, None, None, None
+    for i, value in enumerate(values):
+        if model is None:
+            model, trajectory = _continuation_step(scenario, parameter, value, initial_capital_ratio,
+                                                   None, None, model_kwargs)
+            results['iterations'][i], results['solves'][i] = trajectory.iterations, 1
+        else:
+            step = value - position if step is None else math.copysign(abs(step), value - position)
+            subdivisions = 0
+            while position != value:
+                trial = value if abs(value - position) <= abs(step) else position + step
+                try:
+                    trial_model, trial_trajectory = _continuation_step(scenario, parameter, trial,
+                                                                       initial_capital_ratio, model, trajectory,
+                                                                       model_kwargs)
+                    iterations = trial_trajectory.iterations
+                    results['iterations'][i] += iterations
+                except ValueError:
+                    if subdivisions == max_subdivisions:
+                        raise
+                    trial_model, iterations = None, np.inf
+                results['solves'][i] += 1
+
+                if iterations > max_iterations and subdivisions < max_subdivisions:
+                    step, subdivisions = step / 2, subdivisions + 1
+                    continue
+                model, trajectory, position = trial_model, trial_trajectory, trial
+                if 2 * iterations <= max_iterations:
+                    step *= 2
+        position = value
+
+        equilibrium = model.equilibrium
+        results['equilibrium_q'][i], results['equilibrium_capital'][i] = equilibrium
+        results['equilibrium_energy_price'][i] = model._compute_energy_price(equilibrium[1])
+        results['trajectory'][i] = trajectory
+        if ts is not None:
+            results['q'][i], results['capital'][i] = trajectory(ts).T
+    return results
+
+
+def _continuation_step(scenario, parameter, value, initial_capital_ratio, neighbor, neighbor_trajectory,
+                       model_kwargs):
+    """Solve for the equilibrium and transition at one parameter value, warm started from a neighbor."""
+    scenario[parameter] = value
+    model = build_model(scenario, **model_kwargs)
+    if neighbor is not None:
+        model.warm_start(neighbor)
+    K0 = initial_capital_ratio * model.equilibrium[1]
+    return model, model.solve_collocation(K0, initial_guess=neighbor_trajectory)
@@ -0,0 +1,44 @@
+"""
+Confirms that the benchmarks run on small sizes, that their timings survive a
+round trip through the results file, and that slowdowns beyond the tolerance are
+reported as regressions against the baseline.
+
+"""
+import numpy as np
+
+import benchmarks
+
+
+def test_run_benchmarks(tmpdir):
+    """Every benchmark runs at its smallest size and the saved timings load back unchanged."""
+    timings = benchmarks.run_benchmarks(sizes=(1, 100), names=('find_market_price', 'q_dot_locus', 'plot_data'),
+                                        repeat=1, min_time=0)
+    assert {(timing.name, timing.size) for timing in timings} == {
+        ('find_market_price', 1), ('find_market_price', 100), ('q_dot_locus', 1), ('q_dot_locus', 100),
+        ('plot_data', 100)}
+    assert all(timing.best > 0 and timing.number >= 1 for timing in timings)
+    assert not np.isnan(benchmarks.q_dot_locus_setup('default', 100)()).any()  # every q has a locus
+
+    filename = str(tmpdir.join('results.json'))
+    benchmarks.save(timings, filename)
+    assert benchmarks.load(filename) == timings
+
+
+def test_compare():
+    """Only timings slower than the matching baseline by more than the tolerance are regressions."""
+    baseline = [benchmarks.Timing('solve', 'vode_bdf', 1, 1, 1.0, 1.0),
+                benchmarks.Timing('equilibrium', 'default', 100, 1, 2.0, 2.0)]
+    timings = [benchmarks.Timing('solve', 'vode_bdf', 1, 1, 1.2, 1.3),
+               benchmarks.Timing('equilibrium', 'default', 100, 1, 3.0, 3.0),
+               benchmarks.Timing('q_dot_locus', 'default', 1, 10, 1.0, 1.0)]
+    ratios, regressions = benchmarks.compare(timings, baseline, tolerance=1.25)
+    assert ratios == {('solve', 'vode_bdf', 1): 1.2, ('equilibrium', 'default', 100): 1.5}
+    assert regressions == [('equilibrium', 'default', 100)]
+    assert 'ratio' in benchmarks.report(timings, ratios)
+
+
+def test_main_without_baseline(tmpdir):
+    """Running without a baseline only fails when a comparison is asked for."""
+    argv = ['--quick', '--benchmark', 'plot_data', '--repeat', '1', '--baseline', str(tmpdir.join('missing.json'))]
+    assert benchmarks.main(argv) == 0
+    assert benchmarks.main(argv + ['--compare']) == 1
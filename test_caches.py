@@ -0,0 +1,64 @@
+"""
+Confirms that the result cache returns stored values from memory and from disk,
+evicts least recently used entries, and that models share equilibria, price
+surrogates and trajectories through it.
+
+"""
+import os
+
+import numpy as np
+
+from caches import CACHE_VERSION, ResultCache
+from models import TransitionDynamicsModel
+from test_model_equilibrium import ENERGY_MARKET, CAPITAL_PRICE, FOSSIL_FUEL_PRICE, INTEREST_RATE
+
+PRICES = (CAPITAL_PRICE, FOSSIL_FUEL_PRICE, INTEREST_RATE)
+
+
+def test_result_cache(tmpdir):
+    """Entries survive in a new cache on the same directory, and both tiers are bounded."""
+    cache = ResultCache(str(tmpdir), max_entries=2)
+    keys = [cache.key('entry', i, np.arange(3.0)) for i in range(3)]
+    assert len(set(keys)) == 3 and cache.key('entry', 0, np.arange(3.0)) == keys[0]
+    for i, key in enumerate(keys):
+        cache.put(key, np.full(3, i))
+    assert keys[0] not in cache._memory and keys[0] in cache
+
+    other = ResultCache(str(tmpdir))
+    assert np.array_equal(other.get(keys[0]), np.zeros(3)) and other.hits == 1
+    assert other.get(cache.key('missing')) is None and other.misses == 1
+
+    small = ResultCache(str(tmpdir.join('small')), max_bytes=1)
+    small.put(keys[0], 0)
+    assert [name for name in os.listdir(str(tmpdir.join('small', 'v{}'.format(CACHE_VERSION))))
+            if name.endswith('.pkl')] == []
+
+
+def test_result_cache_version(tmpdir):
+    """Entries written by another cache version are never read and are removed, but other directories are kept."""
+    old = ResultCache(str(tmpdir), version=0)
+    old.put(old.key('entry'), 1)
+    tmpdir.join('v7', 'data.txt').write('not a cache', ensure=True)
+    new = ResultCache(str(tmpdir), version=1)
+    assert new.key('entry') != old.key('entry')
+    assert not os.path.exists(str(tmpdir.join('v0')))
+    assert tmpdir.join('v7', 'data.txt').check()
+
+
+def test_model_cache(tmpdir):
+    """A second model with the same parameters reuses the equilibrium, price surrogate and transition."""
+    model = TransitionDynamicsModel(ENERGY_MARKET, *PRICES, price_surrogate_rtol=1e-12, cache=ResultCache(str(tmpdir)))
+    K0 = 0.9 * model.equilibrium[1]
+    trajectory = model.solve_collocation(K0)
+
+    cache = ResultCache(str(tmpdir))
+    other = TransitionDynamicsModel(ENERGY_MARKET, *PRICES, price_surrogate_rtol=1e-12, cache=cache)
+    assert other._energy_price_surrogate.number_pieces == model._energy_price_surrogate.number_pieces
+    assert np.array_equal(other.equilibrium, model.equilibrium)
+    cached = other.solve_collocation(K0)
+    assert cache.misses == 0
+    assert np.array_equal(cached(trajectory.t_span), trajectory(trajectory.t_span))
+
+    # solver options that cannot be part of a key bypass the cache
+    other.solve_adaptive(0, K0, method='Radau', jac=other._reverse_jacobian, rtol=1e-10, atol=1e-12 * other.equilibrium)
+    assert cache.misses == 0
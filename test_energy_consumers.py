@@ -0,0 +1,65 @@
+"""
+Confirms that the aggregate demand of a consumer population matches the sum of
+its consumers' demand curves, that inelastic populations reproduce a single
+consumer, and that the market clears with elastic, heterogeneous demand.
+
+"""
+import numpy as np
+
+import energy_consumers
+from energy_consumers import ConsumerPopulation, EnergyConsumer
+from energy_markets import WholesaleEnergyMarket
+import utils
+from test_energy_markets import (ENERGY_MARKET, NON_RENEWABLE_SECTOR, RENEWABLE_SECTOR, CAPITAL_PRICE,
+                                 FOSSIL_FUEL_PRICE, INTEREST_RATE)
+
+PRICES = (CAPITAL_PRICE, FOSSIL_FUEL_PRICE, INTEREST_RATE)
+POPULATION_SEED, POPULATION_PARAMS = utils.generate_consumer_population_params(10000)
+POPULATION = ConsumerPopulation(**POPULATION_PARAMS)
+
+
+def test_aggregate_demand():
+    """Pooled, blocked aggregate demand and its derivative match a sum over consumers."""
+    quantity_demand, elasticity = POPULATION_PARAMS['quantity_demand'], POPULATION_PARAMS['elasticity']
+    energy_prices = np.logspace(-2, 2, 9)
+    expected = np.array([np.sum(quantity_demand * p**-elasticity) for p in energy_prices])
+    expected_derivative = np.array([-np.sum(elasticity * quantity_demand * p**(-elasticity - 1)) for p in energy_prices])
+    assert POPULATION.params.elasticity.size <= 4
+    assert np.allclose(POPULATION.demand(energy_prices), expected, rtol=1e-12)
+    assert np.allclose(POPULATION.demand_price_derivative(energy_prices), expected_derivative, rtol=1e-12)
+    assert np.allclose([POPULATION.demand(p) for p in energy_prices], expected, rtol=1e-12)
+
+    # blocks smaller than the price array give the same result
+    block_size, energy_consumers._BLOCK_SIZE = energy_consumers._BLOCK_SIZE, 8
+    try:
+        assert np.allclose(POPULATION.demand(energy_prices.reshape(3, 3)), expected.reshape(3, 3), rtol=1e-12)
+    finally:
+        energy_consumers._BLOCK_SIZE = block_size
+
+
+def test_inelastic_population():
+    """A population of inelastic consumers clears the market at the price for a single consumer."""
+    quantity_demand = ENERGY_MARKET.consumer._quantity_demand
+    population = ConsumerPopulation(np.full(1000, quantity_demand / 1000), 0)
+    market = WholesaleEnergyMarket(population, NON_RENEWABLE_SECTOR, RENEWABLE_SECTOR)
+    capital = np.logspace(-3, 3, 7)
+    assert np.allclose(market.find_market_prices(capital, *PRICES), ENERGY_MARKET.find_market_prices(capital, *PRICES),
+                       rtol=1e-10)
+
+
+def test_elastic_market_clearing():
+    """Scalar and batched market prices with heterogeneous elastic demand have zero excess demand."""
+    market = WholesaleEnergyMarket(POPULATION, NON_RENEWABLE_SECTOR, RENEWABLE_SECTOR)
+    capital = np.logspace(-3, 3, 7)
+    energy_prices = market.find_market_prices(capital, *PRICES)
+    demand = POPULATION.demand(energy_prices)
+    assert np.all(np.abs(market._excess_demand(energy_prices, capital, *PRICES)) <= 1e-10 * demand)
+    newton_prices = market.find_market_prices(capital, *PRICES, method='newton')
+    assert np.allclose(newton_prices, energy_prices, rtol=1e-10)
+    assert abs(market.find_market_price(capital[3], *PRICES) - energy_prices[3]) <= 1e-10 * energy_prices[3]
+
+    # less demand at high prices than the inelastic consumer with the same demand at unit price
+    inelastic_market = WholesaleEnergyMarket(EnergyConsumer(POPULATION.demand(1.0)), NON_RENEWABLE_SECTOR,
+                                             RENEWABLE_SECTOR)
+    inelastic_prices = inelastic_market.find_market_prices(capital, *PRICES)
+    assert np.all((energy_prices <= inelastic_prices) | (inelastic_prices <= 1))
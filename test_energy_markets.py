@@ -5,9 +5,12 @@ energy production and the subsidy paid to renewable energy production is a
 constant markup over the wholesale market price.
 
 """
+import numpy as np
+
 from energy_consumers import EnergyConsumer
 from energy_markets import WholesaleEnergyMarket
 from energy_sectors import NonRenewableEnergySector, RenewableEnergySector
+import solvers
 import utils
 
 # define energy sectors, consumers, and market as globals
@@ -37,6 +40,85 @@ def test_wholesale_market_price():
     assert rel_error <= 1e-12
 
 
+def test_wholesale_market_prices():
+    """Compare the vectorized wholesale market prices with the analytic solution."""
+    prices = (CAPITAL_PRICE, FOSSIL_FUEL_PRICE, INTEREST_RATE)
+    capital = np.logspace(-6, 6, 1000)
+    analytic_result = _energy_market_price(capital, ENERGY_MARKET, *prices)
+    numeric_result = ENERGY_MARKET.find_market_prices(capital, *prices)
+    rel_error = np.abs(analytic_result - numeric_result) / analytic_result
+    assert np.all(rel_error <= 1e-12)
+
+
+def test_wholesale_market_price_newton():
+    """Compare the Newton (cold and warm started) market price with the analytic solution."""
+    prices = (CAPITAL_PRICE, FOSSIL_FUEL_PRICE, INTEREST_RATE)
+    capital = 10
+    analytic_result = _energy_market_price(capital, ENERGY_MARKET, *prices)
+    cold_result, cold_info = ENERGY_MARKET.find_market_price(capital, *prices, method='newton', full_output=True)
+    warm_result, warm_info = ENERGY_MARKET.find_market_price(capital, *prices, method='newton', full_output=True,
+                                                             initial_guess=1.01 * analytic_result)
+    assert abs(analytic_result - cold_result) / analytic_result <= 1e-12
+    assert abs(analytic_result - warm_result) / analytic_result <= 1e-12
+    assert warm_info.iterations <= cold_info.iterations
+
+
+def test_wholesale_market_prices_small_alpha():
+    """With arrays of prices and alpha near 0, prices beyond the float range are not converged rather than wrong."""
+    renewable_sector = RenewableEnergySector(**dict(RENEWABLE_SECTOR_PARAMS, alpha=0.01))
+    non_renewable_sector = NonRenewableEnergySector(**dict(NON_RENEWABLE_SECTOR_PARAMS, alpha=0.99, beta=0.01))
+    market = WholesaleEnergyMarket(EnergyConsumer(quantity_demand=1e6), non_renewable_sector, renewable_sector)
+    capital = np.logspace(-6, 6, 25)
+    prices = [np.full(capital.shape, price) for price in (CAPITAL_PRICE, FOSSIL_FUEL_PRICE, INTEREST_RATE)]
+    with np.errstate(over='ignore'):
+        analytic_result = _energy_market_price(capital, market, CAPITAL_PRICE, FOSSIL_FUEL_PRICE, INTEREST_RATE)
+        numeric_result, results = market.find_market_prices(capital, *prices, full_output=True)
+    converged = results.converged
+    assert converged.any() and not converged.all()
+    assert np.all(np.abs(analytic_result - numeric_result)[converged] / analytic_result[converged] <= 1e-12)
+    assert np.isnan(numeric_result[~converged]).all()
+
+
+def test_expand_log_bracket_float_range():
+    """Brackets without a sign change stop at the largest and smallest positive normal floats instead of inf and 0."""
+    excess_demand = lambda energy_price: np.ones(np.shape(energy_price))
+    with np.errstate(over='raise', under='raise'):
+        lower, upper, bracketed = solvers.expand_log_bracket(excess_demand, [1e-12, 1.0], [1e12, 2.0], factor=1e6,
+                                                             full_output=True)
+    assert not bracketed.any()
+    assert np.all(np.isfinite(upper)) and np.all(lower > 0)
+
+    # a sign change just below the largest float is still found
+    lower, upper = solvers.expand_log_bracket(lambda energy_price: 1e300 - energy_price / 1e8, 1e-12, 1e12, factor=1e6)
+    assert np.isfinite(upper) and upper >= 1e308
+
+
+def test_compiled_excess_demand():
+    """Excess demand with folded constants matches the sector by sector evaluation."""
+    prices = (CAPITAL_PRICE, FOSSIL_FUEL_PRICE, INTEREST_RATE)
+    capital, energy_prices = np.logspace(-3, 3, 7), np.logspace(-2, 2, 7)
+    excess_demand, derivative, args = ENERGY_MARKET._excess_demand_functions(*prices)
+    assert args == ()
+    assert np.allclose(excess_demand(energy_prices, capital),
+                       ENERGY_MARKET._excess_demand(energy_prices, capital, *prices), rtol=1e-12)
+    assert np.allclose(derivative(energy_prices, capital),
+                       ENERGY_MARKET._excess_demand_derivative(energy_prices, capital, *prices), rtol=1e-12)
+    assert {NON_RENEWABLE_SECTOR.params: 1}[NonRenewableEnergySector(**NON_RENEWABLE_SECTOR_PARAMS).params] == 1
+    assert np.isclose(excess_demand(float(energy_prices[0]), float(capital[0])),
+                      excess_demand(energy_prices, capital)[0], rtol=1e-12)
+
+    # with large exponents supply overflows to inf instead of becoming NaN (tfp**100 underflows to 0)
+    market = WholesaleEnergyMarket(CONSUMER, NonRenewableEnergySector(**dict(NON_RENEWABLE_SECTOR_PARAMS, tfp=1e-4,
+                                                                             alpha=0.01, beta=0.99)),
+                                   RENEWABLE_SECTOR)
+    excess_demand, derivative, _ = market._excess_demand_functions(*prices)
+    energy_prices = np.logspace(-12, 12, 25)
+    with np.errstate(over='ignore'):
+        assert not np.any(np.isnan(excess_demand(energy_prices, 1.0)))
+        assert not np.any(np.isnan(derivative(energy_prices, 1.0)))
+        assert excess_demand(1e12, 1.0) == -np.inf
+
+
 def _energy_market_price(capital, energy_market, capital_price, fossil_fuel_price, interest_rate):
     """Analytic solution for wholesale market price when alpha = alpha_R = 1 - alpha_NR."""
     quantity_demand = energy_market.consumer._quantity_demand
@@ -0,0 +1,74 @@
+"""
+Confirms that the fused, single pass sector evaluators agree with the individual
+output, cost, profit and marginal product methods of the energy sectors, and that
+fossil fuel demand with non Cobb-Douglas production solves its first order condition.
+
+"""
+import numpy as np
+
+from energy_sectors import NonRenewableEnergySector
+from test_energy_markets import (NON_RENEWABLE_SECTOR, NON_RENEWABLE_SECTOR_PARAMS, RENEWABLE_SECTOR, CAPITAL_PRICE,
+                                 FOSSIL_FUEL_PRICE, INTEREST_RATE)
+
+
+ENERGY_PRICES = np.logspace(-2, 2, 11)
+
+
+def test_renewable_sector_evaluate():
+    """Fused renewable sector evaluation matches the individual methods."""
+    growth = np.linspace(-0.1, 0.1, ENERGY_PRICES.size)
+    state = RENEWABLE_SECTOR.evaluate(CAPITAL_PRICE, ENERGY_PRICES, growth, INTEREST_RATE)
+    prices = (CAPITAL_PRICE, ENERGY_PRICES, INTEREST_RATE)
+    assert np.allclose(state.capital, RENEWABLE_SECTOR._capital_demand(*prices), rtol=1e-12)
+    assert np.allclose(state.output, RENEWABLE_SECTOR.output(*prices), rtol=1e-12)
+    assert np.allclose(state.revenue, RENEWABLE_SECTOR._revenue(*prices), rtol=1e-12)
+    assert np.allclose(state.costs, RENEWABLE_SECTOR.costs(CAPITAL_PRICE, ENERGY_PRICES, growth, INTEREST_RATE),
+                       rtol=1e-12)
+
+
+def test_non_renewable_sector_evaluate():
+    """Fused non-renewable sector evaluation matches the individual methods."""
+    q, capital = np.linspace(1.01, 2, ENERGY_PRICES.size), np.logspace(0, 4, ENERGY_PRICES.size)
+    state = NON_RENEWABLE_SECTOR.evaluate(q, capital, CAPITAL_PRICE, ENERGY_PRICES, FOSSIL_FUEL_PRICE)
+    args = (capital, ENERGY_PRICES, FOSSIL_FUEL_PRICE)
+    expected = {'investment': NON_RENEWABLE_SECTOR._investment_demand(q, capital),
+                'fossil_fuel': NON_RENEWABLE_SECTOR._fossil_fuel_demand(*args),
+                'output': NON_RENEWABLE_SECTOR.output(*args),
+                'revenue': NON_RENEWABLE_SECTOR._revenue(*args),
+                'capital_costs': NON_RENEWABLE_SECTOR._cost_capital(q, capital, CAPITAL_PRICE),
+                'costs': NON_RENEWABLE_SECTOR.costs(q, capital, CAPITAL_PRICE, ENERGY_PRICES, FOSSIL_FUEL_PRICE),
+                'marginal_product_capital': NON_RENEWABLE_SECTOR._marginal_product_capital(*args),
+                'marginal_product_fossil_fuel': NON_RENEWABLE_SECTOR._marginal_product_fossil_fuel(*args)}
+    for field, value in expected.items():
+        assert np.allclose(getattr(state, field), value, rtol=1e-12), field
+
+
+def test_ces_fossil_fuel_demand():
+    """CES fossil fuel demand satisfies its first order condition and the derivatives match finite differences."""
+    params = dict(NON_RENEWABLE_SECTOR_PARAMS, gamma=0.9)
+    capital = np.logspace(0, 4, ENERGY_PRICES.size)
+    for sigma in (0.5, 1.0, 2.0):
+        sector = NonRenewableEnergySector(**dict(params, sigma=sigma))
+        F = sector._fossil_fuel_demand(capital, ENERGY_PRICES, FOSSIL_FUEL_PRICE)
+        mpf = sector._marginal_product_fossil_fuel(capital, ENERGY_PRICES, FOSSIL_FUEL_PRICE)
+        assert np.allclose(ENERGY_PRICES * mpf, FOSSIL_FUEL_PRICE, rtol=1e-10)
+        assert np.isclose(sector._fossil_fuel_demand(capital[3], ENERGY_PRICES[3], FOSSIL_FUEL_PRICE), F[3], rtol=1e-12)
+
+        # F is solved to about 1e-13 relative accuracy, so differences of the output are only accurate to
+        # about 1e-13 / h of the output relative to the price or capital
+        h = 1e-6
+        output = lambda K, p: sector.output(K, p, FOSSIL_FUEL_PRICE)
+        E = output(capital, ENERGY_PRICES)
+        dE_dp = (output(capital, ENERGY_PRICES * (1 + h)) - output(capital, ENERGY_PRICES * (1 - h))) / (2 * h * ENERGY_PRICES)
+        dE_dK = (output(capital * (1 + h), ENERGY_PRICES) - output(capital * (1 - h), ENERGY_PRICES)) / (2 * h * capital)
+        assert np.allclose(sector.output_price_derivative(capital, ENERGY_PRICES, FOSSIL_FUEL_PRICE), dE_dp, rtol=1e-6,
+                           atol=1e-6 * E / ENERGY_PRICES)
+        assert np.allclose(sector.output_capital_derivative(capital, ENERGY_PRICES, FOSSIL_FUEL_PRICE), dE_dK, rtol=1e-6,
+                           atol=1e-6 * E / capital)
+
+        vmpk = lambda K, p: sector._value_marginal_product_capital(K, p, FOSSIL_FUEL_PRICE)
+        dvmpk_dK, dvmpk_dp = sector._value_marginal_product_capital_derivatives(capital, ENERGY_PRICES, FOSSIL_FUEL_PRICE)
+        assert np.allclose(dvmpk_dK, (vmpk(capital * (1 + h), ENERGY_PRICES) - vmpk(capital * (1 - h), ENERGY_PRICES)) /
+                           (2 * h * capital), rtol=1e-6)
+        assert np.allclose(dvmpk_dp, (vmpk(capital, ENERGY_PRICES * (1 + h)) - vmpk(capital, ENERGY_PRICES * (1 - h))) /
+                           (2 * h * ENERGY_PRICES), rtol=1e-6)
@@ -0,0 +1,36 @@
+"""
+Confirms that the compute-only core imports without matplotlib (plotting is only
+loaded by the plot_* methods) and, if a budget is set, within the start up budget
+of a sweep worker.
+
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+# seconds for a fresh interpreter to import everything a sweep worker needs, e.g. 1.5; wall clock times depend
+# on the machine and its load, so the budget is only checked when set
+IMPORT_BUDGET = os.environ.get('IMPORT_BUDGET')
+
+
+def _run(code):
+    directory = os.path.dirname(os.path.abspath(__file__))
+    return subprocess.check_output([sys.executable, '-c', code], cwd=directory, universal_newlines=True).strip()
+
+
+def test_headless_core():
+    """Importing the models, sweeps and benchmarks leaves matplotlib unloaded."""
+    loaded = _run("import sys, benchmarks, models, sweeps; print(sorted(name for name in sys.modules "
+                  "if name.split('.')[0] in ('matplotlib', 'seaborn', 'plotting')))")
+    assert loaded == '[]'
+
+
+def test_import_budget():
+    """A fresh interpreter imports the sweep workers' modules within IMPORT_BUDGET, if set (best of three)."""
+    if IMPORT_BUDGET is None:
+        pytest.skip("IMPORT_BUDGET not set")
+    code = "import time; start = time.perf_counter(); import sweeps; print(time.perf_counter() - start)"
+    seconds = min(float(_run(code)) for _ in range(3))
+    assert seconds <= float(IMPORT_BUDGET)
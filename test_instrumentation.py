@@ -0,0 +1,58 @@
+"""
+Confirms that solver statistics are only collected when requested, that solves
+report their counters and stage timings, and that statistics from several solves
+(e.g., the scenarios of a sweep) add up.
+
+"""
+import threading
+
+import instrumentation
+import sweeps
+import utils
+from models import TransitionDynamicsModel
+from test_model_equilibrium import ENERGY_MARKET, CAPITAL_PRICE, FOSSIL_FUEL_PRICE, INTEREST_RATE
+
+PRICES = (CAPITAL_PRICE, FOSSIL_FUEL_PRICE, INTEREST_RATE)
+
+
+def test_solve_stats():
+    """Reverse shooting reports right-hand side calls, market clearing and the time spent solving."""
+    model = TransitionDynamicsModel(ENERGY_MARKET, *PRICES)
+    K0 = 0.9 * model.equilibrium[1]
+    ts, solution, stats = model.solve(0, K0, 1e-2, 'dopri5', return_stats=True)
+    assert stats.counts['rhs_calls'] > 0
+    assert stats.counts['market_clearing_calls'] >= stats.counts['rhs_calls']
+    assert stats.timings['solve'] > 0
+    assert 'equilibrium_solves' not in stats.counts  # the equilibrium was computed before collecting
+    assert 'solve' in stats.report()
+
+    # statistics are off by default and solving without them gives the same path
+    assert not instrumentation.enabled()
+    assert model.solve(0, K0, 1e-2, 'dopri5')[1].tolist() == solution.tolist()
+
+
+def test_nested_collection():
+    """Counts of a nested block are added to the enclosing one, other threads are not counted, and SolverStats add up."""
+    instrumentation.count('ignored')
+    with instrumentation.collect() as outer:
+        instrumentation.count('calls')
+        with instrumentation.collect() as inner:
+            instrumentation.count('calls', 2)
+            with instrumentation.stage('inner'):
+                pass
+        thread = threading.Thread(target=instrumentation.count, args=('other_thread',))
+        thread.start()
+        thread.join()
+    assert inner.counts == {'calls': 2}
+    assert outer.counts == {'calls': 3}
+    assert 'inner' in outer.timings and 'other_thread' not in outer.counts
+    assert (outer + inner).counts['calls'] == 5
+    assert instrumentation.aggregate([outer, None, inner]).counts['calls'] == 5
+
+
+def test_sweep_stats():
+    """A sweep with collect_stats=True keeps the statistics of every scenario."""
+    _, scenarios = utils.generate_scenarios(3, seed=7)
+    results = sweeps.sweep(scenarios, processes=1, collect_stats=True)
+    assert all(stats.counts['equilibrium_solves'] == 1 for stats in results['stats'])
+    assert instrumentation.aggregate(results['stats']).counts['equilibrium_solves'] == 3
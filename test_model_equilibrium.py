@@ -38,6 +38,32 @@ def test_equilibrium_capital():
     assert rel_error <= 1e-12
 
 
+def test_equilibrium_capital_newton():
+    """Equilibrium capital is unchanged when markets are cleared by warm started Newton iterations."""
+    prices = (CAPITAL_PRICE, FOSSIL_FUEL_PRICE, INTEREST_RATE)
+    model = TransitionDynamicsModel(ENERGY_MARKET, *prices, market_clearing_method='newton')
+    _, numeric_capital = model.equilibrium
+    analytic_capital = _equilibrium_capital(ENERGY_MARKET, *prices)
+    rel_error = abs(analytic_capital - numeric_capital) / analytic_capital
+    assert rel_error <= 1e-12
+
+
+def test_equilibrium_capital_small_alpha():
+    """
+    Equilibrium capital with alpha near 0, where the market does not clear at extreme capital (clearing
+    prices leave the float range), still matches the analytic solution.
+
+    """
+    prices = (CAPITAL_PRICE, FOSSIL_FUEL_PRICE, INTEREST_RATE)
+    renewable_sector = RenewableEnergySector(**dict(RENEWABLE_SECTOR_PARAMS, alpha=0.005))
+    non_renewable_sector = NonRenewableEnergySector(**dict(NON_RENEWABLE_SECTOR_PARAMS, alpha=0.995, beta=0.005))
+    energy_market = WholesaleEnergyMarket(CONSUMER, non_renewable_sector, renewable_sector)
+    _, numeric_capital = TransitionDynamicsModel(energy_market, *prices).equilibrium
+    analytic_capital = _equilibrium_capital(energy_market, *prices)
+    rel_error = abs(analytic_capital - numeric_capital) / analytic_capital
+    assert rel_error <= 1e-12
+
+
 def _equilibrium_capital(energy_market, capital_price, fossil_fuel_price, interest_rate):
     """Equilibrium value of non-renewable sector capital stock."""
     alpha = energy_market.renewable_sector._alpha
@@ -0,0 +1,193 @@
+"""
+Confirms that transition paths computed by reverse shooting start from the
+requested initial capital stock and converge to the long-run equilibrium.
+
+"""
+import numpy as np
+from scipy import interpolate
+
+from models import TransitionDynamicsModel
+import sweeps
+import utils
+from test_model_equilibrium import ENERGY_MARKET, CAPITAL_PRICE, FOSSIL_FUEL_PRICE, INTEREST_RATE
+
+PRICES = (CAPITAL_PRICE, FOSSIL_FUEL_PRICE, INTEREST_RATE)
+
+
+def test_solve_adaptive():
+    """Dense transition path runs from K0 to the steady state and satisfies the equations of motion."""
+    model = TransitionDynamicsModel(ENERGY_MARKET, *PRICES, price_surrogate_rtol=1e-12)
+    equilibrium = model.equilibrium
+    K0 = 0.9 * equilibrium[1]
+    trajectory = model.solve_adaptive(0, K0, rtol=1e-10, atol=1e-12 * equilibrium)
+    t0, t1 = trajectory.t_span
+    assert abs(trajectory([t0])[0, 1] - K0) / K0 <= 1e-8
+    assert np.all(np.abs(trajectory([t1])[0] - equilibrium) / equilibrium <= 1e-5)
+
+    # central differences of the dense output match the right-hand side
+    ts = np.linspace(t0, t1, 11)[1:-1]
+    h = 1e-4 * (t1 - t0)
+    derivatives = (trajectory(ts + h) - trajectory(ts - h)) / (2 * h)
+    rhs = np.array([model._rhs(t, q, K) for t, (q, K) in zip(ts, trajectory(ts))])
+    assert np.allclose(derivatives, rhs, rtol=1e-3, atol=1e-8 * equilibrium)
+
+
+def test_solve_policy():
+    """Forward integration under the cached saddle path policy reproduces adaptive reverse shooting."""
+    model = TransitionDynamicsModel(ENERGY_MARKET, *PRICES, price_surrogate_rtol=1e-12)
+    equilibrium = model.equilibrium
+    K0s = np.array([0.5, 0.9]) * equilibrium[1]
+    ts = np.linspace(0, 1, 11)
+    solutions = model.solve_policy(ts, K0s, rtol=1e-10, atol=1e-12 * equilibrium[1])
+    assert solutions.shape == (ts.size, K0s.size, 2)
+
+    for K0, solution in zip(K0s, solutions.transpose(1, 0, 2)):
+        trajectory = model.solve_adaptive(0, K0, rtol=1e-10, atol=1e-12 * equilibrium)
+        valid = ts <= trajectory.t_span[1]
+        assert np.allclose(solution[valid], trajectory(ts[valid]), rtol=1e-6)
+    assert model.solve_policy(ts, K0s[1]).shape == (ts.size, 2)
+
+
+def test_saddle_path_reaching_q_one():
+    """
+    Transitions of a scenario whose saddle path reaches q = 1 just above the steady state: solver stages
+    outside the domain are rejected and the policy function above the steady state ends early.
+
+    """
+    _, scenario = utils.generate_scenario(7)
+    model = sweeps.build_model(scenario)
+    equilibrium = model.equilibrium
+    K0 = 0.5 * equilibrium[1]
+    solution = model.solve_policy(np.linspace(0, 1, 3), K0)
+    assert np.isclose(solution[0, 1], K0)
+    trajectory = model.solve_adaptive(0, K0)
+    assert np.isclose(trajectory([0])[0, 1], K0, rtol=1e-6)
+
+    policy = model.policy_function(K0, 10 * equilibrium[1])
+    assert equilibrium[1] < policy.domain[1] < 10 * equilibrium[1]
+    assert np.isclose(policy(policy.domain[1]), 1, atol=1e-4)
+
+
+def test_jacobian():
+    """Compare the analytic Jacobian of the (q, K) system with central finite differences."""
+    model = TransitionDynamicsModel(ENERGY_MARKET, *PRICES)
+    equilibrium = model.equilibrium
+    for X in (equilibrium, np.array([1 + 2 * (equilibrium[0] - 1), 0.5 * equilibrium[1]])):
+        analytic = np.array(model._jacobian(0, *X))
+        numeric = np.empty((2, 2))
+        for j, h in enumerate(np.diag(1e-6 * np.array([X[0] - 1, X[1]]))):  # investment depends on q - 1
+            numeric[:, j] = (np.array(model._rhs(0, *(X + h))) - np.array(model._rhs(0, *(X - h)))) / (2 * h[j])
+        # compare responses to relative changes in the state, row by row
+        scale = np.array([X[0] - 1, X[1]])
+        analytic, numeric = analytic * scale, numeric * scale
+        assert np.allclose(analytic, numeric, rtol=1e-4, atol=1e-6 * np.abs(numeric).max(axis=1, keepdims=True))
+
+
+def test_solve_collocation():
+    """Chebyshev collocation reproduces adaptive reverse shooting from the same initial capital stock."""
+    model = TransitionDynamicsModel(ENERGY_MARKET, *PRICES)
+    equilibrium = model.equilibrium
+    K0 = 0.9 * equilibrium[1]
+    trajectory = model.solve_collocation(K0, tol=1e-8)
+    t0, t1 = trajectory.t_span
+    assert trajectory.max_residual <= 1e-8
+    assert abs(trajectory([t0])[0, 1] - K0) / K0 <= 1e-10
+
+    reference = model.solve_adaptive(0, K0, rtol=1e-10, atol=1e-12 * equilibrium)
+    ts = np.linspace(t0, min(t1, reference.t_span[1]), 11)
+    assert np.allclose(trajectory(ts), reference(ts), rtol=1e-5)
+
+    # degree refinement stops at max_degree
+    try:
+        model.solve_collocation(K0, degree=4, max_degree=8)
+    except ValueError as error:
+        assert 'maximum degree 8' in str(error)
+    else:
+        raise AssertionError("Collocation did not fail at max_degree.")
+
+
+def test_trajectory_diagnostics():
+    """Diagnostics of a transition path clear the market at every point and are cached."""
+    model = TransitionDynamicsModel(ENERGY_MARKET, *PRICES)
+    equilibrium = model.equilibrium
+    trajectory = model.solve_adaptive(0, 0.9 * equilibrium[1], rtol=1e-10, atol=1e-12 * equilibrium)
+    ts, solution = trajectory.grid(trajectory.t_span[1] / 100)
+    diagnostics = model.trajectory_diagnostics(ts, solution[:, 0], solution[:, 1])
+    assert len(diagnostics) == ts.size
+    supply = diagnostics.renewable.output + diagnostics.non_renewable.output
+    assert np.allclose(supply, diagnostics.energy_demand, rtol=1e-10)
+    assert set(diagnostics.columns) >= {'t', 'energy_price', 'renewable_profits', 'non_renewable_costs'}
+    assert model.trajectory_diagnostics(ts, solution[:, 0], solution[:, 1]) is diagnostics
+
+    # plots take the diagnostics or, as before, the arrays of the path
+    for fig, old_fig in [(model.plot_sector_costs(diagnostics), model.plot_sector_costs(ts, *solution.T)),
+                         (model.plot_energy_price(diagnostics), model.plot_energy_price(ts, solution[:, 1])),
+                         (model.plot_sector_energy_output(diagnostics),
+                          model.plot_sector_energy_output(ts, solution[:, 0], solution[:, 1]))]:
+        for ax, old_ax in zip(fig.axes, old_fig.axes):
+            assert np.allclose(ax.lines[0].get_ydata(), old_ax.lines[0].get_ydata())
+
+
+def test_phase_diagram_loci():
+    """
+    Batched loci and vector field agree with the scalar locus and the equations of motion, and q without
+    a q_dot = 0 locus has NaN capital.
+
+    """
+    _, scenario = utils.generate_scenario(42)
+    model = sweeps.build_model(scenario)
+    equilibrium = model.equilibrium
+    qs = np.linspace(1.01, 1.2, 5) * equilibrium[0]
+    capital = model.q_dot_locus_grid(qs)
+    assert np.allclose(capital, [model.q_dot_locus(q) for q in qs], rtol=1e-10)
+    assert np.isnan(model.q_dot_locus_grid([1.5 * equilibrium[0]])).all()
+    assert np.allclose(model.K_dot_locus_grid(capital), equilibrium[0])
+
+    q_dot, K_dot = model.vector_field(qs[:, np.newaxis], capital)
+    assert q_dot.shape == K_dot.shape == (qs.size, capital.size)
+    assert np.allclose(np.diag(q_dot), 0, atol=1e-8 * np.abs(q_dot).max())
+    rhs = np.array([model._rhs(0, q, K) for q, K in zip(qs, capital[::-1])])
+    assert np.allclose(np.column_stack((np.diag(q_dot[:, ::-1]), np.diag(K_dot[:, ::-1]))), rhs, rtol=1e-10)
+
+
+def test_solve_implicit_integrators():
+    """Reverse shooting with the Jacobian passed to vode and lsoda reaches K0 along the path of an explicit integrator."""
+    model = TransitionDynamicsModel(ENERGY_MARKET, *PRICES)
+    K0 = 0.5 * model.equilibrium[1]
+    tolerances = {'nsteps': 10000, 'rtol': 1e-10, 'atol': 1e-12}
+    reference = model.solve(0, K0, 1e-3, 'dopri5', **tolerances)[1]  # capital increasing
+    # q as a function of capital with its slope from the equations of motion, since near K0 q can grow by
+    # orders of magnitude between outputs, where linear interpolation is inaccurate
+    q_dot, K_dot = np.array([model._rhs(0, q, capital) for q, capital in reference]).T
+    saddle_path = interpolate.CubicHermiteSpline(reference[:, 1], reference[:, 0], q_dot / K_dot)
+    for integrator, solver_kwargs in (('vode', {'method': 'bdf'}), ('lsoda', {})):
+        solution = model.solve(0, K0, 1e-2, integrator, **dict(tolerances, **solver_kwargs))[1][::-1]
+        assert solution[-1, 1] < K0  # the integrator did not stop early
+
+        # compare q as a function of capital (paths at the same time drift apart along the saddle path)
+        inside = solution[:, 1] >= reference[0, 1]
+        assert np.allclose(solution[inside, 0], saddle_path(solution[inside, 1]), rtol=1e-4)
+
+
+def test_ces_equilibrium_and_solve():
+    """
+    Equilibria and transitions with CES non-renewable production, including sigma > 1 where large capital
+    alone supplies more energy than is demanded, approach the Cobb-Douglas ones as sigma approaches 1.
+
+    """
+    _, scenario = utils.generate_scenario(1)
+    cobb_douglas = sweeps.build_model(scenario).equilibrium
+    for sigma in (0.5, 2.0):
+        model = sweeps.build_model(dict(scenario, non_renewable_sigma=sigma))
+        equilibrium = model.equilibrium
+        K0 = 0.5 * equilibrium[1]
+        solution = model.solve(0, K0, 1e-2, 'dopri5')[1]
+        assert np.all(np.isfinite(solution))
+        assert solution[0, 1] < K0 and np.isclose(solution[-1, 1], equilibrium[1], rtol=1e-5)
+
+    errors = []
+    for sigma in (0.99, 1.01, 0.999, 1.001):
+        equilibrium = sweeps.build_model(dict(scenario, non_renewable_sigma=sigma)).equilibrium
+        errors.append(np.max(np.abs(equilibrium - cobb_douglas) / cobb_douglas))
+    assert max(errors[2:]) < 0.2 * min(errors[:2])
+    assert max(errors[2:]) < 1e-2
@@ -0,0 +1,75 @@
+"""
+Confirms that the implicit function theorem sensitivities of the steady state and
+the forward sensitivities of transition paths match central finite differences
+of models re-solved with perturbed parameters.
+
+"""
+import numpy as np
+
+from models import SENSITIVITY_PARAMETERS
+import sweeps
+import utils
+
+SEED, SCENARIO = utils.generate_scenario(1234)
+SCENARIO_KEYS = {'capital_price': 'capital_price', 'fossil_fuel_price': 'fossil_fuel_price',
+                 'interest_rate': 'interest_rate', 'mu': 'renewable_mu', 'phi': 'non_renewable_phi'}
+
+# relative steps of the finite differences: differences of re-solved equilibria over small steps of mu are
+# dominated by solver noise (the analytic dK/dmu is -0.130941, a step of 1e-5 is off by 0.2% and 1e-2 by 2e-6)
+EQUILIBRIUM_STEPS = dict(dict.fromkeys(SENSITIVITY_PARAMETERS, 1e-5), mu=1e-2)
+PATH_STEPS = dict(dict.fromkeys(SENSITIVITY_PARAMETERS, 1e-4), mu=1e-2)
+
+
+def _perturbed_models(parameter, h=1e-5):
+    """Models with the parameter scaled by 1 - h and 1 + h, and the absolute step between them."""
+    key = SCENARIO_KEYS[parameter]
+    models = [sweeps.build_model(dict(SCENARIO, **{key: (1 + sign * h) * SCENARIO[key]})) for sign in (-1, 1)]
+    return models, 2 * h * SCENARIO[key]
+
+
+def test_market_price_derivatives():
+    """Derivatives of the market clearing price for fixed capital match finite differences."""
+    model = sweeps.build_model(SCENARIO)
+    capital = 0.5 * model.equilibrium[1]
+    derivatives = model._price_parameter_derivatives(capital, model._compute_energy_price(capital))
+    for parameter, derivative in zip(SENSITIVITY_PARAMETERS, derivatives):
+        (lower, upper), step = _perturbed_models(parameter)
+        expected = (upper._compute_energy_price(capital) - lower._compute_energy_price(capital)) / step
+        assert np.isclose(derivative, expected, rtol=1e-6, atol=1e-9 * abs(model._compute_energy_price(capital)))
+
+
+def test_equilibrium_sensitivities():
+    """Steady state derivatives and elasticities match finite differences of re-solved equilibria."""
+    model = sweeps.build_model(SCENARIO)
+    sensitivities = model.equilibrium_sensitivities()
+    assert sensitivities.parameters == SENSITIVITY_PARAMETERS
+    for i, parameter in enumerate(SENSITIVITY_PARAMETERS):
+        (lower, upper), step = _perturbed_models(parameter, EQUILIBRIUM_STEPS[parameter])
+        dq, dK = (upper.equilibrium - lower.equilibrium) / step
+        dp = (upper._compute_energy_price(upper.equilibrium[1]) -
+              lower._compute_energy_price(lower.equilibrium[1])) / step
+        expected = np.array([dq, dK, dp])
+        computed = np.array([sensitivities.q[i], sensitivities.capital[i], sensitivities.energy_price[i]])
+        assert np.allclose(computed, expected, rtol=1e-5, atol=1e-8 * np.abs(expected).max())
+
+    elasticities = model.equilibrium_sensitivities(elasticities=True)
+    assert np.isclose(elasticities.capital[0], sensitivities.capital[0] * SCENARIO['capital_price'] / model.equilibrium[1])
+
+
+def test_path_sensitivities():
+    """Derivatives along the transition path match finite differences of re-solved saddle paths."""
+    solver_kwargs = {'rtol': 1e-11, 'atol': 1e-13}
+    model = sweeps.build_model(SCENARIO)
+    K0 = 0.8 * model.equilibrium[1]
+    ts = np.linspace(0, model.solve_adaptive(0, K0, **solver_kwargs).t_span[1] / 2, 5)
+    sensitivities = model.path_sensitivities(ts, K0, **solver_kwargs)
+    assert sensitivities.capital.shape == (ts.size, len(SENSITIVITY_PARAMETERS))
+    assert np.allclose(sensitivities.capital[0], 0, atol=1e-8 * np.abs(sensitivities.capital).max())  # K(0) = K0
+    for i, parameter in enumerate(SENSITIVITY_PARAMETERS):
+        (lower, upper), step = _perturbed_models(parameter, PATH_STEPS[parameter])
+        dq, dK = ((upper.solve_adaptive(0, K0, **solver_kwargs)(ts) -
+                   lower.solve_adaptive(0, K0, **solver_kwargs)(ts)) / step).T
+        scale = np.abs(sensitivities.q[:, i]).max()
+        assert np.allclose(sensitivities.q[:, i], dq, rtol=1e-3, atol=1e-4 * scale)
+        scale = np.abs(sensitivities.capital[:, i]).max()
+        assert np.allclose(sensitivities.capital[:, i], dK, rtol=1e-3, atol=1e-4 * scale)
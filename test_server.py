@@ -0,0 +1,85 @@
+"""
+Confirms that concurrent identical scenario queries share one solve, that repeated
+queries (and equilibria of solved trajectories) are served from the cache, and
+that the HTTP endpoints answer with JSON.
+
+"""
+import asyncio
+import concurrent.futures
+import json
+
+import numpy as np
+
+import server
+import sweeps
+import utils
+
+
+SEED, SCENARIO = utils.generate_scenario(7)
+REQUEST = {'scenario': {column: float(value) for column, value in SCENARIO.items()}}
+
+
+def test_coalescing_and_caching():
+    """Eight concurrent queries cost one solve and later queries none."""
+    async def run():
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            scenario_server = server.ScenarioServer(executor=executor)
+            answers = await asyncio.gather(*[scenario_server.query('equilibrium', REQUEST) for _ in range(8)])
+            repeated = await scenario_server.query('equilibrium', REQUEST)
+            trajectory = await scenario_server.query('trajectory', dict(REQUEST, ts=[0, 0.5, 1]))
+            other = dict(REQUEST['scenario'], renewable_mu=2 * REQUEST['scenario']['renewable_mu'])
+            await scenario_server.query('trajectory', {'scenario': other, 'ts': [0, 1]})
+            await scenario_server.query('equilibrium', {'scenario': other})
+            return scenario_server.stats, answers, repeated, trajectory
+
+    stats, answers, repeated, trajectory = asyncio.run(run())
+    assert stats['solves'] == 3 and stats['coalesced'] == 7 and stats['hits'] == 2
+    assert all(answer == repeated for answer in answers)
+    assert np.allclose([repeated['equilibrium_q'], repeated['equilibrium_capital']],
+                       sweeps.build_model(SCENARIO).equilibrium, rtol=1e-12)
+    assert np.isclose(trajectory['capital'][0], 0.5 * repeated['equilibrium_capital'])
+
+
+def test_thread_executor():
+    """Different scenarios solved concurrently on a pool of threads get the answers of solving them one by one."""
+    _, scenarios = utils.generate_scenarios(6, seed=11)
+    requests = [{'scenario': {column: float(values[i]) for column, values in scenarios.items() if column != 'seed'},
+                 'ts': [0, 0.5, 1]} for i in range(6)]
+
+    async def run():
+        with concurrent.futures.ThreadPoolExecutor(6) as executor:
+            scenario_server = server.ScenarioServer(executor=executor)
+            return await asyncio.gather(*[scenario_server.query('trajectory', request) for request in requests])
+
+    answers = asyncio.run(run())
+    for request, answer in zip(requests, answers):
+        assert answer == server._solve('trajectory', server._parse_request('trajectory', request))
+
+
+def test_http_endpoints():
+    """POST queries, malformed queries and statistics over HTTP."""
+    async def fetch(port, method, path, body=None):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        payload = b'' if body is None else json.dumps(body).encode()
+        writer.write('{} {} HTTP/1.1\r\nContent-Length: {}\r\n\r\n'.format(method, path, len(payload)).encode() + payload)
+        response = await reader.read()
+        writer.close()
+        head, _, body = response.partition(b'\r\n\r\n')
+        return int(head.split()[1]), json.loads(body.decode())
+
+    async def run():
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            scenario_server = server.ScenarioServer(port=0, executor=executor)
+            await scenario_server.start()
+            try:
+                return [await fetch(scenario_server.port, 'POST', '/equilibrium', REQUEST),
+                        await fetch(scenario_server.port, 'POST', '/equilibrium', {'scenario': {}}),
+                        await fetch(scenario_server.port, 'GET', '/unknown'),
+                        await fetch(scenario_server.port, 'GET', '/stats')]
+            finally:
+                await scenario_server.close()
+
+    (status, answer), (bad_status, _), (missing_status, _), (_, stats) = asyncio.run(run())
+    assert status == 200 and answer['equilibrium_capital'] > 0
+    assert bad_status == 400 and missing_status == 404
+    assert stats['solves'] == 1
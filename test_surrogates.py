@@ -0,0 +1,35 @@
+"""
+Confirms that the piecewise Chebyshev surrogate for the wholesale energy price
+respects its relative error bound against the analytic market price and extends
+its domain when capital leaves the fitted range.
+
+"""
+import numpy as np
+
+from models import TransitionDynamicsModel
+from test_energy_markets import ENERGY_MARKET, CAPITAL_PRICE, FOSSIL_FUEL_PRICE, INTEREST_RATE, _energy_market_price
+
+
+def test_energy_price_surrogate():
+    """Compare surrogate energy prices with the analytic solution."""
+    prices = (CAPITAL_PRICE, FOSSIL_FUEL_PRICE, INTEREST_RATE)
+    model = TransitionDynamicsModel(ENERGY_MARKET, *prices, price_surrogate_rtol=1e-10)
+    capital = np.logspace(-3, 3, 1001)
+    analytic_result = _energy_market_price(capital, ENERGY_MARKET, *prices)
+    surrogate_result = model._compute_energy_prices(capital)
+    scalar_result = np.array([model._compute_energy_price(K) for K in capital[::100]])
+    assert np.all(np.abs(analytic_result - surrogate_result) / analytic_result <= 1e-9)
+    assert np.allclose(scalar_result, surrogate_result[::100], rtol=1e-14)
+
+
+def test_energy_price_surrogate_domain():
+    """Surrogate extends its domain when capital leaves the fitted range."""
+    prices = (CAPITAL_PRICE, FOSSIL_FUEL_PRICE, INTEREST_RATE)
+    model = TransitionDynamicsModel(ENERGY_MARKET, *prices, price_surrogate_rtol=1e-10)
+    surrogate = model._energy_price_surrogate
+    surrogate.fit(1.0, 10.0)
+    model._compute_energy_price(1e4)
+    lower, upper = surrogate.domain
+    assert lower <= 1.0 and upper >= 1e4
+    analytic_result = _energy_market_price(1e4, ENERGY_MARKET, *prices)
+    assert abs(model._compute_energy_price(1e4) - analytic_result) / analytic_result <= 1e-9
@@ -0,0 +1,59 @@
+"""
+Confirms that a scenario sweep reproduces the equilibria of models built one at a
+time, gives identical results in parallel and in serial, and records failures per
+scenario without aborting the sweep.
+
+"""
+import numpy as np
+
+import sweeps
+import utils
+
+
+SEED, SCENARIOS = utils.generate_scenarios(6, seed=42)
+
+
+def test_sweep_equilibria():
+    """Equilibria match models built from the scenarios regenerated from their seeds."""
+    results = sweeps.sweep(SCENARIOS, processes=1)
+    assert np.array_equal(results['seed'], SCENARIOS['seed'])
+    for i, seed in enumerate(results['seed']):
+        _, scenario = utils.generate_scenario(seed)
+        equilibrium = sweeps.build_model(scenario).equilibrium
+        assert np.allclose([results['equilibrium_q'][i], results['equilibrium_capital'][i]], equilibrium, rtol=1e-12)
+
+
+def test_sweep_parallel():
+    """Transitions computed on a process pool match the serial sweep, and failures are collected."""
+    scenarios = dict(SCENARIOS)
+    scenarios['capital_price'] = np.where(np.arange(6) == 2, -1.0, scenarios['capital_price'])  # no market clears
+    ts = np.linspace(0, 1, 5)
+    serial = sweeps.sweep(scenarios, ts, processes=1, price_surrogate_rtol=1e-12)
+    parallel = sweeps.sweep(scenarios, ts, processes=2, chunk_size=2, price_surrogate_rtol=1e-12)
+
+    failed = serial['error'] != ''
+    assert np.array_equal(failed, np.arange(6) == 2)
+    assert np.array_equal(serial['error'], parallel['error'])
+    assert np.isnan(serial['equilibrium_capital'][2])
+    assert serial['capital'].shape == (6, ts.size)
+    assert np.allclose(serial['capital'][~failed, 0], 0.5 * serial['equilibrium_capital'][~failed])
+    for column in ('equilibrium_q', 'equilibrium_capital', 'q', 'capital'):
+        assert np.array_equal(serial[column], parallel[column], equal_nan=True)
+
+
+def test_continuation():
+    """Warm started solves along a parameter path match cold solves at every point."""
+    _, scenario = utils.generate_scenario(seed=42)
+    values = scenario['renewable_mu'] * np.linspace(1, 1.5, 4)
+    ts = np.linspace(0, 10, 6)
+    results = sweeps.continuation(scenario, 'renewable_mu', values, ts)
+    assert np.array_equal(results['renewable_mu'], values)
+    assert np.all(results['solves'] >= 1)
+
+    for i, value in enumerate(values):
+        model = sweeps.build_model(dict(scenario, renewable_mu=value))
+        equilibrium = model.equilibrium
+        assert np.allclose([results['equilibrium_q'][i], results['equilibrium_capital'][i]], equilibrium, rtol=1e-12)
+        trajectory = model.solve_collocation(0.5 * equilibrium[1])
+        assert np.allclose(results['capital'][i], trajectory(ts)[:, 1], rtol=1e-6)
+        assert np.allclose(results['q'][i] - 1, trajectory(ts)[:, 0] - 1, rtol=1e-6)
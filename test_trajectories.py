@@ -0,0 +1,57 @@
+"""
+Confirms that the trajectory buffer returns exactly the rows appended to it,
+both when growing in memory and when spilling chunks to a memory-mapped file.
+
+"""
+import numpy as np
+
+from trajectories import TrajectoryBuffer
+
+
+ROWS = np.random.RandomState(42).standard_normal((1000, 3))
+
+
+def test_trajectory_buffer_in_memory():
+    """Rows appended one at a time and in blocks survive geometric growth."""
+    trajectory = TrajectoryBuffer(3, chunk_size=16)
+    for row in ROWS[:500]:
+        trajectory.append(row)
+    trajectory.extend(ROWS[500:])
+    assert len(trajectory) == ROWS.shape[0]
+    assert np.array_equal(trajectory.finalize(), ROWS)
+
+
+def test_trajectory_buffer_spilled(tmpdir):
+    """Rows spilled to a .npy file are returned memory-mapped."""
+    filename = str(tmpdir.join('trajectory.npy'))
+    trajectory = TrajectoryBuffer(3, chunk_size=64, filename=filename)
+    for row in ROWS[:500]:
+        trajectory.append(row)
+    trajectory.extend(ROWS[500:])
+    result = trajectory.finalize()
+    assert isinstance(result, np.memmap)
+    assert np.array_equal(result, ROWS)
+    assert np.array_equal(np.load(filename), ROWS)
+
+
+def test_trajectory_buffer_header(tmpdir):
+    """The header is written at a fixed length, so the data starts at the same offset for any number of rows."""
+    for number_rows in (0, 1, 10**5):
+        filename = str(tmpdir.join('trajectory_{}.npy'.format(number_rows)))
+        trajectory = TrajectoryBuffer(1, chunk_size=4096, filename=filename)
+        trajectory.extend(np.arange(number_rows, dtype=float)[:, np.newaxis])
+        result = trajectory.finalize()
+        assert result.offset == 128
+        assert np.array_equal(result[:, 0], np.arange(number_rows))
+
+
+def test_trajectory_buffer_closed_on_error(tmpdir):
+    """The file of a spilled trajectory is closed when filling the buffer raises."""
+    filename = str(tmpdir.join('trajectory.npy'))
+    try:
+        with TrajectoryBuffer(3, chunk_size=64, filename=filename) as trajectory:
+            trajectory.extend(ROWS[:100])
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    assert trajectory._file.closed
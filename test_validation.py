@@ -0,0 +1,68 @@
+"""
+Confirms that batched and per-scenario numeric solutions agree with the analytic
+market prices and steady states across many vectorized draws, and that failing
+scenarios are isolated and reported first while scenarios without a representable
+analytic solution are reported separately.
+
+"""
+import numpy as np
+
+import utils
+import validation
+
+
+SEED, SCENARIOS = utils.draw_scenarios(2000, seed=42)
+
+
+def test_validate_batched():
+    """Market prices and steady states of every draw match the analytic solutions."""
+    results = validation.validate(SCENARIOS, chunk_size=500)
+    assert len(results['market_price']) == 2000
+    # market prices at extreme capital of draws with small renewable alpha leave the float range
+    assert results['market_price'].undefined < 0.01 * 2000
+    for result in results.values():
+        assert result.failures == 0
+        if result.quantity != 'market_price':
+            assert result.undefined == 0
+        assert result.quantiles()[1.0] <= 1e-10
+        errors = [error for _, error in result.worst(5)]
+        assert errors == sorted(errors, reverse=True)
+        assert result.quantity in result.report()
+
+
+def test_validate_sweep():
+    """Steady states found one scenario at a time match the batched ones."""
+    scenarios = {column: values[:20] for column, values in SCENARIOS.items()}
+    batched = validation.validate(scenarios)
+    swept = validation.validate(scenarios, method='sweep')
+    for quantity in ('equilibrium_q', 'equilibrium_capital', 'equilibrium_energy_price'):
+        assert np.array_equal(batched[quantity].ids, swept[quantity].ids)
+        assert np.allclose(batched[quantity].numeric, swept[quantity].numeric, rtol=1e-10)
+
+
+def test_isolate_failures():
+    """Scenarios that make a batch fail are split off and reported as failures."""
+    def solve(columns):
+        if np.any(columns['x'] < 0):
+            raise ValueError
+        return columns['x'][:, np.newaxis]
+
+    x = np.arange(10.0)
+    x[[3, 7]] = -1
+    rows = validation._solve_isolating_failures((solve, 1, {'x': x}))[:, 0]
+    assert np.array_equal(np.isnan(rows), x < 0)
+
+    result = validation.ValidationResult('x', np.arange(10), np.ones(10), np.where(x < 0, np.nan, 1 + 1e-3 * x))
+    assert result.failures == 2
+    assert [id_ for id_, _ in result.worst(3)] == [3, 7, 9]
+
+    # analytic solutions beyond the float range are undefined rather than failures
+    result = validation.ValidationResult('x', np.arange(10), np.where(x < 0, np.inf, 1), np.full(10, np.nan))
+    assert result.failures == 8 and result.undefined == 2
+    assert 3 not in [id_ for id_, _ in result.worst(10)]
+    assert '2 undefined' in result.report()
+
+    # as for the market prices of small renewable alpha
+    scenarios = dict({column: values[:1] for column, values in SCENARIOS.items()}, renewable_alpha=np.array([0.01]),
+                     non_renewable_alpha=np.array([0.99]), non_renewable_beta=np.array([0.01]))
+    assert not np.isfinite(validation.analytic_market_prices(scenarios, 1e-6)).any()
@@ -0,0 +1,210 @@
+import struct
+
+import numpy as np
+
+
+_HEADER_LENGTH = 128  # bytes reserved for the .npy header of a spilled trajectory
+
+
+class TrajectoryBuffer:
+
+    def __init__(self, ncols, chunk_size=4096, filename=None):
+        """
+        Append-only store for the rows of a trajectory. Rows are kept in a preallocated array that
+        grows geometrically or, if filename is given, are written to a .npy file one chunk at a time.
+        The file is closed by finalize, or by close (e.g., when used as a context manager) if the
+        trajectory is abandoned.
+
+        """
+        self._ncols = ncols
+        self._chunk_size = chunk_size
+        self._filename = filename
+
+        self._rows = np.empty((chunk_size, ncols))
+        self._number_rows = 0  # rows currently held in self._rows
+        self._number_spilled = 0  # rows already written to file
+
+        if filename is not None:
+            self._header(np.iinfo(np.int64).max)  # the reserved header fits any number of rows
+            self._file = open(filename, 'w+b')
+            self._file.write(self._header(0))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._number_spilled + self._number_rows
+
+    def append(self, row):
+        """Append a single row to the trajectory."""
+        if self._number_rows == self._rows.shape[0]:
+            self._make_room()
+        self._rows[self._number_rows] = row
+        self._number_rows += 1
+
+    def extend(self, rows):
+        """Append a block of rows to the trajectory."""
+        for start in range(0, rows.shape[0], self._chunk_size):
+            block = rows[start:start + self._chunk_size]
+            if self._number_rows + block.shape[0] > self._rows.shape[0]:
+                self._make_room(block.shape[0])
+            self._rows[self._number_rows:self._number_rows + block.shape[0]] = block
+            self._number_rows += block.shape[0]
+
+    def finalize(self):
+        """Return the trajectory as an array (memory-mapped, read-only if it was spilled to file)."""
+        if self._filename is None:
+            return self._rows[:self._number_rows]
+
+        try:
+            self._spill()
+            self._file.seek(0)
+            self._file.write(self._header(self._number_spilled))
+        finally:
+            self._file.close()
+        return np.load(self._filename, mmap_mode='r')
+
+    def close(self):
+        """Close the file a spilled trajectory is written to (rows written so far stay on disk)."""
+        if self._filename is not None:
+            self._file.close()
+
+    def _make_room(self, number_rows=1):
+        """Spill a full chunk to file, or grow the in-memory array geometrically."""
+        if self._filename is not None:
+            self._spill()
+        else:
+            capacity = max(2 * self._rows.shape[0], self._number_rows + number_rows)
+            rows = np.empty((capacity, self._ncols))
+            rows[:self._number_rows] = self._rows[:self._number_rows]
+            self._rows = rows
+
+    def _spill(self):
+        self._file.write(self._rows[:self._number_rows].tobytes())
+        self._number_spilled += self._number_rows
+        self._number_rows = 0
+
+    def _header(self, number_rows):
+        """
+        Version 1.0 .npy header for number_rows rows, padded with spaces to _HEADER_LENGTH bytes so that
+        it can be rewritten in place whatever the final number of rows.
+
+        """
+        header = repr({'descr': np.lib.format.dtype_to_descr(self._rows.dtype), 'fortran_order': False,
+                       'shape': (number_rows, self._ncols)}).encode('latin1')
+        magic = np.lib.format.magic(1, 0)
+        width = _HEADER_LENGTH - len(magic) - 2  # the header length field takes two bytes
+        if len(header) >= width:
+            raise ValueError("Header of {} does not fit in {} bytes.".format(self._filename, _HEADER_LENGTH))
+        return magic + struct.pack('<H', width) + header.ljust(width - 1) + b'\n'
+
+
+class DenseTrajectory:
+
+    def __init__(self, reverse_solution, t0, duration, nfev):
+        """
+        Continuous transition path built from the dense output of a reverse shooting integration that
+        ran backwards from the steady state for the given duration. Forward time t0 corresponds to the
+        end of the reverse integration (i.e., the initial capital stock).
+
+        """
+        self._reverse_solution = reverse_solution
+        self.t0 = t0
+        self.duration = duration
+        self.nfev = nfev
+
+    def __call__(self, ts):
+        """Evaluate (q, K) on the time grid ts, returning an array of shape (len(ts), 2)."""
+        ts = np.asarray(ts, dtype=float)
+        if np.any(ts < self.t0) or np.any(ts > self.t0 + self.duration):
+            raise ValueError("Requested times lie outside [{}, {}].".format(self.t0, self.t0 + self.duration))
+        return self._reverse_solution(self.duration - (ts - self.t0)).T
+
+    @property
+    def t_span(self):
+        """Interval of forward time covered by the trajectory."""
+        return self.t0, self.t0 + self.duration
+
+    def grid(self, dt):
+        """Evaluate the trajectory on an evenly spaced grid with step dt, returning (ts, solution)."""
+        ts = np.arange(self.t0, self.t0 + self.duration, dt)
+        return ts, self(ts)
+
+
+class CollocationTrajectory:
+
+    def __init__(self, log_q_minus_one_polynomial, log_capital_polynomial, max_residual, iterations, equilibrium):
+        """
+        Transition path on a finite horizon given by Chebyshev polynomials for log(q - 1) and log(K), as
+        returned by collocation. max_residual is the largest residual of the equations of motion for
+        these variables (i.e., relative to q - 1 and K) on a fine grid, and equilibrium is the steady
+        state (q, K) the path converges to.
+
+        """
+        self.log_q_minus_one_polynomial = log_q_minus_one_polynomial
+        self.log_capital_polynomial = log_capital_polynomial
+        self.max_residual = max_residual
+        self.iterations = iterations
+        self.equilibrium = equilibrium
+
+    def __call__(self, ts):
+        """Evaluate (q, K) on the time grid ts, returning an array of shape (len(ts), 2)."""
+        ts = np.asarray(ts, dtype=float)
+        t0, t1 = self.t_span
+        if np.any(ts < t0) or np.any(ts > t1):
+            raise ValueError("Requested times lie outside [{}, {}].".format(t0, t1))
+        return np.column_stack((1 + np.exp(self.log_q_minus_one_polynomial(ts)), np.exp(self.log_capital_polynomial(ts))))
+
+    @property
+    def degree(self):
+        """Degree of the Chebyshev polynomials."""
+        return self.log_q_minus_one_polynomial.degree()
+
+    @property
+    def t_span(self):
+        """Interval of time covered by the trajectory."""
+        return tuple(self.log_q_minus_one_polynomial.domain)
+
+    def grid(self, dt):
+        """Evaluate the trajectory on an evenly spaced grid with step dt, returning (ts, solution)."""
+        t0, t1 = self.t_span
+        ts = np.arange(t0, t1, dt)
+        return ts, self(ts)
+
+
+class TrajectoryDiagnostics:
+
+    def __init__(self, ts, q, capital, energy_price, energy_price_growth, energy_demand, renewable, non_renewable):
+        """
+        Columnar post-processing of a transition path: prices, energy demand and the states of the
+        renewable and non-renewable sectors (RenewableSectorState and NonRenewableSectorState of arrays)
+        at every point in time.
+
+        """
+        self.ts = ts
+        self.q = q
+        self.capital = capital
+        self.energy_price = energy_price
+        self.energy_price_growth = energy_price_growth
+        self.energy_demand = energy_demand
+        self.renewable = renewable
+        self.non_renewable = non_renewable
+
+    def __len__(self):
+        return self.ts.size
+
+    @property
+    def columns(self):
+        """Flat dict of all columns, with sector columns prefixed by 'renewable_' and 'non_renewable_'."""
+        columns = {'t': self.ts, 'q': self.q, 'capital': self.capital, 'energy_price': self.energy_price,
+                   'energy_price_growth': self.energy_price_growth, 'energy_demand': self.energy_demand}
+        columns.update(('renewable_' + field, value) for field, value in self.renewable._asdict().items())
+        columns.update(('non_renewable_' + field, value) for field, value in self.non_renewable._asdict().items())
+        return columns
+
+    def save(self, filename):
+        """Save the columns to a .npz file."""
+        np.savez(filename, **self.columns)
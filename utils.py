@@ -1,6 +1,12 @@
 import numpy as np
 
 
+SCENARIO_COLUMNS = ('capital_price', 'fossil_fuel_price', 'interest_rate', 'quantity_demand',
+                    'renewable_alpha', 'renewable_delta', 'renewable_mu', 'renewable_tfp',
+                    'non_renewable_tfp', 'non_renewable_alpha', 'non_renewable_beta', 'non_renewable_gamma',
+                    'non_renewable_delta', 'non_renewable_phi', 'non_renewable_sigma')
+
+
 def generate_consumer_params(seed=None):
     """Generate random parameters for a wholesale energy market consumer."""
     seed, prng = _generate_prng(seed)
@@ -9,6 +15,17 @@ def generate_consumer_params(seed=None):
     return seed, params
 
 
+def generate_consumer_population_params(number_consumers, number_classes=4, seed=None):
+    """Generate random parameters for a ConsumerPopulation whose consumers belong to a few demand classes."""
+    seed, prng = _generate_prng(seed)
+    class_elasticities = prng.uniform(0, 1, size=number_classes)
+    elasticity = class_elasticities[prng.randint(number_classes, size=number_consumers)]
+    quantity_demand = prng.lognormal(size=number_consumers)
+    quantity_demand *= prng.randint(1, 1000000) / quantity_demand.sum()  # total demand at unit price as for a consumer
+    params = {'quantity_demand': quantity_demand, 'elasticity': elasticity}
+    return seed, params
+
+
 def generate_non_renewable_sector_params(renewable_params, seed=None):
     """Generate random parameters for a RenewableEnergySector."""
     seed, prng = _generate_prng(seed)
@@ -39,6 +56,62 @@ def generate_renewable_sector_params(seed=None):
     return seed, params
 
 
+def generate_scenarios(number_scenarios, seed=None):
+    """
+    Generate a table of random scenarios (consumer, sector parameters and prices) as a dict of columns.
+    Each scenario records its own seed, from which generate_scenario reproduces it.
+
+    """
+    seed, prng = _generate_prng(seed)
+    seeds = prng.randint(np.iinfo(np.int32).max, size=number_scenarios)
+    scenarios = [generate_scenario(scenario_seed)[1] for scenario_seed in seeds]
+    table = {column: np.array([scenario[column] for scenario in scenarios]) for column in SCENARIO_COLUMNS}
+    table['seed'] = seeds
+    return seed, table
+
+
+def draw_scenarios(number_scenarios, seed=None):
+    """
+    Vectorized version of generate_scenarios drawing every column in one call (scenarios have no seeds
+    of their own and are identified by their row). Demand is drawn from 1 upwards to avoid the
+    degenerate market without demand.
+
+    """
+    seed, prng = _generate_prng(seed)
+    renewable_alpha = prng.beta(2, 4, size=number_scenarios)
+    renewable_delta, renewable_mu, renewable_tfp = prng.lognormal(size=(3, number_scenarios))
+    non_renewable_alpha = 1 - renewable_alpha
+    non_renewable_phi, non_renewable_tfp = prng.lognormal(size=(2, number_scenarios))
+    non_renewable_delta = prng.lognormal(np.log(0.025) - 0.5, size=number_scenarios)
+    capital_price, fossil_fuel_price = prng.lognormal(size=(2, number_scenarios))
+    interest_rate = prng.lognormal(np.log(0.09) - 0.5, size=number_scenarios)
+    table = {'capital_price': capital_price, 'fossil_fuel_price': fossil_fuel_price, 'interest_rate': interest_rate,
+             'quantity_demand': prng.randint(1, 1000000, size=number_scenarios),
+             'renewable_alpha': renewable_alpha, 'renewable_delta': renewable_delta, 'renewable_mu': renewable_mu,
+             'renewable_tfp': renewable_tfp, 'non_renewable_tfp': non_renewable_tfp,
+             'non_renewable_alpha': non_renewable_alpha, 'non_renewable_beta': 1 - non_renewable_alpha,
+             'non_renewable_gamma': np.ones(number_scenarios, dtype=int),
+             'non_renewable_delta': non_renewable_delta, 'non_renewable_phi': non_renewable_phi,
+             'non_renewable_sigma': np.ones(number_scenarios, dtype=int)}
+    return seed, table
+
+
+def generate_scenario(seed=None):
+    """Generate one random scenario as a flat dict with prefixed sector parameters."""
+    seed, prng = _generate_prng(seed)
+    consumer_seed, renewable_seed, non_renewable_seed, prices_seed = prng.randint(np.iinfo(np.int32).max, size=4)
+    _, consumer_params = generate_consumer_params(consumer_seed)
+    _, renewable_params = generate_renewable_sector_params(renewable_seed)
+    _, non_renewable_params = generate_non_renewable_sector_params(renewable_params, non_renewable_seed)
+    _, prices = generate_prices(prices_seed)
+
+    scenario = dict(zip(('capital_price', 'fossil_fuel_price', 'interest_rate'), prices))
+    scenario.update(consumer_params)
+    scenario.update(('renewable_' + key, value) for key, value in renewable_params.items())
+    scenario.update(('non_renewable_' + key, value) for key, value in non_renewable_params.items())
+    return seed, scenario
+
+
 def _generate_prng(seed=None):
     """Generate seed for a random number generator."""
     if seed is None:
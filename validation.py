@@ -0,0 +1,191 @@
+import concurrent.futures
+import math
+import os
+
+import numpy as np
+
+import sweeps
+from utils import SCENARIO_COLUMNS
+
+
+class ValidationResult:
+
+    def __init__(self, quantity, ids, analytic, numeric):
+        """
+        Relative errors of numeric solutions for one quantity (e.g., 'equilibrium_capital') against the
+        analytic solution across scenarios identified by ids (their seeds, or rows of the table). Scenarios
+        whose numeric solution failed have NaN errors and are counted as failures. Scenarios whose analytic
+        solution is not a positive float (e.g., a price beyond the float range) have no error and are only
+        counted as undefined.
+
+        """
+        self.quantity = quantity
+        self.ids = ids
+        self.analytic = analytic
+        self.numeric = numeric
+        self.defined = np.isfinite(analytic) & (analytic != 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.relative_error = np.abs(numeric - analytic) / np.abs(analytic)
+
+    def __len__(self):
+        return self.ids.size
+
+    @property
+    def failures(self):
+        """Number of scenarios with an analytic solution but without a numeric one."""
+        return int(np.sum(np.isnan(self.relative_error[self.defined])))
+
+    @property
+    def undefined(self):
+        """Number of scenarios whose analytic solution cannot be represented, so that they have no error."""
+        return int(np.sum(~self.defined))
+
+    def quantiles(self, qs=(0.5, 0.9, 0.99, 0.999, 1.0)):
+        """Quantiles of the relative errors of the solved scenarios, as a dict."""
+        errors = self.relative_error[self.defined]
+        solved = errors[~np.isnan(errors)]
+        if solved.size == 0:
+            return {q: np.nan for q in qs}
+        return dict(zip(qs, np.quantile(solved, qs)))
+
+    def worst(self, n=10):
+        """Ids and relative errors of the n worst scenarios, failures first (undefined ones are left out)."""
+        errors = np.where(np.isnan(self.relative_error), np.inf, self.relative_error)
+        rows = np.flatnonzero(self.defined)[np.argsort(-errors[self.defined], kind='stable')[:n]]
+        return list(zip(self.ids[rows], self.relative_error[rows]))
+
+    def report(self, n=10):
+        """Error distribution and the worst scenarios as a table of text."""
+        lines = ['{}: {} scenarios, {} failed, {} undefined'.format(self.quantity, len(self), self.failures,
+                                                                   self.undefined)]
+        lines.extend('  {:>7.1%} quantile {:10.3e}'.format(q, error) for q, error in self.quantiles().items())
+        lines.extend('  worst {:>12} {:10.3e}'.format(id_, error) for id_, error in self.worst(n))
+        return '\n'.join(lines)
+
+
+def analytic_market_prices(scenarios, capital):
+    """
+    Wholesale market prices for arrays of scenarios and capital with fixed demand, Cobb-Douglas
+    non-renewable production and renewable alpha equal to non-renewable beta.
+
+    """
+    alpha = scenarios['renewable_alpha']
+    tfp_NR, tfp_R = scenarios['non_renewable_tfp'], scenarios['renewable_tfp']
+    mu_R, delta_R = scenarios['renewable_mu'], scenarios['renewable_delta']
+    capital_price, fossil_fuel_price = scenarios['capital_price'], scenarios['fossil_fuel_price']
+    interest_rate = scenarios['interest_rate']
+    denominator = (tfp_NR**(1 / (1 - alpha)) * (1 / fossil_fuel_price)**(alpha / (1 - alpha)) * capital +
+                   tfp_R**(1 / (1 - alpha)) *
+                   (((1 + mu_R) / capital_price) * (1 / (interest_rate + delta_R)))**(alpha / (1 - alpha)))
+    with np.errstate(over='ignore'):  # small alpha takes prices beyond the float range
+        return (1 / alpha) * (scenarios['quantity_demand'] / denominator)**((1 - alpha) / alpha)
+
+
+def analytic_equilibria(scenarios):
+    """Steady state (q, capital, energy_price) arrays for the scenarios, under the same assumptions."""
+    alpha = scenarios['renewable_alpha']
+    delta_NR, phi = scenarios['non_renewable_delta'], scenarios['non_renewable_phi']
+    tfp_NR, tfp_R = scenarios['non_renewable_tfp'], scenarios['renewable_tfp']
+    mu_R, delta_R = scenarios['renewable_mu'], scenarios['renewable_delta']
+    capital_price, fossil_fuel_price = scenarios['capital_price'], scenarios['fossil_fuel_price']
+    interest_rate = scenarios['interest_rate']
+
+    q = 1 + (3 / 2) * delta_NR**2 * phi
+    energy_price = (alpha**-alpha * (fossil_fuel_price / tfp_NR) *
+                    ((capital_price / fossil_fuel_price) *
+                     (((interest_rate + delta_NR) * q - phi * delta_NR**3) / (1 - alpha)))**(1 - alpha))
+    output_R = tfp_R**(1 / (1 - alpha)) * (alpha * (energy_price / capital_price) *
+                                          ((1 + mu_R) / (interest_rate + delta_R)))**(alpha / (1 - alpha))
+    marginal_product_capital = tfp_NR**(1 / (1 - alpha)) * (alpha * (energy_price / fossil_fuel_price))**(alpha / (1 - alpha))
+    capital = (scenarios['quantity_demand'] - output_R) / marginal_product_capital
+    return q, capital, energy_price
+
+
+def validate(scenarios, capital=None, method='batched', processes=1, chunk_size=10000):
+    """
+    Compare numeric market prices and steady states with the analytic solutions for a table of scenarios
+    (e.g., from utils.draw_scenarios), returning a dict of ValidationResult keyed by quantity. Market
+    prices are found at capital (by default spread over [1e-6, 1e6]). With method='batched' each chunk of
+    chunk_size scenarios is solved as one array problem, and a chunk that fails is split in halves until
+    the failing scenarios are isolated. With method='sweep' the steady states are found one scenario at a
+    time by sweeps.sweep (market prices are always batched). Chunks run on a pool of processes unless
+    processes=1. Scenarios without a positive analytic steady state capital are left out of the steady
+    state results.
+
+    """
+    if method not in ('batched', 'sweep'):
+        raise ValueError("Unknown validation method {!r}.".format(method))
+    columns = {column: np.asarray(scenarios[column]) for column in SCENARIO_COLUMNS}
+    if np.any(columns['non_renewable_gamma'] != 1) or np.any(columns['non_renewable_sigma'] != 1):
+        raise ValueError("Analytic solutions require gamma = sigma = 1.")
+    number_scenarios = columns['capital_price'].size
+    ids = np.asarray(scenarios['seed']) if 'seed' in scenarios else np.arange(number_scenarios)
+    capital = np.logspace(-6, 6, number_scenarios) if capital is None else np.broadcast_to(capital, ids.shape)
+
+    q, equilibrium_capital, energy_price = analytic_equilibria(columns)
+    feasible = equilibrium_capital > 0
+    market_prices = _map_chunks(_solve_market_prices, 1, dict(columns, capital=capital), processes, chunk_size)
+    subset = {column: values[feasible] for column, values in columns.items()}
+    if method == 'batched':
+        numeric = _map_chunks(_solve_equilibria, 3, subset, processes, chunk_size)
+    else:
+        results = sweeps.sweep(dict(subset, seed=ids[feasible]), processes=processes)
+        numeric = np.array([results['equilibrium_q'], results['equilibrium_capital'],
+                            results['equilibrium_energy_price']]).T
+
+    results = {'market_price': ValidationResult('market_price', ids, analytic_market_prices(columns, capital),
+                                                market_prices[:, 0])}
+    for i, (quantity, analytic) in enumerate(zip(('equilibrium_q', 'equilibrium_capital', 'equilibrium_energy_price'),
+                                                 (q, equilibrium_capital, energy_price))):
+        results[quantity] = ValidationResult(quantity, ids[feasible], analytic[feasible], numeric[:, i])
+    return results
+
+
+def _map_chunks(solve, width, columns, processes, chunk_size):
+    """Stack the rows of width values returned by solve for chunks of the columns, isolating failing scenarios."""
+    number_scenarios = len(next(iter(columns.values())))
+    chunks = [(solve, width, {column: values[i:i + chunk_size] for column, values in columns.items()})
+              for i in range(0, number_scenarios, chunk_size)]
+    processes = os.cpu_count() if processes is None else processes
+    if processes == 1 or len(chunks) == 1:
+        results = [_solve_isolating_failures(chunk) for chunk in chunks]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(_solve_isolating_failures, chunks))
+    return np.concatenate(results) if results else np.empty((0, width))
+
+
+def _solve_isolating_failures(chunk):
+    """Solve a chunk of scenarios at once, splitting it in halves on failure (failed rows are NaN)."""
+    solve, width, columns = chunk
+    number_scenarios = len(next(iter(columns.values())))
+    try:
+        with np.errstate(all='ignore'):
+            return solve(columns)
+    except (ValueError, FloatingPointError):
+        if number_scenarios == 1:
+            return np.full((1, width), np.nan)
+    half = math.ceil(number_scenarios / 2)
+    parts = [{column: values[start:stop] for column, values in columns.items()}
+             for start, stop in ((0, half), (half, number_scenarios))]
+    return np.concatenate([_solve_isolating_failures((solve, width, part)) for part in parts])
+
+
+def _batched_model(columns):
+    """One model whose parameters are arrays over the scenarios (gamma = sigma = 1 are kept scalar)."""
+    scenario = dict(columns, non_renewable_gamma=1, non_renewable_sigma=1)
+    return sweeps.build_model(scenario)
+
+
+def _solve_market_prices(columns):
+    """Market prices, NaN where the market does not clear (so that the chunk need not be split)."""
+    model = _batched_model(columns)
+    prices = (model._capital_price, model._fossil_fuel_price, model._interest_rate)
+    return model._energy_market.find_market_prices(columns['capital'], *prices, full_output=True)[0][:, np.newaxis]
+
+
+def _solve_equilibria(columns):
+    model = _batched_model(columns)
+    q = np.broadcast_to(model._energy_market.non_renewable_sector.equilibrium_q, columns['capital_price'].shape)
+    capital = model.q_dot_locus_grid(q)
+    return np.column_stack((q, capital, model._compute_energy_prices(capital)))